@@ -0,0 +1,322 @@
+import heapq
+import itertools
+import logging
+import os
+import select
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+from database.database import get_db_connection
+from models.scheduleModel import materialize_occurrences
+
+logger = logging.getLogger(__name__)
+
+# 📌 Canal alimenté par le trigger `notify_schedule_change` (schema.sql)
+SCHEDULE_CHANNEL = "schedule_changes"
+# 📌 Verrou consultatif : un seul planificateur actif, même avec plusieurs workers
+SCHEDULER_LOCK_KEY = 730_001
+# 📌 Délai avant de revérifier un planning dont les conditions n'étaient pas réunies
+RECHECK_INTERVAL_SECONDS = float(os.getenv("SCHEDULER_RECHECK_SECONDS", "300"))
+# 📌 Réveil maximal (reprise du verrou, arrêt) quand aucun événement n'est dû
+MAX_IDLE_SECONDS = 60.0
+RECONNECT_DELAY_SECONDS = 5.0
+# 📌 Prolongation de la fenêtre d'occurrences et rechargement complet du tas ; seules
+#    les occurrences commençant dans les 2 prochains intervalles sont gardées en mémoire
+REFRESH_INTERVAL_SECONDS = float(os.getenv("SCHEDULER_REFRESH_SECONDS", "3600"))
+LOOKAHEAD_SECONDS = 2 * REFRESH_INTERVAL_SECONDS
+
+START = "start"
+END = "end"
+
+
+class IrrigationScheduler:
+    """
+    🗓️ Planificateur d'irrigation piloté par les événements.
+
+    Les débuts/fins des occurrences à venir (table `schedule_occurrences`) sont
+    conservés dans un tas binaire (min-heap) ; le thread dort jusqu'au prochain
+    événement dû ou jusqu'à une notification PostgreSQL (LISTEN/NOTIFY) signalant
+    qu'un planning a changé, auquel cas seules ses occurrences sont rechargées. Les
+    événements dus au même instant sont appliqués en une seule requête ensembliste ;
+    le trigger `manage_pumps_on_schedule_status` met en file les commandes des pompes.
+    """
+
+    def __init__(self, condition_checker=None):
+        """
+        :param condition_checker: Fonction optionnelle `(field_ids) -> set(field_ids)` renvoyant
+                                  les champs dont les conditions permettent d'irriguer.
+        """
+        self.condition_checker = condition_checker
+        self._heap = []
+        self._versions = {}
+        self._windows = {}
+        self._by_schedule = {}
+        self._next_refresh = 0.0
+        self._seq = itertools.count()
+        self._generation = itertools.count(1)
+        self._stop = threading.Event()
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread = None
+
+    # =========================================
+    # 🧮 GESTION DU TAS D'ÉVÉNEMENTS
+    # =========================================
+    def _push(self, when, kind, occurrence_id):
+        schedule_id = self._windows[occurrence_id][3]
+        heapq.heappush(self._heap, (when, next(self._seq), kind, occurrence_id, schedule_id, self._versions[schedule_id]))
+
+    def _forget(self, schedule_id):
+        """Invalide (paresseusement) tous les événements en attente des occurrences d'un planning."""
+        self._versions[schedule_id] = next(self._generation)
+        for occurrence_id in self._by_schedule.pop(schedule_id, ()):
+            self._windows.pop(occurrence_id, None)
+
+    def _drop(self, schedule_id):
+        self._forget(schedule_id)
+        self._versions.pop(schedule_id, None)
+
+    def _is_current(self, entry):
+        return self._versions.get(entry[4]) == entry[5] and entry[3] in self._windows
+
+    def _track(self, row):
+        """Enregistre la fenêtre d'une occurrence et programme ses événements de début/fin."""
+        occurrence_id, schedule_id = row["id"], row["schedule_id"]
+        if schedule_id not in self._versions:
+            self._versions[schedule_id] = next(self._generation)
+        self._windows[occurrence_id] = (row["starts_at"].timestamp(), row["ends_at"].timestamp(),
+                                        row["field_id"], schedule_id)
+        self._by_schedule.setdefault(schedule_id, set()).add(occurrence_id)
+        if row["status"] == "planned":
+            self._push(self._windows[occurrence_id][0], START, occurrence_id)
+        self._push(self._windows[occurrence_id][1], END, occurrence_id)
+
+    def _next_due_in(self, now):
+        while self._heap and not self._is_current(self._heap[0]):
+            heapq.heappop(self._heap)
+        timeout = min(MAX_IDLE_SECONDS, max(self._next_refresh - now, 0.0))
+        if self._heap:
+            timeout = min(max(self._heap[0][0] - now, 0.0), timeout)
+        return timeout
+
+    def _pop_due(self, now):
+        starts, ends = [], []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if not self._is_current(entry):
+                continue
+            (starts if entry[2] == START else ends).append(entry[3])
+        ended = set(ends)
+        return [o for o in dict.fromkeys(starts) if o not in ended], list(dict.fromkeys(ends))
+
+    # =========================================
+    # 🔄 CHARGEMENT DES OCCURRENCES
+    # =========================================
+    def _fetch(self, schedule_ids=None):
+        conn = get_db_connection()
+        if not conn:
+            raise psycopg2.OperationalError("❌ Impossible de se connecter à la base de données.")
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT o.id, o.schedule_id, o.starts_at, o.ends_at, o.status, s.field_id
+                      FROM schedule_occurrences o
+                      JOIN schedules s ON s.id = o.schedule_id
+                     WHERE o.status IN ('planned', 'in_progress')
+                       AND s.status IN ('planned', 'in_progress')
+                       AND o.ends_at > LOCALTIMESTAMP
+                       AND o.starts_at < LOCALTIMESTAMP + %s * INTERVAL '1 second'
+                       AND (%s::int[] IS NULL OR o.schedule_id = ANY(%s::int[]));
+                """, (LOOKAHEAD_SECONDS, schedule_ids, schedule_ids))
+                return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def load_all(self):
+        """📥 Recharge entièrement le tas depuis la base (démarrage, reconnexion, rafraîchissement)."""
+        self._heap, self._versions, self._windows, self._by_schedule = [], {}, {}, {}
+        rows = self._fetch()
+        for row in rows:
+            self._track(row)
+        logger.info("🗓️ %d occurrences à venir chargées dans le planificateur.", len(self._windows))
+
+    def refresh(self):
+        """🔁 Prolonge la fenêtre d'occurrences puis recharge le tas."""
+        try:
+            materialize_occurrences()
+        except Exception as e:  # La fenêtre déjà développée reste exploitable
+            logger.error("❌ Échec du développement des occurrences : %s", e)
+        self.load_all()
+        self._next_refresh = time.time() + REFRESH_INTERVAL_SECONDS
+
+    def reload(self, schedule_ids):
+        """🔁 Recharge uniquement les occurrences des plannings notifiés comme modifiés."""
+        schedule_ids = list(schedule_ids)
+        for schedule_id in schedule_ids:
+            self._drop(schedule_id)
+        for row in self._fetch(schedule_ids):
+            self._track(row)
+
+    # =========================================
+    # 🚿 APPLICATION DES ÉVÉNEMENTS
+    # =========================================
+    def _apply(self, query, occurrence_ids):
+        conn = get_db_connection()
+        if not conn:
+            raise psycopg2.OperationalError("❌ Impossible de se connecter à la base de données.")
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(query, {"ids": occurrence_ids})
+                changed = [row["id"] for row in cursor.fetchall()]
+            conn.commit()
+            return changed
+        except psycopg2.Error:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _start(self, occurrence_ids, now):
+        ready = occurrence_ids
+        if self.condition_checker:
+            allowed = self.condition_checker({self._windows[o][2] for o in occurrence_ids})
+            ready = [o for o in occurrence_ids if self._windows[o][2] in allowed]
+            for occurrence_id in set(occurrence_ids) - set(ready):
+                if now + RECHECK_INTERVAL_SECONDS < self._windows[occurrence_id][1]:
+                    self._push(now + RECHECK_INTERVAL_SECONDS, START, occurrence_id)
+                logger.info("🌿 Conditions non optimales pour le planning %s.", self._windows[occurrence_id][3])
+        if not ready:
+            return
+        started = self._apply("""
+            WITH started AS (
+                UPDATE schedule_occurrences
+                   SET status = 'in_progress'
+                 WHERE id = ANY(%(ids)s) AND status = 'planned'
+             RETURNING id, schedule_id
+            ), schedules_started AS (
+                UPDATE schedules s
+                   SET status = 'in_progress', last_irrigation_time = NOW()
+                  FROM started
+                 WHERE s.id = started.schedule_id AND s.status = 'planned'
+            )
+            SELECT id FROM started;
+        """, ready)
+        logger.info("✅ %d occurrences démarrées : %s", len(started), started)
+
+    def _end(self, occurrence_ids):
+        # Un planning récurrent repasse à 'planned' tant qu'il lui reste des occurrences
+        completed = self._apply("""
+            WITH ended AS (
+                UPDATE schedule_occurrences
+                   SET status = 'completed'
+                 WHERE id = ANY(%(ids)s) AND status = 'in_progress'
+             RETURNING id, schedule_id
+            ), schedules_ended AS (
+                UPDATE schedules s
+                   SET status = CASE
+                       WHEN EXISTS (SELECT 1 FROM schedule_occurrences o
+                                     WHERE o.schedule_id = s.id AND o.status = 'planned')
+                         OR (s.recurrence_type <> 'none'
+                             AND (s.recurrence_until IS NULL OR s.recurrence_until > CURRENT_DATE))
+                       THEN 'planned' ELSE 'completed' END
+                  FROM ended
+                 WHERE s.id = ended.schedule_id AND s.status = 'in_progress'
+            )
+            SELECT id FROM ended;
+        """, occurrence_ids)
+        for occurrence_id in occurrence_ids:
+            window = self._windows.pop(occurrence_id, None)
+            if window is not None:
+                self._by_schedule.get(window[3], set()).discard(occurrence_id)
+        logger.info("⏹️ %d occurrences terminées : %s", len(completed), completed)
+
+    def process_due(self, now=None):
+        """⏰ Applique tous les événements dus (un UPDATE ensembliste par type)."""
+        now = time.time() if now is None else now
+        if now >= self._next_refresh:
+            self.refresh()
+        starts, ends = self._pop_due(now)
+        if ends:
+            self._end(ends)
+        if starts:
+            self._start(starts, now)
+
+    # =========================================
+    # 🔁 BOUCLE PRINCIPALE
+    # =========================================
+    def _listen_connection(self):
+        conn = get_db_connection()
+        if not conn:
+            raise psycopg2.OperationalError("❌ Impossible de se connecter à la base de données.")
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cursor:
+            while not self._stop.is_set():
+                cursor.execute("SELECT pg_try_advisory_lock(%s) AS locked;", (SCHEDULER_LOCK_KEY,))
+                if cursor.fetchone()["locked"]:
+                    break
+                logger.info("⏳ Un autre planificateur est actif, nouvelle tentative dans %ss.", MAX_IDLE_SECONDS)
+                self._wait(MAX_IDLE_SECONDS)
+            cursor.execute(f"LISTEN {SCHEDULE_CHANNEL};")
+        return conn
+
+    def _wait(self, timeout, conn=None):
+        readers = [self._wake_r] + ([conn] if conn is not None else [])
+        ready, _, _ = select.select(readers, [], [], timeout)
+        if self._wake_r in ready:
+            os.read(self._wake_r, 1024)
+        return conn is not None and conn in ready
+
+    def _run_connected(self):
+        conn = self._listen_connection()
+        try:
+            if self._stop.is_set():
+                return
+            self.refresh()
+            while not self._stop.is_set():
+                if self._wait(self._next_due_in(time.time()), conn):
+                    conn.poll()
+                    changed = {int(notify.payload) for notify in conn.notifies if notify.payload.isdigit()}
+                    conn.notifies.clear()
+                    if changed:
+                        self.reload(changed)
+                self.process_due()
+        finally:
+            conn.close()
+
+    def run_forever(self):
+        """🚀 Boucle du planificateur (reconnexion et rechargement complet en cas d'erreur)."""
+        while not self._stop.is_set():
+            try:
+                self._run_connected()
+            except psycopg2.Error as e:
+                logger.error("❌ Erreur du planificateur, reconnexion dans %ss : %s", RECONNECT_DELAY_SECONDS, e)
+                self._wait(RECONNECT_DELAY_SECONDS)
+            except Exception as e:  # `condition_checker`, NumPy... : le thread ne doit jamais s'arrêter
+                # Le rechargement complet à la reconnexion restaure les occurrences déjà dépilées
+                logger.error("❌ Erreur inattendue du planificateur, reprise dans %ss : %s",
+                             RECONNECT_DELAY_SECONDS, e, exc_info=True)
+                self._wait(RECONNECT_DELAY_SECONDS)
+
+    def start(self):
+        """▶️ Démarre le planificateur dans un thread dédié."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name="irrigation-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """⏹️ Arrête le planificateur et attend la fin du thread."""
+        self._stop.set()
+        os.write(self._wake_w, b"x")
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+if __name__ == "__main__":
+    from actuators.irrigation_service import evaluate_environmental_conditions
+    from utils.logging_config import setup_logging
+
+    setup_logging()
+    IrrigationScheduler(condition_checker=evaluate_environmental_conditions).run_forever()
@@ -1,115 +1,105 @@
-from datetime import datetime, timedelta
-from database.database import get_db_cursor
+import os
 import psycopg2
+from database.database import get_db_cursor
+from models.pumpModel import enqueue_pump_commands
 import logging
+import numpy as np
 
 logger = logging.getLogger("irrigation_service")
 
 
-def check_and_activate_pumps():
-    """🚿 Vérifie les plannings et active les pompes si les conditions sont remplies."""
-    cursor, conn = get_db_cursor()
+# 📌 Règle d'irrigation par défaut : humidité < seuil (%) et pluie récente <= seuil (mm).
+#    Surchargée par culture puis par champ (colonnes irrigation_*_threshold).
+DEFAULT_HUMIDITY_THRESHOLD = float(os.getenv("IRRIGATION_HUMIDITY_THRESHOLD", "30"))
+DEFAULT_RAINFALL_THRESHOLD = float(os.getenv("IRRIGATION_RAINFALL_THRESHOLD", "0"))
+# 📌 Au-delà, une mesure est considérée comme absente
+MAX_READING_AGE_HOURS = float(os.getenv("IRRIGATION_MAX_READING_AGE_HOURS", "6"))
+
 
+def fetch_field_conditions(field_ids):
+    """
+    📥 Dernière humidité, dernière pluie et seuils applicables de chaque champ, en une requête.
+
+    :return: Liste de dictionnaires `field_id`, `humidity`, `rainfall`, `humidity_threshold`,
+             `rainfall_threshold` (mesures à None si absentes ou trop anciennes).
+    """
+    cursor, conn = get_db_cursor()
+    if not (cursor and conn):
+        raise psycopg2.OperationalError("❌ Impossible de se connecter à la base de données.")
     try:
-        # 1. Récupérer les plannings qui sont prévus et dont l'heure de début est proche
         cursor.execute("""
-            SELECT s.id as schedule_id, s.field_id, s.start_time, s.duration, s.status, s.flow_rate,
-                   sp.pump_id, p.is_on, p.status as pump_status, p.maintenance_status, p.last_maintenance
-            FROM schedules s
-            JOIN schedule_pumps sp ON s.id = sp.schedule_id
-            JOIN pumps p ON sp.pump_id = p.id
-            WHERE s.status = 'planned'
-        """)
-        schedules = cursor.fetchall()
-
-        now = datetime.now()
-
-        for schedule in schedules:
-            start_time = datetime.combine(now.date(), schedule['start_time'])
-            duration_seconds = schedule['duration'].total_seconds()
-            end_time = start_time + timedelta(seconds=duration_seconds)
-
-            # Vérifier si le planning doit commencer ou se terminer
-            if start_time <= now <= end_time:
-                logger.info(
-                    f"🚿 Vérification de la pompe {schedule['pump_id']} pour le planning {schedule['schedule_id']}")
-
-                # 2. Vérifier les conditions environnementales avant d'activer la pompe
-                if verify_environmental_conditions(schedule['field_id']):
-                    # Vérifier que la pompe n'est pas en maintenance
-                    if schedule['maintenance_status'] == 'ok':
-                        # Activer la pompe si elle est éteinte
-                        if not schedule['is_on']:
-                            activate_pump(schedule['pump_id'])
-                            update_schedule_status(schedule['schedule_id'], 'in_progress')
-                            logger.info(f"✅ Pompe {schedule['pump_id']} activée pour le champ {schedule['field_id']}")
-                    else:
-                        logger.warning(f"⚠️ Pompe {schedule['pump_id']} en maintenance, impossible d'activer.")
-                else:
-                    logger.info(f"🌿 Conditions non optimales pour activer la pompe {schedule['pump_id']}.")
-
-            # Si le planning est terminé, arrêter la pompe
-            elif now > end_time and schedule['is_on']:
-                deactivate_pump(schedule['pump_id'])
-                update_schedule_status(schedule['schedule_id'], 'completed')
-                logger.info(
-                    f"⏹️ Pompe {schedule['pump_id']} arrêtée après la fin du planning {schedule['schedule_id']}.")
-
-        conn.commit()
-    except psycopg2.Error as e:
-        logger.error(f"❌ Erreur lors de l'activation des pompes: {e}")
-        conn.rollback()
+            SELECT f.id AS field_id,
+                   h.value AS humidity,
+                   r.value AS rainfall,
+                   COALESCE(f.irrigation_humidity_threshold, c.irrigation_humidity_threshold) AS humidity_threshold,
+                   COALESCE(f.irrigation_rainfall_threshold, c.irrigation_rainfall_threshold) AS rainfall_threshold
+              FROM fields f
+              LEFT JOIN crop_types c ON c.id = f.crop_type_id
+              LEFT JOIN field_latest_measurements h
+                     ON h.field_id = f.id AND h.metric = 'humidity'
+                    AND h.measured_at >= LOCALTIMESTAMP - make_interval(secs => %(max_age)s)
+              LEFT JOIN field_latest_measurements r
+                     ON r.field_id = f.id AND r.metric = 'rainfall'
+                    AND r.measured_at >= LOCALTIMESTAMP - make_interval(secs => %(max_age)s)
+             WHERE f.id = ANY(%(field_ids)s::int[]);
+        """, {"field_ids": list(field_ids), "max_age": MAX_READING_AGE_HOURS * 3600})
+        return cursor.fetchall()
     finally:
         cursor.close()
         conn.close()
 
 
-def verify_environmental_conditions(field_id: int) -> bool:
-    """🌦️ Vérifie les conditions environnementales pour le champ donné."""
-    cursor, conn = get_db_cursor()
+def _as_array(rows, key, default=np.nan):
+    return np.array([default if row[key] is None else row[key] for row in rows], dtype=np.float64)
 
-    cursor.execute("""
-        SELECT * FROM sensor_readings 
-        WHERE field_id = %s 
-        ORDER BY timestamp DESC LIMIT 1;
-    """, (field_id,))
-    reading = cursor.fetchone()
 
-    cursor.close()
-    conn.close()
+def evaluate_environmental_conditions(field_ids):
+    """
+    🌦️ Évalue la règle d'irrigation pour un ensemble de champs (vectorisé avec NumPy).
 
-    if reading:
-        humidity = next((m['valeur'] for m in reading['measurements'] if m['type'] == 'humidity'), None)
-        rainfall = next((m['valeur'] for m in reading['measurements'] if m['type'] == 'rainfall'), None)
+    Un champ est irrigable si son humidité est sous le seuil et que la pluie récente ne
+    dépasse pas le seuil. Sans mesure d'humidité récente, le planning s'applique tel quel ;
+    sans mesure de pluie, aucune pluie n'est supposée. Utilisable comme `condition_checker`
+    du planificateur.
 
-        # Condition : humidité < 30% et pas de pluie récemment
-        if humidity is not None and humidity < 30 and (rainfall is None or rainfall == 0):
-            return True  # Conditions favorables
-    return False
+    :return: Ensemble des champs dont les conditions permettent d'irriguer.
+    """
+    field_ids = set(field_ids)
+    if not field_ids:
+        return set()
+    rows = fetch_field_conditions(field_ids)
+    if not rows:
+        return set()
+
+    ids = np.array([row["field_id"] for row in rows])
+    humidity = _as_array(rows, "humidity")
+    rainfall = _as_array(rows, "rainfall")
+    humidity_threshold = _as_array(rows, "humidity_threshold", DEFAULT_HUMIDITY_THRESHOLD)
+    rainfall_threshold = _as_array(rows, "rainfall_threshold", DEFAULT_RAINFALL_THRESHOLD)
+
+    dry = np.isnan(humidity) | (humidity < humidity_threshold)
+    no_rain = np.isnan(rainfall) | (rainfall <= rainfall_threshold)
+    allowed = ids[dry & no_rain]
+
+    skipped = len(rows) - len(allowed)
+    if skipped:
+        logger.info("🌿 %d champ(s) sur %d ne nécessitent pas d'irrigation.", skipped, len(rows))
+    return set(allowed.tolist())
+
+
+def verify_environmental_conditions(field_id: int) -> bool:
+    """🌦️ Vérifie les conditions environnementales pour le champ donné."""
+    return field_id in evaluate_environmental_conditions([field_id])
 
 
 def activate_pump(pump_id: int):
-    """🚿 Active une pompe spécifique."""
-    cursor, conn = get_db_cursor()
-    cursor.execute("""
-        UPDATE pumps SET is_on = TRUE, status = 'active', last_start_time = NOW(), last_activated = NOW()
-        WHERE id = %s;
-    """, (pump_id,))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    """🚿 Demande l'activation d'une pompe (l'état est enregistré après acquittement du matériel)."""
+    return enqueue_pump_commands([pump_id], "on")[0]
 
 
 def deactivate_pump(pump_id: int):
-    """⏹️ Désactive une pompe spécifique."""
-    cursor, conn = get_db_cursor()
-    cursor.execute("""
-        UPDATE pumps SET is_on = FALSE, status = 'idle', total_usage_time = total_usage_time + EXTRACT(EPOCH FROM (NOW() - last_start_time))
-        WHERE id = %s;
-    """, (pump_id,))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    """⏹️ Demande la désactivation d'une pompe (l'état est enregistré après acquittement du matériel)."""
+    return enqueue_pump_commands([pump_id], "off")[0]
 
 
 def update_schedule_status(schedule_id: int, new_status: str):
@@ -1,12 +1,20 @@
+import asyncio
+
 from actuators.pump import PumpController
 from ontology.ontology_loader import OntologyHandler
 
 class IrrigationSystem:
-    def __init__(self, ontology_file):
+    def __init__(self, ontology_file, pump_controller=None, pump_id=1):
+        """
+        :param pump_controller: Contrôleur partagé synchronisé avec `pumps` ; à défaut,
+                                un contrôleur de simulation (sans écriture en base).
+        """
         self.ontology_handler = OntologyHandler(ontology_file)
-        self.pump = PumpController()
+        self.pump = pump_controller or PumpController(sync_to_db=False)
+        self.pump_id = pump_id
 
-    def irrigate(self, stage_label, current_moisture):
+    async def irrigate(self, stage_label, current_moisture):
+        """🚿 Déclenche l'irrigation si nécessaire, sans attendre la fin du run de la pompe."""
         water_needs = self.ontology_handler.get_water_need_for_stage(stage_label)
         if not water_needs:
             return f"No irrigation required for {stage_label}."
@@ -17,11 +25,15 @@ class IrrigationSystem:
 
         if current_moisture < (required_water * 0.6):
             print(f"Irrigation triggered for {stage_label}, {required_water} liters required.")
-            self.pump.start_pump(required_water)
+            self.pump.start_pump(self.pump_id, water_amount=required_water)
             return f"Irrigation started for {stage_label} with {required_water} liters."
         else:
             return "Moisture level sufficient, no irrigation needed."
 
 if __name__ == "__main__":
-    irrigation = IrrigationSystem("../data/MergeMaizeIrrigOnto.rdf")
-    print(irrigation.irrigate("Floraison (VT/R1)", 25.0))
+    async def _main():
+        irrigation = IrrigationSystem("../data/MergeMaizeIrrigOnto.rdf", PumpController(sync_to_db=False))
+        print(await irrigation.irrigate("Floraison (VT/R1)", 25.0))
+        await irrigation.pump.close()
+
+    asyncio.run(_main())
@@ -1,41 +1,262 @@
+import asyncio
+import logging
+import os
 import time
+from datetime import datetime
+
+import psycopg2
+
+from database.database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# 📌 Débit utilisé quand ni l'appel ni la pompe n'en précisent un (L/min)
+DEFAULT_FLOW_RATE_LPM = float(os.getenv("PUMP_DEFAULT_FLOW_RATE_LPM", "20"))
+# 📌 Les changements d'état sont regroupés puis écrits dans `pumps` à cet intervalle
+PUMP_SYNC_INTERVAL_SECONDS = float(os.getenv("PUMP_SYNC_INTERVAL_SECONDS", "1.0"))
+
+
+class PumpRun:
+    """🚰 État d'une pompe suivie par le contrôleur (run en cours et volume délivré)."""
+
+    def __init__(self, pump_id, flow_rate):
+        self.pump_id = pump_id
+        self.flow_rate = flow_rate  # L/min
+        self.is_on = False
+        self.target_volume = None
+        self.started_at = None      # horloge monotone, pour le calcul du volume
+        self.started_wall = None    # horodatage enregistré en base
+        self.delivered_before = 0.0
+        self.timer = None
+        self.done = None
+
+    def elapsed_seconds(self, now=None):
+        if not self.is_on:
+            return 0.0
+        return (time.monotonic() if now is None else now) - self.started_at
+
+    def delivered_volume(self, now=None):
+        """💧 Volume délivré (L) depuis la création du suivi, run en cours inclus."""
+        return self.delivered_before + self.elapsed_seconds(now) * self.flow_rate / 60.0
+
+    def as_dict(self):
+        now = time.monotonic()
+        return {
+            "pump_id": self.pump_id,
+            "is_on": self.is_on,
+            "flow_rate": self.flow_rate,
+            "target_volume": self.target_volume,
+            "elapsed_seconds": round(self.elapsed_seconds(now), 3),
+            "delivered_volume": round(self.delivered_volume(now), 3),
+            "started_at": self.started_wall,
+        }
+
 
 class PumpController:
-    def __init__(self):
-        self.status = False  # False means pump is off
+    """
+    ⚙️ Contrôleur asynchrone de pompes.
+
+    Chaque démarrage programme l'arrêt sur le minuteur de la boucle asyncio
+    (`loop.call_at`) : aucune coroutine ni aucun thread n'est bloqué pendant
+    l'irrigation, un seul processus pilote des milliers de pompes simultanément.
+    Les changements d'état sont accumulés puis appliqués à la table `pumps` par
+    lots à chaque intervalle de synchronisation (tâche lancée au premier démarrage
+    de pompe) : chaque transition est écrite, un démarrage suivi d'un arrêt dans le
+    même intervalle produit donc bien un cycle dans `pump_runs`.
+    """
 
-    def start_pump(self, water_amount):
+    def __init__(self, sync_interval=PUMP_SYNC_INTERVAL_SECONDS, sync_to_db=True):
         """
-        Simulate starting the pump for a required water amount.
-        :param water_amount: Amount of water to be pumped (liters).
+        :param sync_interval: Intervalle (s) entre deux écritures groupées dans `pumps`.
+        :param sync_to_db: Désactive la synchronisation (simulation, tests de charge).
         """
-        if not self.status:
-            self.status = True
-            print(f"Pump started. Delivering {water_amount} liters of water...")
-            time.sleep(2)  # Simulate the pump running time
-            self.stop_pump()
-        else:
-            print("Pump is already running.")
-
-    def stop_pump(self):
+        self.sync_interval = sync_interval
+        self.sync_to_db = sync_to_db
+        self._pumps = {}
+        self._pending = {}  # Transitions à écrire, dans l'ordre, par pompe
+        self._sync_task = None
+
+    # =========================================
+    # 🚿 COMMANDES
+    # =========================================
+    def _get(self, pump_id, flow_rate=None):
+        run = self._pumps.get(pump_id)
+        if run is None:
+            run = self._pumps[pump_id] = PumpRun(pump_id, flow_rate or DEFAULT_FLOW_RATE_LPM)
+        elif flow_rate and not run.is_on:
+            run.flow_rate = flow_rate
+        return run
+
+    def start_pump(self, pump_id, water_amount=None, duration=None, flow_rate=None):
         """
-        Stop the pump.
+        ▶️ Démarre une pompe sans bloquer ; l'arrêt est programmé sur la boucle.
+
+        :param water_amount: Volume à délivrer (L) ; la durée en découle via le débit.
+        :param duration: Durée maximale (s), prioritaire si les deux sont fournis.
+        :param flow_rate: Débit de la pompe (L/min).
+        :return: Future résolue avec le volume délivré à l'arrêt (ou annulée).
         """
-        if self.status:
-            self.status = False
-            print("Pump stopped.")
-        else:
-            print("Pump is already off.")
+        loop = asyncio.get_running_loop()
+        run = self._get(pump_id, flow_rate)
+        if run.is_on:
+            logger.debug("⚠️ Pompe %s déjà en marche.", pump_id)
+            return run.done
 
-    def get_status(self):
+        if duration is None and water_amount is not None:
+            duration = water_amount / run.flow_rate * 60.0
+        run.is_on = True
+        run.target_volume = water_amount
+        run.started_at = time.monotonic()
+        run.started_wall = datetime.now()
+        run.done = loop.create_future()
+        self.start()
+        if duration is not None:
+            run.timer = loop.call_at(loop.time() + duration, self._finish, pump_id)
+        self._record(run, started=True)
+        logger.debug("🚰 Pompe %s démarrée (%s L, %s s).", pump_id, water_amount, duration)
+        return run.done
+
+    def _finish(self, pump_id):
+        self.stop_pump(pump_id)
+
+    def stop_pump(self, pump_id):
+        """⏹️ Arrête une pompe ; renvoie le volume délivré par ce run (None si elle était arrêtée)."""
+        run = self._pumps.get(pump_id)
+        if run is None or not run.is_on:
+            return None
+        if run.timer is not None:
+            run.timer.cancel()
+            run.timer = None
+        now = time.monotonic()
+        elapsed = run.elapsed_seconds(now)
+        volume = elapsed * run.flow_rate / 60.0
+        run.delivered_before += volume
+        run.is_on = False
+        self._record(run, started=False, run_seconds=elapsed)
+        if not run.done.done():
+            run.done.set_result(volume)
+        logger.debug("🛑 Pompe %s arrêtée (%.1f L en %.1f s).", pump_id, volume, elapsed)
+        return volume
+
+    def cancel(self, pump_id):
+        """🚫 Interrompt un run : la pompe est arrêtée et la future du run est annulée."""
+        run = self._pumps.get(pump_id)
+        if run is None or not run.is_on:
+            return False
+        run.done.cancel()
+        self.stop_pump(pump_id)
+        return True
+
+    async def stop_all(self):
+        """⏹️ Arrête toutes les pompes en marche puis synchronise la base."""
+        for pump_id in [pump_id for pump_id, run in self._pumps.items() if run.is_on]:
+            self.stop_pump(pump_id)
+        await self.flush()
+
+    # =========================================
+    # 📊 ÉTAT
+    # =========================================
+    def get_status(self, pump_id):
+        """📋 État courant d'une pompe (None si elle n'a jamais été pilotée)."""
+        run = self._pumps.get(pump_id)
+        return run.as_dict() if run else None
+
+    def running(self):
+        """📋 Identifiants des pompes en marche."""
+        return [pump_id for pump_id, run in self._pumps.items() if run.is_on]
+
+    # =========================================
+    # 🔄 SYNCHRONISATION GROUPÉE AVEC `pumps`
+    # =========================================
+    def _record(self, run, started, run_seconds=0.0):
+        if not self.sync_to_db:
+            return
+        self._pending.setdefault(run.pump_id, []).append({
+            "is_on": started,
+            "started_at": run.started_wall if started else None,
+            "run_hours": run_seconds / 3600.0,
+        })
+
+    def _write(self, changes):
         """
-        Get the current status of the pump.
+        💾 Écrit les transitions en une transaction : un UPDATE par rang de transition
+        (1re transition de chaque pompe, puis 2e, …), pour que `track_pump_runs` voie
+        chaque démarrage et chaque arrêt, et non le seul état final de l'intervalle.
         """
-        return "Running" if self.status else "Stopped"
+        conn = get_db_connection()
+        if not conn:
+            raise psycopg2.OperationalError("❌ Impossible de se connecter à la base de données.")
+        try:
+            with conn.cursor() as cursor:
+                for rank in range(max(len(transitions) for transitions in changes.values())):
+                    step = {pump_id: transitions[rank] for pump_id, transitions in changes.items()
+                            if rank < len(transitions)}
+                    cursor.execute("""
+                        UPDATE pumps p
+                           SET is_on            = v.is_on,
+                               status           = CASE WHEN v.is_on THEN 'running' ELSE 'idle' END,
+                               last_start_time  = CASE WHEN v.is_on THEN COALESCE(v.started_at, p.last_start_time) END,
+                               last_activated   = COALESCE(v.started_at, p.last_activated),
+                               total_usage_time = p.total_usage_time + v.run_hours
+                          FROM unnest(%s::int[], %s::boolean[], %s::timestamp[], %s::float8[])
+                               AS v(id, is_on, started_at, run_hours)
+                         WHERE p.id = v.id;
+                    """, (
+                        list(step),
+                        [c["is_on"] for c in step.values()],
+                        [c["started_at"] for c in step.values()],
+                        [c["run_hours"] for c in step.values()],
+                    ))
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    async def flush(self):
+        """💾 Écrit en une transaction toutes les transitions accumulées."""
+        if not self._pending:
+            return 0
+        changes, self._pending = self._pending, {}
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, changes)
+        except psycopg2.Error as e:
+            logger.error("❌ Synchronisation de %d pompes échouée, nouvel essai au prochain cycle : %s", len(changes), e)
+            for pump_id, transitions in changes.items():  # Remises avant celles arrivées entre-temps
+                self._pending[pump_id] = transitions + self._pending.get(pump_id, [])
+            return 0
+        return len(changes)
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            await self.flush()
+
+    def start(self):
+        """▶️ Lance la tâche de synchronisation périodique sur la boucle courante."""
+        if self.sync_to_db and self._sync_task is None:
+            self._sync_task = asyncio.get_running_loop().create_task(self._sync_loop())
 
-# Example usage
+    async def close(self):
+        """🛑 Arrête les pompes, la synchronisation et écrit les derniers changements."""
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+        await self.stop_all()
+
+
+# Exemple : 1000 pompes pilotées en parallèle, sans base de données
 if __name__ == "__main__":
-    pump = PumpController()
-    pump.start_pump(50)
-    print("Pump status:", pump.get_status())
-    pump.stop_pump()
+    async def _demo():
+        controller = PumpController(sync_to_db=False)
+        runs = [controller.start_pump(pump_id, water_amount=1.0, flow_rate=60.0) for pump_id in range(1000)]
+        print("Pompes en marche :", len(controller.running()))
+        volumes = await asyncio.gather(*runs)
+        print(f"Volume total délivré : {sum(volumes):.1f} L")
+
+    asyncio.run(_demo())
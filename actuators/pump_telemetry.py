@@ -0,0 +1,240 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import psycopg2
+
+from database.database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_FIELDS = ("water_flow", "elapsed_time", "power_consumption")
+
+# 📌 Fréquence d'insertion des échantillons bruts, et taille de lot déclenchant une écriture anticipée
+TELEMETRY_FLUSH_INTERVAL_SECONDS = float(os.getenv("PUMP_TELEMETRY_FLUSH_SECONDS", "2"))
+TELEMETRY_BATCH_SIZE = int(os.getenv("PUMP_TELEMETRY_BATCH_SIZE", "5000"))
+# 📌 La ligne `pumps` d'une pompe est réécrite au plus une fois par intervalle
+PUMP_ROW_FLUSH_INTERVAL_SECONDS = float(os.getenv("PUMP_ROW_FLUSH_SECONDS", "30"))
+# 📌 Au-delà, les échantillons les plus anciens sont abandonnés (base indisponible)
+TELEMETRY_MAX_BUFFERED = int(os.getenv("PUMP_TELEMETRY_MAX_BUFFERED", "100000"))
+PG_INT_MAX = 2**31 - 1
+
+
+class PumpTelemetryBuffer:
+    """
+    📟 Ingestion coalescée de la télémétrie des pompes.
+
+    `record()` ne touche pas la base : il met à jour le dernier état connu de la
+    pompe en mémoire et ajoute l'échantillon à un tampon. Un thread écrit le
+    tampon dans `pump_telemetry` par lots (un INSERT multi-lignes), et ne
+    réécrit les lignes `pumps` modifiées qu'une fois par intervalle (un UPDATE
+    pour toutes les pompes concernées).
+    """
+
+    def __init__(self, flush_interval=TELEMETRY_FLUSH_INTERVAL_SECONDS,
+                 row_flush_interval=PUMP_ROW_FLUSH_INTERVAL_SECONDS):
+        self.flush_interval = flush_interval
+        self.row_flush_interval = row_flush_interval
+        self._latest = {}
+        self._samples = []
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._next_row_flush = time.monotonic() + row_flush_interval
+        self._thread = None
+
+    def record(self, pump_id, sample, recorded_at=None):
+        """
+        ➕ Enregistre un échantillon de télémétrie (aucun accès à la base).
+        Lève `ValueError` si l'identifiant de pompe ou les valeurs sont invalides.
+
+        :param sample: Dictionnaire contenant tout ou partie de `water_flow`, `elapsed_time`, `power_consumption`.
+        :param recorded_at: Date de l'échantillon, avec ou sans fuseau (convertie en heure locale naïve).
+        """
+        recorded_at = recorded_at or datetime.now()
+        if recorded_at.tzinfo is not None:  # Heure locale naïve, comme `pump_telemetry.recorded_at`
+            recorded_at = recorded_at.astimezone().replace(tzinfo=None)
+        # Un échantillon invalide est refusé ici : en base, il ferait échouer tout le lot
+        if not 0 < pump_id <= PG_INT_MAX:
+            raise ValueError(f"❌ Identifiant de pompe invalide : {pump_id}")
+        try:
+            values = {field: float(sample[field]) for field in TELEMETRY_FIELDS if sample.get(field) is not None}
+        except (TypeError, ValueError):
+            raise ValueError("❌ Valeurs de télémétrie non numériques.")
+        with self._lock:
+            latest = self._latest.setdefault(pump_id, {})
+            if latest.get("recorded_at") is None or recorded_at >= latest["recorded_at"]:
+                latest.update(values, recorded_at=recorded_at)
+                self._dirty.add(pump_id)
+            if len(self._samples) >= TELEMETRY_MAX_BUFFERED:
+                del self._samples[: len(self._samples) // 10]
+                logger.warning("⚠️ Tampon de télémétrie plein, échantillons les plus anciens abandonnés.")
+            self._samples.append((pump_id, recorded_at, *(values.get(field) for field in TELEMETRY_FIELDS)))
+            full = len(self._samples) >= TELEMETRY_BATCH_SIZE
+        if full:
+            self._wake.set()
+
+    def latest(self, pump_id):
+        """📋 Dernier état reçu pour une pompe (None si aucun échantillon depuis le démarrage)."""
+        with self._lock:
+            state = self._latest.get(pump_id)
+            return dict(state) if state else None
+
+    # =========================================
+    # 💾 ÉCRITURES GROUPÉES
+    # =========================================
+    def _write(self, samples, rows):
+        conn = get_db_connection()
+        if not conn:
+            raise psycopg2.OperationalError("❌ Impossible de se connecter à la base de données.")
+        try:
+            with conn.cursor() as cursor:
+                if samples:
+                    columns = list(zip(*samples))
+                    cursor.execute("""
+                        INSERT INTO pump_telemetry (pump_id, recorded_at, water_flow, elapsed_time, power_consumption)
+                        SELECT * FROM unnest(%s::int[], %s::timestamp[], %s::float8[], %s::float8[], %s::float8[]);
+                    """, [list(column) for column in columns])
+                if rows:
+                    cursor.execute("""
+                        UPDATE pumps p
+                           SET water_flow        = COALESCE(v.water_flow, p.water_flow),
+                               elapsed_time      = COALESCE(v.elapsed_time, p.elapsed_time),
+                               power_consumption = COALESCE(v.power_consumption, p.power_consumption)
+                          FROM unnest(%s::int[], %s::float8[], %s::float8[], %s::float8[])
+                               AS v(id, water_flow, elapsed_time, power_consumption)
+                         WHERE p.id = v.id;
+                    """, (
+                        list(rows),
+                        *[[rows[pump_id].get(field) for pump_id in rows] for field in TELEMETRY_FIELDS],
+                    ))
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def flush(self, force_rows=False):
+        """💾 Écrit les échantillons en attente et, si l'intervalle est écoulé, les lignes `pumps`."""
+        now = time.monotonic()
+        with self._lock:
+            samples, self._samples = self._samples, []
+            rows = {}
+            if force_rows or now >= self._next_row_flush:
+                rows = {pump_id: dict(self._latest[pump_id]) for pump_id in self._dirty}
+                self._dirty = set()
+                self._next_row_flush = now + self.row_flush_interval
+        if not samples and not rows:
+            return
+        try:
+            self._write(samples, rows)
+            logger.debug("💾 %d échantillons de télémétrie écrits, %d pompes mises à jour.", len(samples), len(rows))
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            logger.error("❌ Écriture de la télémétrie échouée, nouvel essai au prochain cycle : %s", e)
+            self._requeue(samples, rows)
+        except psycopg2.Error as e:
+            # Lot refusé par la base (donnée invalide) : le réessayer tel quel échouerait indéfiniment
+            logger.warning("⚠️ Lot de télémétrie refusé, écriture par sous-lots : %s", e)
+            remaining = self._write_split(samples)
+            if remaining:
+                self._requeue(remaining, rows)
+            elif rows:
+                try:
+                    self._write([], rows)
+                except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                    self._requeue([], rows)
+                except psycopg2.Error as e:
+                    logger.error("❌ Mise à jour de %d pompes abandonnée : %s", len(rows), e)
+
+    def _requeue(self, samples, rows):
+        """↩️ Remet des échantillons non écrits en tête du tampon (base indisponible)."""
+        with self._lock:
+            self._samples[:0] = samples
+            self._dirty.update(rows)
+
+    def _write_split(self, samples):
+        """
+        ✂️ Réécrit un lot refusé par moitiés successives pour isoler et abandonner les
+        échantillons invalides. Renvoie les échantillons restant à écrire si la base
+        devient indisponible en cours de route.
+        """
+        pending = [samples]
+        while pending:
+            chunk = pending.pop()
+            try:
+                self._write(chunk, {})
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                pending.append(chunk)
+                return [sample for part in reversed(pending) for sample in part]
+            except psycopg2.Error as e:
+                if len(chunk) == 1:
+                    logger.error("❌ Échantillon de télémétrie invalide abandonné %s : %s", chunk[0], e)
+                else:
+                    middle = len(chunk) // 2
+                    pending.extend((chunk[middle:], chunk[:middle]))
+        return []
+
+    # =========================================
+    # 🔁 THREAD D'ÉCRITURE
+    # =========================================
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+        self.flush(force_rows=True)
+
+    def start(self):
+        """▶️ Démarre le thread d'écriture."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="pump-telemetry", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """⏹️ Arrête le thread après une dernière écriture complète."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+# ✅ Tampon partagé par l'API (démarré au lancement de l'application)
+telemetry_buffer = PumpTelemetryBuffer()
+
+
+# Ingestion MQTT autonome : irrigation_system/pumps/<pump_id>/telemetry
+if __name__ == "__main__":
+    import paho.mqtt.client as mqtt
+
+    from utils.logging_config import setup_logging
+
+    setup_logging()
+
+    def on_connect(client, userdata, flags, reason_code, properties=None):
+        if reason_code == 0:
+            client.subscribe("irrigation_system/pumps/+/telemetry")
+        else:
+            logger.error("❌ Échec de connexion au broker MQTT, code de retour : %s", reason_code)
+
+    def on_message(client, userdata, msg):
+        try:
+            pump_id = int(msg.topic.split("/")[2])
+            telemetry_buffer.record(pump_id, json.loads(msg.payload.decode()))
+        except (ValueError, IndexError, AttributeError):
+            logger.warning("⚠️ Télémétrie invalide sur %s", msg.topic)
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(os.getenv("MQTT_BROKER", "localhost"), int(os.getenv("MQTT_PORT", "1883")))
+    telemetry_buffer.start()
+    try:
+        client.loop_forever()
+    finally:
+        telemetry_buffer.stop()
@@ -0,0 +1,70 @@
+"""
+Benchmark de la détection d'anomalies à l'ingestion (inference/anomaly_detector.py) :
+coût par mesure de `update()` sur des séries synthétiques, puis rejeu du jeu de données
+IoT (data/IoTProcessed_Data.csv) à travers `inspect()` avec le décompte des anomalies
+(les colonnes N/P/K bloquées à 255 doivent être mises en quarantaine).
+
+Aucun prérequis (pas de base de données).
+Usage : python -m benchmarks.anomaly_benchmark --sensors 1000 --measurements 1000000
+"""
+import argparse
+import csv
+import random
+import time
+from collections import Counter
+from pathlib import Path
+
+from inference.anomaly_detector import AnomalyDetector
+
+CSV_PATH = Path(__file__).resolve().parent.parent / "data" / "IoTProcessed_Data.csv"
+CSV_METRICS = ("tempreature", "humidity", "water_level")
+
+
+def bench_update(sensors, measurements):
+    detector = AnomalyDetector()
+    rng = random.Random(42)
+    samples = [(rng.randrange(sensors), rng.gauss(35.0, 5.0)) for _ in range(measurements)]
+    update = detector.update
+    start = time.perf_counter()
+    for sensor_id, value in samples:
+        update(sensor_id, "humidity", value)
+    elapsed = time.perf_counter() - start
+    print(f"update()  : {measurements:,} mesures, {sensors} capteurs -> "
+          f"{elapsed / measurements * 1e6:.2f} µs/mesure ({measurements / elapsed:,.0f} mesures/s)")
+
+
+def bench_csv():
+    detector = AnomalyDetector()
+    with open(CSV_PATH, newline="") as handle:
+        rows = list(csv.DictReader(handle))
+    messages = [
+        [{"type": metric, "valeur": float(row[metric]), "unit": "", "timestamp": row["date"]} for metric in CSV_METRICS]
+        + [{"type": "NPK", "valeur": {key: float(row[key]) for key in "NPK"}, "unit": "mg/kg", "timestamp": row["date"]}]
+        for row in rows
+    ]
+    reasons = Counter()
+    start = time.perf_counter()
+    for message in messages:
+        accepted, quarantined = detector.inspect(1, message)
+        reasons.update(f"quarantaine:{q[1]}:{q[3]}" for q in quarantined)
+        reasons.update(f"signalée:{m['type']}:{m['anomaly']}" for m in accepted if "anomaly" in m)
+    elapsed = time.perf_counter() - start
+    count = sum(len(message) for message in messages)
+    print(f"inspect() : {len(messages):,} messages du CSV ({count:,} mesures) -> "
+          f"{elapsed / count * 1e6:.2f} µs/mesure")
+    for reason, total in reasons.most_common():
+        print(f"  {reason:<40} {total}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sensors", type=int, default=1000)
+    parser.add_argument("--measurements", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    bench_update(args.sensors, args.measurements)
+    bench_csv()
+
+
+if __name__ == "__main__":
+    main()
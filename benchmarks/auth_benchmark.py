@@ -0,0 +1,49 @@
+"""
+Benchmark du chemin d'authentification : requêtes/seconde sur `GET /api/auth/users/me`
+sans cache (comportement historique : décodage JWT + SELECT à chaque requête) puis avec
+les caches de claims et d'utilisateurs.
+
+Prérequis : base PostgreSQL configurée (.env) contenant l'utilisateur indiqué.
+Usage : python -m benchmarks.auth_benchmark --username alice --requests 2000
+"""
+import argparse
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes.auth import router as auth_router
+from utils import security
+
+
+def run(client, headers, requests, clear_caches):
+    start = time.perf_counter()
+    for _ in range(requests):
+        if clear_caches:
+            security._token_cache.clear()
+            security._user_cache.clear()
+        response = client.get("/api/auth/users/me", headers=headers)
+        response.raise_for_status()
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--username", required=True, help="Utilisateur existant en base")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = FastAPI()
+    app.include_router(auth_router, prefix="/api/auth")
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {security.create_access_token({'sub': args.username})}"}
+
+    before = run(client, headers, args.requests, clear_caches=True)
+    after = run(client, headers, args.requests, clear_caches=False)
+
+    print(f"Sans cache : {before:10.1f} req/s")
+    print(f"Avec cache : {after:10.1f} req/s  (x{after / before:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark du calcul vectorisé de l'ET0 (inference/et0.py) sur une grille champs × jours
+de données synthétiques : Penman-Monteith complet, puis Hargreaves seul (températures
+uniquement), puis mélange des deux (un tiers des cellules sans humidité/rayonnement).
+
+Aucun prérequis (pas de base de données).
+Usage : python -m benchmarks.et0_benchmark --fields 10000 --days 365
+"""
+import argparse
+import time
+
+import numpy as np
+
+from inference.et0 import compute_et0
+
+
+def synthetic_inputs(fields, days, seed=42):
+    rng = np.random.default_rng(seed)
+    latitude = rng.uniform(-35, 35, fields)
+    day_of_year = np.arange(1, days + 1) % 365 + 1
+    t_min = rng.uniform(8, 22, (fields, days))
+    t_max = t_min + rng.uniform(5, 15, (fields, days))
+    rh_mean = rng.uniform(30, 90, (fields, days))
+    wind = rng.uniform(0.5, 5, (fields, days))
+    rs = rng.uniform(8, 28, (fields, days))
+    return latitude, day_of_year, t_min, t_max, rh_mean, wind, rs
+
+
+def measure(label, cells, func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        et0, _ = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<22} {best * 1000:9.1f} ms  {cells / best / 1e6:8.1f} M cellules/s  "
+          f"(ET0 moyenne {np.nanmean(et0):.2f} mm/j)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fields", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    latitude, day_of_year, t_min, t_max, rh_mean, wind, rs = synthetic_inputs(args.fields, args.days)
+    cells = args.fields * args.days
+    print(f"Grille : {args.fields} champs × {args.days} jours = {cells:,} cellules")
+
+    measure("Penman-Monteith", cells,
+            lambda: compute_et0(latitude, day_of_year, t_min, t_max, rh_mean, wind, rs), args.repeat)
+    measure("Hargreaves", cells,
+            lambda: compute_et0(latitude, day_of_year, t_min, t_max), args.repeat)
+    partial = np.where(np.random.default_rng(1).random(rs.shape) < 1 / 3, np.nan, rs)
+    measure("Mixte (1/3 Hargreaves)", cells,
+            lambda: compute_et0(latitude, day_of_year, t_min, t_max, rh_mean, wind, partial), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark du trigger `manage_pumps_on_schedule_status` : durée de la transition d'un
+planning vers "in_progress" puis "completed" en fonction du nombre de pompes liées,
+pour la version ensembliste actuelle et pour l'ancienne version en boucle PL/pgSQL.
+
+Chaque mesure s'exécute dans une transaction annulée (ROLLBACK) : aucune donnée n'est
+conservée et l'ancienne fonction n'est remplacée que le temps de la transaction.
+
+Prérequis : base PostgreSQL initialisée (schema.sql) et configurée dans .env.
+Usage : python -m benchmarks.trigger_benchmark --pumps 1 10 50 200 1000 --repeat 5
+"""
+import argparse
+import statistics
+import time
+
+from database.database import get_db_connection
+
+LEGACY_TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION manage_pumps_on_schedule_status()
+RETURNS TRIGGER AS $$
+DECLARE
+    pump_record RECORD;
+BEGIN
+    -- 🚀 1) Si la planification passe à "in_progress"
+    IF NEW.status = 'in_progress' THEN
+
+        -- Récupérer toutes les pompes liées à la NOUVELLE planification
+        FOR pump_record IN
+            SELECT p.id
+              FROM pumps p
+              JOIN schedule_pumps sp ON p.id = sp.pump_id
+             WHERE sp.schedule_id = NEW.id
+        LOOP
+            -- A) Trouver si la pompe est déjà 'running' pour un autre planning en "in_progress"
+            --    et, le cas échéant, arrêter cette ancienne planification en la passant à 'completed'.
+            UPDATE schedules s
+               SET status = 'completed'  -- Au lieu de 'cancelled'
+              FROM schedule_pumps sp2
+             WHERE s.id = sp2.schedule_id
+               AND sp2.pump_id = pump_record.id
+               AND s.id <> NEW.id               -- Exclure la planification actuelle
+               AND s.status = 'in_progress';    -- L'autre planning en cours
+
+            -- B) Arrêter physiquement la pompe si elle tourne déjà
+            UPDATE pumps
+               SET is_on            = FALSE,
+                   status           = 'idle',
+                   total_usage_time = total_usage_time
+                                      + EXTRACT(EPOCH FROM (NOW() - last_start_time)) / 3600,
+                   last_start_time  = NULL
+             WHERE id = pump_record.id
+               AND status = 'running';
+
+            --   (On peut éventuellement insérer une notification pour l'arrêt forcé)
+            INSERT INTO notifications (message, notification_type)
+            VALUES (
+                '🛑 Pompe ID ' || pump_record.id || ' arrêtée pour faire place à la nouvelle planification ' || NEW.id,
+                'warning'
+            );
+
+            -- C) Démarrer la pompe pour la NOUVELLE planification
+            UPDATE pumps
+               SET is_on           = TRUE,
+                   status          = 'running',
+                   last_start_time = NOW(),
+                   last_activated  = NOW()
+             WHERE id = pump_record.id;
+
+            INSERT INTO notifications (message, notification_type)
+            VALUES (
+                '🚰 Pompe ID ' || pump_record.id || ' démarrée pour le champ ' || NEW.field_id || ' (planning ' || NEW.id || ')',
+                'info'
+            );
+        END LOOP;
+    END IF;
+
+    -- 🛑 2) Si la planification passe à "completed" ou "cancelled"
+    IF NEW.status IN ('completed', 'cancelled') THEN
+        FOR pump_record IN
+            SELECT p.id
+              FROM pumps p
+              JOIN schedule_pumps sp ON p.id = sp.pump_id
+             WHERE sp.schedule_id = NEW.id
+               AND p.status = 'running'
+        LOOP
+            UPDATE pumps
+               SET is_on            = FALSE,
+                   status           = 'idle',
+                   total_usage_time = total_usage_time
+                                      + EXTRACT(EPOCH FROM (NOW() - last_start_time)) / 3600,
+                   last_start_time  = NULL
+             WHERE id = pump_record.id;
+
+            INSERT INTO notifications (message, notification_type)
+            VALUES (
+                '🛑 Pompe ID ' || pump_record.id || ' arrêtée pour le champ ' || NEW.field_id || ' (planning ' || NEW.id || ')',
+                'warning'
+            );
+        END LOOP;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def measure(conn, pump_count, legacy):
+    """Retourne (durée in_progress, durée completed) en millisecondes."""
+    with conn.cursor() as cursor:
+        try:
+            if legacy:
+                cursor.execute(LEGACY_TRIGGER_FUNCTION)
+            cursor.execute("""
+                INSERT INTO pumps (name, field_id)
+                SELECT 'bench-' || g, 0 FROM generate_series(1, %s) AS g
+                RETURNING id;
+            """, (pump_count,))
+            pump_ids = [row["id"] for row in cursor.fetchall()]
+            cursor.execute("""
+                INSERT INTO schedules (field_id, start_date, start_time, duration, status, flow_rate)
+                VALUES (0, CURRENT_DATE, LOCALTIME, INTERVAL '30 minutes', 'planned', 10)
+                RETURNING id;
+            """)
+            schedule_id = cursor.fetchone()["id"]
+            cursor.execute("""
+                INSERT INTO schedule_pumps (pump_id, schedule_id)
+                SELECT unnest(%s::int[]), %s;
+            """, (pump_ids, schedule_id))
+
+            timings = []
+            for status in ("in_progress", "completed"):
+                start = time.perf_counter()
+                cursor.execute("UPDATE schedules SET status = %s WHERE id = %s;", (status, schedule_id))
+                timings.append((time.perf_counter() - start) * 1000)
+            return timings
+        finally:
+            conn.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pumps", type=int, nargs="+", default=[1, 10, 50, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    if not conn:
+        raise SystemExit("❌ Impossible de se connecter à la base de données.")
+
+    try:
+        print(f"{'pompes':>8} | {'version':>10} | {'in_progress (ms)':>17} | {'completed (ms)':>15}")
+        for pump_count in args.pumps:
+            for legacy in (True, False):
+                runs = [measure(conn, pump_count, legacy) for _ in range(args.repeat)]
+                start_ms = statistics.median(run[0] for run in runs)
+                stop_ms = statistics.median(run[1] for run in runs)
+                label = "boucle" if legacy else "ensemble"
+                print(f"{pump_count:>8} | {label:>10} | {start_ms:>17.2f} | {stop_ms:>15.2f}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
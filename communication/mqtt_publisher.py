@@ -1,7 +1,13 @@
+import logging
 import paho.mqtt.client as mqtt
 import json
 import time
+from communication.sensor_liveness import SensorLivenessTracker
 from inference.inference_engine import InferenceEngine
+from utils.logging_config import setup_logging
+from utils.metrics import MQTT_MESSAGES
+
+logger = logging.getLogger(__name__)
 
 # Configuration du broker MQTT
 BROKER_ADDRESS = "localhost"
@@ -24,35 +30,47 @@ def generate_topic(base, sensor_type, location, data_type):
 # Initialisation du moteur d'inférence
 inference_engine = InferenceEngine("../data/model.pkl")
 
-# Gestion des états des capteurs
-sensor_status = {}
 sensor_data = {}  # Stockage des dernières données reçues
-SENSOR_TIMEOUT = 60  # Temps en secondes avant de considérer un capteur comme inactif
+
+
+def drop_inactive_sensors(sensor_ids):
+    """Oublie les dernières données des capteurs devenus inactifs."""
+    for sensor_id in sensor_ids:
+        sensor_data.pop(sensor_id, None)
+
+
+# Suivi de l'activité des capteurs (roue temporelle, statut `sensors.status` écrit par lots)
+sensor_liveness = SensorLivenessTracker(on_expired=drop_inactive_sensors)
 
 
 def on_connect(client, userdata, flags, rc, properties=None):
     if rc == 0:
-        print("👌 Connexion réussie au broker MQTT")
+        logger.info("👌 Connexion réussie au broker MQTT")
         client.subscribe("irrigation_system/+/sensors")  # Souscription à tous les capteurs
     else:
-        print(f"❌ Échec de connexion au broker MQTT, code de retour : {rc}")
+        logger.error("❌ Échec de connexion au broker MQTT, code de retour : %s", rc)
 
 
 # Callback lors de la réception de données
 def on_message(client, userdata, msg):
+    MQTT_MESSAGES.labels("decision", "received").inc()
     try:
         if not msg.payload:
-            print("⚠️ Données MQTT vides reçues.")
+            MQTT_MESSAGES.labels("decision", "dropped").inc()
+            logger.warning("⚠️ Données MQTT vides reçues.")
             return
 
         payload = json.loads(msg.payload.decode())
         sensor_id = payload.get("sensor_id", "unknown")
-        timestamp = time.time()
 
-        # Mise à jour du statut du capteur
-        sensor_status[sensor_id] = timestamp
-        sensor_data[sensor_id] = payload  # Stockage des données brutes du capteur
-        print(f"📥 Données reçues de {sensor_id}: {payload}")
+        # Mise à jour du statut du capteur (identifiants numériques de la table `sensors`)
+        try:
+            sensor_id = int(sensor_id)
+            sensor_liveness.heartbeat(sensor_id)
+        except (TypeError, ValueError):
+            pass
+        sensor_data[sensor_id] = (time.time(), payload)  # Stockage des données brutes du capteur
+        logger.info("📥 Données reçues de %s", sensor_id, extra={"sample": "ingest"})
 
         # Extraction des caractéristiques pour l'inférence
         features = [
@@ -66,7 +84,7 @@ def on_message(client, userdata, msg):
 
         # Lancer l'inférence automatiquement
         decision = inference_engine.predict_action(features)
-        print(f"🤖 Décision prise : {decision}")
+        logger.debug("🤖 Décision prise pour %s : %s", sensor_id, decision)
 
         # Générer le topic de réponse dynamiquement
         response_topic = generate_topic("irrigation_system", sensor_id, "decision")
@@ -74,22 +92,15 @@ def on_message(client, userdata, msg):
         # Publier la décision sur un topic MQTT
         response_payload = json.dumps({"sensor_id": sensor_id, "decision": decision})
         client.publish(response_topic, response_payload)
-        print(f"📤 Décision envoyée pour {sensor_id} sur {response_topic}: {response_payload}")
+        logger.debug("📤 Décision envoyée pour %s sur %s", sensor_id, response_topic)
+        MQTT_MESSAGES.labels("decision", "processed").inc()
 
     except json.JSONDecodeError:
-        print("⚠️ Erreur : Données JSON invalides.")
+        MQTT_MESSAGES.labels("decision", "dropped").inc()
+        logger.warning("⚠️ Erreur : Données JSON invalides.")
     except Exception as e:
-        print(f"⚠️ Erreur lors du traitement des données : {e}")
-
-
-# Fonction de vérification des capteurs inactifs
-def check_sensor_status():
-    current_time = time.time()
-    for sensor, last_seen in list(sensor_status.items()):
-        if current_time - last_seen > SENSOR_TIMEOUT:
-            print(f"❌ Capteur {sensor} inactif depuis {SENSOR_TIMEOUT} secondes.")
-            del sensor_status[sensor]
-            del sensor_data[sensor]
+        MQTT_MESSAGES.labels("decision", "dropped").inc()
+        logger.warning("⚠️ Erreur lors du traitement des données : %s", e)
 
 
 # Fonction pour récupérer les dernières données des capteurs
@@ -103,10 +114,10 @@ def get_latest_sensor_data():
 
     return {
         sensor_id: {
-            "timestamp": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(sensor_status[sensor_id])),
+            "timestamp": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(received_at)),
             "data": data
         }
-        for sensor_id, data in sensor_data.items()
+        for sensor_id, (received_at, data) in list(sensor_data.items())
     }
 
 
@@ -120,8 +131,10 @@ client.connect(BROKER_ADDRESS, BROKER_PORT)
 
 # Boucle infinie pour écouter les messages et surveiller les capteurs
 if __name__ == "__main__":
-    print("🚀 Démarrage de l'écoute MQTT...")
-    while True:
-        client.loop(timeout=1.0)
-        check_sensor_status()
-        time.sleep(5)
\ No newline at end of file
+    setup_logging()
+    logger.info("🚀 Démarrage de l'écoute MQTT...")
+    sensor_liveness.start()
+    try:
+        client.loop_forever()
+    finally:
+        sensor_liveness.stop()
\ No newline at end of file
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+from collections import deque
+
+import psycopg2
+import psycopg2.extensions
+
+from database.database import get_db_connection
+from utils.metrics import NOTIFICATION_SUBSCRIBERS
+
+logger = logging.getLogger(__name__)
+
+# 📌 Canal alimenté par le trigger `notify_new_notifications` (schema.sql)
+NOTIFICATION_CHANNEL = "new_notifications"
+# 📌 Notifications récentes gardées en mémoire pour la reprise sans requête
+REPLAY_BUFFER_SIZE = int(os.getenv("NOTIFICATION_REPLAY_BUFFER", "1000"))
+# 📌 Au-delà, un client trop lent est déconnecté (il reprendra depuis son dernier ID)
+SUBSCRIBER_MAX_PENDING = int(os.getenv("NOTIFICATION_SUBSCRIBER_MAX_PENDING", "1000"))
+# 📌 Marge de relecture : une transaction plus ancienne peut valider après une plus récente
+REORDER_WINDOW = 100
+FETCH_BATCH_SIZE = 1000
+MAX_IDLE_SECONDS = 30.0
+RECONNECT_DELAY_SECONDS = 5.0
+
+
+def serialize_notification(row):
+    """🧾 Sérialise une notification une seule fois pour tous les clients."""
+    return row["id"], json.dumps({
+        "id": row["id"],
+        "message": row["message"],
+        "notification_type": row["notification_type"],
+        "timestamp": row["timestamp"].isoformat() if row["timestamp"] else None,
+        "read": row["read"],
+        "occurrences": row.get("occurrences", 1),
+    }, ensure_ascii=False)
+
+
+class Subscription:
+    """📡 File d'attente d'un client connecté (alimentée depuis la boucle asyncio)."""
+
+    def __init__(self):
+        self._events = deque()
+        self._ready = asyncio.Event()
+        self.overflowed = False
+
+    def push(self, events):
+        if self.overflowed:
+            return
+        self._events.extend(events)
+        if len(self._events) > SUBSCRIBER_MAX_PENDING:
+            self._events.clear()
+            self.overflowed = True
+        self._ready.set()
+
+    async def next_batch(self, timeout):
+        """⏳ Renvoie les événements en attente (liste vide si `timeout` expire)."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        events = list(self._events)
+        self._events.clear()
+        return events
+
+
+class NotificationHub:
+    """
+    📢 Diffusion des notifications aux tableaux de bord connectés.
+
+    Un seul thread par worker écoute PostgreSQL (LISTEN), relit les nouvelles lignes
+    en une requête, les sérialise une fois puis les distribue à tous les abonnés sur
+    la boucle asyncio (un seul rappel par lot). Les notifications récentes restent en
+    mémoire pour permettre aux clients de reprendre à partir de leur dernier ID.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._recent = deque(maxlen=REPLAY_BUFFER_SIZE)
+        self._recent_ids = set()
+        self._recent_lock = threading.Lock()
+        self._last_id = None
+        self._loop = None
+        self._stop = threading.Event()
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread = None
+
+    # =========================================
+    # 👥 ABONNEMENTS
+    # =========================================
+    def subscribe(self):
+        subscription = Subscription()
+        self._subscribers.add(subscription)
+        NOTIFICATION_SUBSCRIBERS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        if subscription in self._subscribers:
+            self._subscribers.discard(subscription)
+            NOTIFICATION_SUBSCRIBERS.dec()
+
+    def replay_from_memory(self, last_id):
+        """
+        🔁 Notifications d'ID > `last_id` si le tampon mémoire couvre la période,
+        sinon None (l'appelant relit alors la base).
+        """
+        with self._recent_lock:
+            if self._last_id is None:
+                return None
+            if last_id >= self._last_id:
+                return []
+            recent = list(self._recent)
+        if recent and recent[0][0] <= last_id + 1:
+            return [event for event in recent if event[0] > last_id]
+        return None
+
+    def _fanout(self, events):
+        for subscription in list(self._subscribers):
+            subscription.push(events)
+
+    # =========================================
+    # 🎧 ÉCOUTE POSTGRESQL
+    # =========================================
+    def _fetch_new(self, cursor):
+        events = []
+        limit = FETCH_BATCH_SIZE + REORDER_WINDOW
+        while True:
+            cursor.execute("""
+                SELECT id, message, notification_type, timestamp, read, occurrences
+                  FROM notifications
+                 WHERE id > %s AND active = TRUE
+                 ORDER BY id
+                 LIMIT %s;
+            """, (max(self._last_id - REORDER_WINDOW, 0), limit))
+            rows = cursor.fetchall()
+            for row in rows:
+                if row["id"] in self._recent_ids:
+                    continue
+                event = serialize_notification(row)
+                with self._recent_lock:
+                    if len(self._recent) == self._recent.maxlen:
+                        self._recent_ids.discard(self._recent[0][0])
+                    self._recent.append(event)
+                    self._recent_ids.add(event[0])
+                    self._last_id = max(self._last_id, event[0])
+                events.append(event)
+            if len(rows) < limit:
+                return events
+
+    def _run_connected(self):
+        conn = get_db_connection()
+        if not conn:
+            raise psycopg2.OperationalError("❌ Impossible de se connecter à la base de données.")
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {NOTIFICATION_CHANNEL};")
+                if self._last_id is None:
+                    cursor.execute("SELECT COALESCE(MAX(id), 0) AS max_id FROM notifications;")
+                    self._last_id = cursor.fetchone()["max_id"]
+                    self._fetch_new(cursor)  # Amorce du tampon de reprise, sans diffusion
+                pending = True  # Rattrapage après (re)connexion
+                while not self._stop.is_set():
+                    if pending:
+                        events = self._fetch_new(cursor)
+                        if events:
+                            self._loop.call_soon_threadsafe(self._fanout, events)
+                    ready, _, _ = select.select([conn, self._wake_r], [], [], MAX_IDLE_SECONDS)
+                    if self._wake_r in ready:
+                        os.read(self._wake_r, 1024)
+                    pending = conn in ready
+                    if pending:
+                        conn.poll()
+                        conn.notifies.clear()
+        finally:
+            conn.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._run_connected()
+            except psycopg2.Error as e:
+                logger.error("❌ Écoute des notifications interrompue, reconnexion dans %ss : %s",
+                             RECONNECT_DELAY_SECONDS, e)
+                self._stop.wait(RECONNECT_DELAY_SECONDS)
+
+    def start(self, loop):
+        """▶️ Démarre l'écoute PostgreSQL (un thread par worker de l'API)."""
+        self._loop = loop
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="notification-hub", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """⏹️ Arrête l'écoute."""
+        self._stop.set()
+        os.write(self._wake_w, b"x")
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+# ✅ Diffuseur partagé par les routes du worker
+notification_hub = NotificationHub()
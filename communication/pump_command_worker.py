@@ -0,0 +1,323 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import select
+import threading
+import time
+import uuid
+
+import paho.mqtt.client as mqtt
+import psycopg2
+import psycopg2.extensions
+
+from database.database import get_db_connection
+from utils.logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# Configuration du broker MQTT
+MQTT_BROKER = os.getenv("MQTT_BROKER", "localhost")
+MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
+
+# 📌 Topics : commande publiée vers la pompe, accusé de réception renvoyé par la pompe
+#    ack attendu : {"command_id": <id>, "status": "ok" | "error", "error": "<message>"}
+COMMAND_TOPIC = "irrigation_system/pumps/{pump_id}/command"
+ACK_TOPIC = "irrigation_system/pumps/+/ack"
+
+# 📌 Canal alimenté par le trigger `notify_pump_commands` (schema.sql)
+COMMAND_CHANNEL = "pump_commands"
+BATCH_SIZE = int(os.getenv("PUMP_COMMAND_BATCH_SIZE", "500"))
+ACK_TIMEOUT_SECONDS = float(os.getenv("PUMP_COMMAND_ACK_TIMEOUT_SECONDS", "5"))
+MAX_ATTEMPTS = int(os.getenv("PUMP_COMMAND_MAX_ATTEMPTS", "3"))
+# 📌 Une commande réclamée mais non terminée après ce délai (worker arrêté) est réclamée à nouveau
+LEASE_SECONDS = float(os.getenv("PUMP_COMMAND_LEASE_SECONDS", str(2 * ACK_TIMEOUT_SECONDS * MAX_ATTEMPTS)))
+# 📌 Attente maximale sans notification avant de revérifier la file
+POLL_INTERVAL_SECONDS = 5.0
+RECONNECT_DELAY_SECONDS = 5.0
+
+
+class AckWaiter:
+    """📬 Accusés de réception reçus par le thread MQTT, attendus par le worker."""
+
+    def __init__(self):
+        self._acks = {}
+        self._expected = set()
+        self._condition = threading.Condition()
+
+    def expect(self, command_ids):
+        with self._condition:
+            self._expected.update(command_ids)
+
+    def resolve(self, command_id, ack):
+        with self._condition:
+            if command_id in self._expected:
+                self._acks[command_id] = ack
+                self._condition.notify_all()
+
+    def wait(self, command_ids, timeout):
+        """⏳ Attend les accusés de `command_ids` jusqu'à `timeout` ; renvoie ceux reçus."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                received = {c: self._acks[c] for c in command_ids if c in self._acks}
+                remaining = deadline - time.monotonic()
+                if len(received) == len(command_ids) or remaining <= 0:
+                    return received
+                self._condition.wait(remaining)
+
+    def forget(self, command_ids):
+        with self._condition:
+            for command_id in command_ids:
+                self._expected.discard(command_id)
+                self._acks.pop(command_id, None)
+
+
+class PumpCommandWorker:
+    """
+    🛠️ Worker de la file `pump_commands`.
+
+    Chaque cycle réclame un lot de commandes avec `FOR UPDATE SKIP LOCKED` et les passe
+    à 'dispatching' dans une transaction courte (plusieurs workers ne traitent jamais
+    la même commande, et une seule commande par pompe est en cours à la fois). Les
+    commandes sont publiées en MQTT et les accusés de réception attendus (délai et
+    nouvelles tentatives bornés) hors transaction, puis une seconde transaction
+    enregistre l'état des pompes acquittées et le résultat des commandes. Si le worker
+    s'arrête brutalement, ses commandes sont réclamées à nouveau après `LEASE_SECONDS`.
+    """
+
+    def __init__(self, name=None):
+        self.name = name or f"pump-worker-{uuid.uuid4().hex[:8]}"
+        self.acks = AckWaiter()
+        self._stop = threading.Event()
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=self.name)
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+
+    # =========================================
+    # 📡 MQTT
+    # =========================================
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None):
+        if reason_code == 0:
+            logger.info("👌 %s connecté au broker MQTT", self.name)
+            client.subscribe(ACK_TOPIC, qos=1)
+        else:
+            logger.error("❌ Échec de connexion au broker MQTT, code de retour : %s", reason_code)
+
+    def _on_message(self, client, userdata, msg):
+        try:
+            ack = json.loads(msg.payload.decode())
+            self.acks.resolve(int(ack["command_id"]), ack)
+        except (ValueError, KeyError, TypeError):
+            logger.warning("⚠️ Accusé de réception invalide sur %s", msg.topic)
+
+    def _dispatch(self, commands):
+        """📤 Publie les commandes et renvoie `(accusés reçus, nombre de tentatives)` par commande."""
+        by_id = {c["id"]: c for c in commands}
+        attempts = dict.fromkeys(by_id, 0)
+        self.acks.expect(by_id)
+        try:
+            pending = list(by_id)
+            for _ in range(MAX_ATTEMPTS):
+                for command_id in pending:
+                    command = by_id[command_id]
+                    attempts[command_id] += 1
+                    self.client.publish(
+                        COMMAND_TOPIC.format(pump_id=command["pump_id"]),
+                        json.dumps({"command_id": command_id, "command": command["command"]}),
+                        qos=1,
+                    )
+                received = self.acks.wait(list(by_id), ACK_TIMEOUT_SECONDS)
+                pending = [command_id for command_id in by_id if command_id not in received]
+                if not pending:
+                    break
+            return received, attempts
+        finally:
+            self.acks.forget(by_id)
+
+    # =========================================
+    # 🗄️ FILE DE COMMANDES
+    # =========================================
+    def _claim(self, cursor):
+        """📥 Passe un lot de commandes à 'dispatching' (bail de `LEASE_SECONDS` au nom du worker)."""
+        cursor.execute("""
+            WITH claimable AS (
+                SELECT c.id
+                  FROM pump_commands c
+                 WHERE (c.status = 'pending'
+                        OR (c.status = 'dispatching'
+                            AND c.claimed_at < NOW() - make_interval(secs => %(lease)s)))
+                   AND NOT EXISTS (
+                        SELECT 1
+                          FROM pump_commands earlier
+                         WHERE earlier.pump_id = c.pump_id
+                           AND earlier.status IN ('pending', 'dispatching')
+                           AND earlier.id < c.id
+                   )
+                 ORDER BY c.id
+                 LIMIT %(limit)s
+                   FOR UPDATE SKIP LOCKED
+            )
+            UPDATE pump_commands c
+               SET status     = 'dispatching',
+                   claimed_at = NOW(),
+                   claimed_by = %(worker)s
+              FROM claimable
+             WHERE c.id = claimable.id
+            RETURNING c.id, c.pump_id, c.command;
+        """, {"lease": LEASE_SECONDS, "limit": BATCH_SIZE, "worker": self.name})
+        return cursor.fetchall()
+
+    def _complete(self, cursor, commands, received, attempts):
+        results = []
+        for c in commands:
+            ack = received.get(c["id"])
+            if ack is not None and ack.get("status") == "ok":
+                results.append((c["id"], "acked", None))
+            else:
+                results.append((c["id"], "failed",
+                                ack.get("error", "refusée par la pompe") if ack is not None else "aucun accusé de réception"))
+
+        # Résultat enregistré seulement pour les commandes dont le worker détient encore le bail
+        cursor.execute("""
+            UPDATE pump_commands c
+               SET status       = v.status,
+                   attempts     = c.attempts + v.attempts,
+                   completed_at = NOW(),
+                   last_error   = v.error
+              FROM unnest(%s::bigint[], %s::text[], %s::int[], %s::text[]) AS v(id, status, attempts, error)
+             WHERE c.id = v.id
+               AND c.status = 'dispatching'
+               AND c.claimed_by = %s
+            RETURNING c.id, c.pump_id, c.command, c.status, c.last_error;
+        """, (
+            [command_id for command_id, _, _ in results],
+            [status for _, status, _ in results],
+            [attempts[command_id] for command_id, _, _ in results],
+            [error for _, _, error in results],
+            self.name,
+        ))
+        completed = sorted(cursor.fetchall(), key=lambda c: c["id"])
+        acked = [c for c in completed if c["status"] == "acked"]
+        failed = [c for c in completed if c["status"] == "failed"]
+        errors = [c["last_error"] for c in failed]
+        if len(completed) < len(commands):
+            logger.warning("⚠️ %s : %d commandes réclamées par un autre worker (bail expiré).",
+                           self.name, len(commands) - len(completed))
+
+        if acked:
+            # État des pompes enregistré uniquement après acquittement du matériel
+            cursor.execute("""
+                UPDATE pumps p
+                   SET is_on            = v.command = 'on',
+                       status           = CASE WHEN v.command = 'on' THEN 'running' ELSE 'idle' END,
+                       total_usage_time = p.total_usage_time
+                                          + CASE WHEN v.command = 'off' AND p.last_start_time IS NOT NULL
+                                                 THEN EXTRACT(EPOCH FROM (NOW() - p.last_start_time)) / 3600
+                                                 ELSE 0 END,
+                       last_start_time  = CASE WHEN v.command = 'on' THEN NOW() END,
+                       last_activated   = CASE WHEN v.command = 'on' THEN NOW() ELSE p.last_activated END
+                  FROM unnest(%s::int[], %s::text[]) AS v(pump_id, command)
+                 WHERE p.id = v.pump_id;
+            """, ([c["pump_id"] for c in acked], [c["command"] for c in acked]))
+
+        if failed:
+            # Échecs répétés d'une même pompe regroupés dans la fenêtre de déduplication
+            cursor.execute("""
+                SELECT coalesce_notifications(
+                           array_agg('⚠️ Commande ''' || v.command || ''' non exécutée par la pompe ID '
+                                     || v.pump_id || ' : ' || v.error ORDER BY v.ord),
+                           array_agg('warning'::text ORDER BY v.ord),
+                           array_agg('pump:' || v.pump_id || ':command_failed' ORDER BY v.ord)
+                       )
+                  FROM unnest(%s::int[], %s::text[], %s::text[]) WITH ORDINALITY AS v(pump_id, command, error, ord);
+            """, ([c["pump_id"] for c in failed], [c["command"] for c in failed], errors))
+        return len(acked), len(failed)
+
+    def run_once(self):
+        """🔁 Traite un lot de commandes ; renvoie le nombre de commandes traitées."""
+        conn = get_db_connection()
+        if not conn:
+            raise psycopg2.OperationalError("❌ Impossible de se connecter à la base de données.")
+        try:
+            # Réclamation validée aussitôt : aucun verrou n'est conservé pendant l'envoi MQTT
+            with conn.cursor() as cursor:
+                commands = self._claim(cursor)
+            conn.commit()
+            if not commands:
+                return 0
+            received, attempts = self._dispatch(commands)
+            with conn.cursor() as cursor:
+                acked, failed = self._complete(cursor, commands, received, attempts)
+            conn.commit()
+            logger.info("📨 %s : %d commandes acquittées, %d en échec.", self.name, acked, failed)
+            return len(commands)
+        except psycopg2.Error:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # =========================================
+    # 🔁 BOUCLE PRINCIPALE
+    # =========================================
+    def _listen_connection(self):
+        conn = get_db_connection()
+        if not conn:
+            raise psycopg2.OperationalError("❌ Impossible de se connecter à la base de données.")
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {COMMAND_CHANNEL};")
+        return conn
+
+    def _run_connected(self):
+        listen_conn = self._listen_connection()
+        try:
+            while not self._stop.is_set():
+                # Vider la file tant que des lots complets sont réclamés
+                while self.run_once() >= BATCH_SIZE and not self._stop.is_set():
+                    pass
+                if select.select([listen_conn], [], [], POLL_INTERVAL_SECONDS)[0]:
+                    listen_conn.poll()
+                    listen_conn.notifies.clear()
+        finally:
+            listen_conn.close()
+
+    def run_forever(self):
+        """🚀 Boucle du worker (reconnexion en cas d'erreur PostgreSQL)."""
+        self.client.connect(MQTT_BROKER, MQTT_PORT)
+        self.client.loop_start()
+        try:
+            while not self._stop.is_set():
+                try:
+                    self._run_connected()
+                except psycopg2.Error as e:
+                    logger.error("❌ Erreur du worker %s, reconnexion dans %ss : %s", self.name, RECONNECT_DELAY_SECONDS, e)
+                    self._stop.wait(RECONNECT_DELAY_SECONDS)
+        finally:
+            self.client.loop_stop()
+            self.client.disconnect()
+
+    def stop(self):
+        self._stop.set()
+
+
+def _run_worker(index):
+    setup_logging()
+    PumpCommandWorker(f"pump-worker-{os.getpid()}-{index}").run_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Workers de la file de commandes des pompes")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("PUMP_COMMAND_WORKERS", "1")))
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        _run_worker(0)
+    else:
+        processes = [multiprocessing.Process(target=_run_worker, args=(i,), daemon=True) for i in range(args.workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
@@ -0,0 +1,136 @@
+import logging
+import os
+import threading
+
+import psycopg2
+
+from models.sensorsReadingsModel import SensorReadingsModel
+from utils.metrics import MQTT_MESSAGES
+
+logger = logging.getLogger(__name__)
+
+# 📌 Les mesures reçues en MQTT sont enregistrées par lots
+INGEST_FLUSH_INTERVAL_SECONDS = float(os.getenv("SENSOR_INGEST_FLUSH_SECONDS", "0.5"))
+INGEST_BATCH_SIZE = int(os.getenv("SENSOR_INGEST_BATCH_SIZE", "1000"))
+# 📌 Au-delà, les mesures les plus anciennes sont abandonnées (base indisponible)
+INGEST_MAX_BUFFERED = int(os.getenv("SENSOR_INGEST_MAX_BUFFERED", "100000"))
+
+
+class SensorReadingBuffer:
+    """
+    📥 Ingestion groupée des messages des capteurs reçus en MQTT.
+
+    `record()` ajoute le message validé à un tampon ; un thread le traite par lots de
+    `INGEST_BATCH_SIZE` messages : inspection (`inspect_readings`, une seule fois par
+    message) puis écriture (`save_inspected_readings`, une transaction par lot). Base
+    indisponible : les lots non écrits sont remis en tête du tampon, sans être inspectés
+    à nouveau. Lot refusé (donnée invalide) : il est réécrit par moitiés jusqu'à isoler
+    les messages fautifs, seuls abandonnés.
+    """
+
+    def __init__(self, flush_interval=INGEST_FLUSH_INTERVAL_SECONDS, batch_size=INGEST_BATCH_SIZE):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending = []
+        self._inspected = []  # Messages inspectés restant à écrire (réessayés en premier)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, reading):
+        """➕ Ajoute un message `SensorReading` au tampon (aucun accès à la base)."""
+        with self._lock:
+            if len(self._pending) >= INGEST_MAX_BUFFERED:
+                dropped = len(self._pending) // 10
+                del self._pending[:dropped]
+                MQTT_MESSAGES.labels("measurement", "dropped").inc(dropped)
+                logger.warning("⚠️ Tampon des mesures plein, %d messages les plus anciens abandonnés.", dropped)
+            self._pending.append(reading)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _requeue(self, readings, inspected=()):
+        with self._lock:
+            self._pending[:0] = readings
+            self._inspected[:0] = inspected
+
+    def _save(self, inspected):
+        """
+        💾 Enregistre un lot de messages inspectés ; renvoie ceux restant à écrire si la
+        base est indisponible (liste vide sinon).
+        """
+        pending = [inspected]
+        while pending:
+            chunk = pending.pop()
+            try:
+                result = SensorReadingsModel.save_inspected_readings(chunk)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                logger.error("❌ Enregistrement des mesures impossible, nouvel essai au prochain cycle : %s", e)
+                pending.append(chunk)
+                return [entry for part in reversed(pending) for entry in part]
+            if result is not None:
+                MQTT_MESSAGES.labels("measurement", "processed").inc(len(chunk))
+            elif len(chunk) == 1:
+                MQTT_MESSAGES.labels("measurement", "dropped").inc()
+                logger.error("❌ Message du capteur %s refusé par la base, abandonné.", chunk[0][0])
+            else:
+                middle = len(chunk) // 2
+                pending.extend((chunk[middle:], chunk[:middle]))
+        return []
+
+    def flush(self):
+        """💾 Enregistre tous les messages en attente, lot par lot."""
+        with self._lock:
+            readings, self._pending = self._pending, []
+            inspected, self._inspected = self._inspected, []
+        # Messages déjà inspectés lors d'un cycle précédent
+        for start in range(0, len(inspected), self.batch_size):
+            remaining = self._save(inspected[start:start + self.batch_size])
+            if remaining:
+                self._requeue(readings, remaining + inspected[start + self.batch_size:])
+                return False
+        for start in range(0, len(readings), self.batch_size):
+            chunk = readings[start:start + self.batch_size]
+            try:
+                entries, _ = SensorReadingsModel.inspect_readings(chunk)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                logger.error("❌ Lecture du statut des capteurs impossible, nouvel essai au prochain cycle : %s", e)
+                self._requeue(readings[start:])
+                return False
+            # Messages de capteurs inactifs ou inconnus : traités (ignorés), comme par /bulk
+            MQTT_MESSAGES.labels("measurement", "processed").inc(len(chunk) - len(entries))
+            remaining = self._save(entries)
+            if remaining:
+                self._requeue(readings[start + self.batch_size:], remaining)
+                return False
+        return True
+
+    # =========================================
+    # 🔁 THREAD D'ÉCRITURE
+    # =========================================
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+        self.flush()
+
+    def start(self):
+        """▶️ Démarre le thread d'écriture."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="mqtt-measurement-ingest", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """⏹️ Arrête le thread après une dernière écriture."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+# ✅ Tampon partagé par l'API (démarré au lancement de l'application)
+sensor_ingest = SensorReadingBuffer()
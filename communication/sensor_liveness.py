@@ -0,0 +1,251 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import psycopg2
+
+from database.database import get_db_connection, get_db_cursor
+from utils.timing_wheel import TimingWheel
+
+logger = logging.getLogger(__name__)
+
+# 📌 Un capteur silencieux au-delà de ce délai passe `inactive`
+SENSOR_TIMEOUT_SECONDS = float(os.getenv("SENSOR_TIMEOUT_SECONDS", "60"))
+# 📌 Résolution de la roue temporelle (retard maximal de détection)
+LIVENESS_TICK_SECONDS = float(os.getenv("SENSOR_LIVENESS_TICK_SECONDS", "1"))
+# 📌 Fréquence d'écriture des changements de statut
+LIVENESS_FLUSH_INTERVAL_SECONDS = float(os.getenv("SENSOR_LIVENESS_FLUSH_SECONDS", "2"))
+# 📌 `sensors.last_seen_at` est réécrit au plus une fois par intervalle (inférieur au délai d'inactivité)
+LAST_SEEN_FLUSH_INTERVAL_SECONDS = float(os.getenv("SENSOR_LAST_SEEN_FLUSH_SECONDS", "15"))
+RECONNECT_DELAY_SECONDS = 5.0
+
+
+class SensorLivenessTracker:
+    """
+    💓 Suivi de l'activité des capteurs.
+
+    `heartbeat()` ne touche pas la base : il met à jour la date de dernier contact
+    et, si le capteur n'est pas déjà planifié, range son échéance dans une roue
+    temporelle (O(1)). À chaque tick, seules les cases écoulées sont examinées ;
+    un capteur entendu entre-temps est simplement replanifié (au plus une fois par
+    délai d'inactivité), les autres passent `inactive`. Les changements de statut
+    (dans les deux sens) sont écrits en un UPDATE par intervalle, et les dates de
+    dernier contact en un UPDATE moins fréquent.
+
+    Un capteur passé `inactive` par ce suivi est marqué `offline_since` : il
+    redevient `active` dès sa prochaine mesure, contrairement à un capteur
+    désactivé manuellement. Les capteurs en `maintenance` ne sont jamais modifiés.
+    """
+
+    def __init__(self, timeout=SENSOR_TIMEOUT_SECONDS, tick=LIVENESS_TICK_SECONDS,
+                 flush_interval=LIVENESS_FLUSH_INTERVAL_SECONDS,
+                 last_seen_flush_interval=LAST_SEEN_FLUSH_INTERVAL_SECONDS, on_expired=None):
+        """
+        :param on_expired: Appelé (hors verrou) avec la liste des capteurs devenus inactifs.
+        """
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+        self.last_seen_flush_interval = last_seen_flush_interval
+        self.on_expired = on_expired
+        self._wheel = TimingWheel(tick, timeout, time.time())
+        self._last_seen = {}
+        self._alive = set()
+        self._transitions = {}
+        self._dirty = set()
+        self._seeded = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._next_last_seen_flush = time.monotonic() + last_seen_flush_interval
+        self._thread = None
+
+    def heartbeat(self, sensor_id, seen_at=None):
+        """💓 Enregistre un contact avec le capteur (aucun accès à la base)."""
+        seen_at = seen_at or time.time()
+        with self._lock:
+            if seen_at > self._last_seen.get(sensor_id, 0.0):
+                self._last_seen[sensor_id] = seen_at
+                self._dirty.add(sensor_id)
+            if sensor_id not in self._alive:
+                self._alive.add(sensor_id)
+                self._transitions[sensor_id] = "active"
+            if sensor_id not in self._wheel:
+                self._wheel.schedule(sensor_id, self._last_seen[sensor_id] + self.timeout)
+
+    def forget(self, sensor_id):
+        """🗑️ Arrête le suivi d'un capteur (supprimé ou passé en maintenance)."""
+        with self._lock:
+            self._wheel.cancel(sensor_id)
+            self._alive.discard(sensor_id)
+            self._last_seen.pop(sensor_id, None)
+            self._transitions.pop(sensor_id, None)
+            self._dirty.discard(sensor_id)
+
+    def expire(self, now=None):
+        """⏱️ Traite les échéances écoulées ; renvoie les capteurs devenus inactifs."""
+        now = now or time.time()
+        expired = []
+        with self._lock:
+            for sensor_id in self._wheel.advance(now):
+                deadline = self._last_seen.get(sensor_id, 0.0) + self.timeout
+                if deadline > now:
+                    self._wheel.schedule(sensor_id, deadline)  # Entendu depuis sa planification
+                elif sensor_id in self._alive:
+                    self._alive.discard(sensor_id)
+                    self._transitions[sensor_id] = "inactive"
+                    expired.append(sensor_id)
+        if expired:
+            logger.warning("⚠️ %d capteurs sans mesure depuis %ss passent inactifs.", len(expired), self.timeout)
+            if self.on_expired is not None:
+                self.on_expired(expired)
+        return expired
+
+    # =========================================
+    # 📊 ÉTAT
+    # =========================================
+    def last_seen(self, sensor_id):
+        """🕒 Dernier contact connu de ce processus (None si jamais entendu)."""
+        seen_at = self._last_seen.get(sensor_id)
+        return datetime.fromtimestamp(seen_at) if seen_at else None
+
+    def is_alive(self, sensor_id):
+        return sensor_id in self._alive
+
+    def stats(self):
+        """📋 Nombre de capteurs suivis, actifs et de changements en attente d'écriture."""
+        with self._lock:
+            return {
+                "tracked": len(self._last_seen),
+                "alive": len(self._alive),
+                "pending_transitions": len(self._transitions),
+                "timeout_seconds": self.timeout,
+            }
+
+    # =========================================
+    # 💾 BASE DE DONNÉES
+    # =========================================
+    def seed(self):
+        """
+        📥 Reprend les capteurs `active` en base : ceux qui ne se manifestent pas
+        dans le délai d'inactivité (compté depuis leur dernier contact enregistré,
+        ou depuis le démarrage) passeront `inactive`.
+        """
+        cursor, conn = get_db_cursor()
+        if not (cursor and conn):
+            raise psycopg2.OperationalError("❌ Impossible de se connecter à la base de données.")
+        try:
+            cursor.execute("""
+                SELECT id, EXTRACT(EPOCH FROM last_seen_at::timestamptz) AS last_seen
+                  FROM sensors
+                 WHERE status = 'active';
+            """)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+        now = time.time()
+        with self._lock:
+            for row in rows:
+                sensor_id = row["id"]
+                if sensor_id in self._last_seen:
+                    continue
+                self._last_seen[sensor_id] = max(float(row["last_seen"] or 0.0), now - self.timeout / 2)
+                self._alive.add(sensor_id)
+                self._wheel.schedule(sensor_id, self._last_seen[sensor_id] + self.timeout)
+        self._seeded = True
+        logger.info("💓 Suivi d'activité initialisé : %d capteurs actifs.", len(rows))
+
+    def _write(self, transitions, seen):
+        conn = get_db_connection()
+        if not conn:
+            raise psycopg2.OperationalError("❌ Impossible de se connecter à la base de données.")
+        try:
+            with conn.cursor() as cursor:
+                if seen:
+                    cursor.execute("""
+                        UPDATE sensors s
+                           SET last_seen_at = GREATEST(s.last_seen_at, to_timestamp(v.seen)::timestamp)
+                          FROM unnest(%s::int[], %s::float8[]) AS v(id, seen)
+                         WHERE s.id = v.id;
+                    """, (list(seen), list(seen.values())))
+                activated = [sensor_id for sensor_id, status in transitions.items() if status == "active"]
+                if activated:
+                    cursor.execute("""
+                        UPDATE sensors
+                           SET status = 'active', offline_since = NULL
+                         WHERE id = ANY(%s::int[]) AND status = 'inactive' AND offline_since IS NOT NULL;
+                    """, (activated,))
+                deactivated = [sensor_id for sensor_id, status in transitions.items() if status == "inactive"]
+                if deactivated:
+                    # Un autre worker a pu recevoir les mesures : seule la date en base fait foi
+                    cursor.execute("""
+                        UPDATE sensors
+                           SET status = 'inactive', offline_since = LOCALTIMESTAMP
+                         WHERE id = ANY(%s::int[]) AND status = 'active'
+                           AND (last_seen_at IS NULL OR last_seen_at < LOCALTIMESTAMP - make_interval(secs => %s));
+                    """, (deactivated, self.timeout))
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def flush(self, force_last_seen=False):
+        """💾 Écrit les changements de statut et, si l'intervalle est écoulé, les derniers contacts."""
+        now = time.monotonic()
+        with self._lock:
+            transitions, self._transitions = self._transitions, {}
+            seen = {}
+            if force_last_seen or now >= self._next_last_seen_flush:
+                seen = {sensor_id: self._last_seen[sensor_id] for sensor_id in self._dirty if sensor_id in self._last_seen}
+                self._dirty = set()
+                self._next_last_seen_flush = now + self.last_seen_flush_interval
+        if not transitions and not seen:
+            return
+        try:
+            self._write(transitions, seen)
+            logger.debug("💾 %d changements de statut, %d derniers contacts écrits.", len(transitions), len(seen))
+        except psycopg2.Error as e:
+            logger.error("❌ Écriture de l'activité des capteurs échouée, nouvel essai au prochain cycle : %s", e)
+            with self._lock:
+                for sensor_id, status in transitions.items():
+                    self._transitions.setdefault(sensor_id, status)  # Un changement plus récent prime
+                self._dirty.update(seen)
+
+    # =========================================
+    # 🔁 THREAD DE SURVEILLANCE
+    # =========================================
+    def _run(self):
+        next_flush = time.monotonic() + self.flush_interval
+        while not self._stop.wait(self._wheel.tick):
+            try:
+                if not self._seeded:
+                    self.seed()
+                self.expire()
+                if time.monotonic() >= next_flush:
+                    self.flush()
+                    next_flush = time.monotonic() + self.flush_interval
+            except psycopg2.Error as e:
+                logger.error("❌ Suivi d'activité des capteurs interrompu, reprise dans %ss : %s",
+                             RECONNECT_DELAY_SECONDS, e)
+                self._stop.wait(RECONNECT_DELAY_SECONDS)
+        self.flush(force_last_seen=True)
+
+    def start(self):
+        """▶️ Démarre le thread de surveillance."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sensor-liveness", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """⏹️ Arrête le thread après une dernière écriture complète."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+# ✅ Suivi partagé par l'API (démarré au lancement de l'application)
+sensor_liveness = SensorLivenessTracker()
@@ -1,11 +1,18 @@
+import logging
 import os
+import time
 from dotenv import load_dotenv
 import psycopg2
+import psycopg2.extensions
 from psycopg2.extras import RealDictCursor
 
+from utils.metrics import DB_CONNECTIONS_OPENED, DB_CONNECTION_ERRORS, DB_CONNECTIONS_IN_USE, DB_CONNECT_DURATION
+
 # 📌 Charger les variables d'environnement
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # 📌 Récupérer les valeurs du fichier .env
 DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
@@ -16,15 +23,29 @@ DB_PORT = os.getenv("DB_PORT")
 # 📌 Construire l'URL de connexion PostgreSQL
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+
+class TrackedConnection(psycopg2.extensions.connection):
+    """📊 Connexion psycopg2 qui tient à jour la jauge des connexions ouvertes."""
+
+    def close(self):
+        if not self.closed:
+            DB_CONNECTIONS_IN_USE.dec()
+        super().close()
+
+
 # 📌 Connexion psycopg2 pour init_db.py
 def get_db_connection():
     """🔌 Crée une connexion à la base de données PostgreSQL avec psycopg2."""
+    start = time.perf_counter()
     try:
-        conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
-        print("✅ Connexion réussie à la base de données.")
+        conn = psycopg2.connect(DATABASE_URL, connection_factory=TrackedConnection, cursor_factory=RealDictCursor)
+        DB_CONNECT_DURATION.observe(time.perf_counter() - start)
+        DB_CONNECTIONS_OPENED.inc()
+        DB_CONNECTIONS_IN_USE.inc()
         return conn
     except Exception as e:
-        print(f"❌ Erreur de connexion à la base de données: {e}")
+        DB_CONNECTION_ERRORS.inc()
+        logger.error("❌ Erreur de connexion à la base de données: %s", e)
         return None
 
 # 📌 Fonction de récupération d'un curseur pour exécuter des requêtes
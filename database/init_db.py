@@ -1,6 +1,9 @@
+import logging
 import os
 from database.database import get_db_connection
 
+logger = logging.getLogger(__name__)
+
 # 📌 Obtenir le chemin absolu du fichier `schema.sql`
 SCHEMA_FILE = os.path.join(os.path.dirname(__file__), "schema.sql")
 
@@ -8,7 +11,7 @@ def init_database():
     """ Exécute le script SQL `schema.sql` pour créer les tables si elles n'existent pas déjà """
     conn = get_db_connection()
     if conn is None:
-        print("❌ Impossible de se connecter à la base de données.")
+        logger.error("❌ Impossible de se connecter à la base de données.")
         return
 
     cur = conn.cursor()
@@ -18,10 +21,10 @@ def init_database():
             schema_sql = schema_file.read()
             cur.execute(schema_sql)
             conn.commit()
-            print("✅ Base de données initialisée avec succès.")
+            logger.info("✅ Base de données initialisée avec succès.")
     except Exception as e:
         conn.rollback()
-        print(f"❌ Erreur lors de l'initialisation de la base de données: {e}")
+        logger.error("❌ Erreur lors de l'initialisation de la base de données: %s", e)
     finally:
         cur.close()
         conn.close()
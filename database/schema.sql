@@ -36,7 +36,7 @@ CREATE TABLE IF NOT EXISTS pumps (
     elapsed_time FLOAT DEFAULT 0.0,
     last_start_time TIMESTAMP NULL,
     last_activated TIMESTAMP NULL,
-    total_usage_time FLOAT DEFAULT 0.0,
+    total_usage_time FLOAT DEFAULT 0.0, -- En heures (worker de commandes, contrôleur)
     power_consumption FLOAT DEFAULT 0.0,
     maintenance_status VARCHAR(50) NOT NULL DEFAULT 'ok',
     last_maintenance TIMESTAMP NULL
@@ -137,6 +137,110 @@ CREATE TABLE IF NOT EXISTS notifications (
     active BOOLEAN NOT NULL DEFAULT TRUE
 );
 
+-- Pagination par clé (id décroissant) sur les notifications actives
+CREATE INDEX IF NOT EXISTS idx_notifications_active_id
+    ON notifications (id DESC)
+    WHERE active = TRUE;
+-- Compteur de non lues et marquage groupé : seules les lignes actives non lues sont indexées
+CREATE INDEX IF NOT EXISTS idx_notifications_unread
+    ON notifications (active, read, timestamp)
+    WHERE active = TRUE AND read = FALSE;
+
+-- Regroupement des notifications répétées : une clé (ex. 'pump:12:started') identifie
+-- un même événement, répété `occurrences` fois (dernière occurrence `last_occurred_at`)
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS dedup_key TEXT;
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS occurrences INT NOT NULL DEFAULT 1;
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS last_occurred_at TIMESTAMP;
+ALTER TABLE notifications ALTER COLUMN last_occurred_at SET DEFAULT CURRENT_TIMESTAMP;
+CREATE INDEX IF NOT EXISTS idx_notifications_dedup
+    ON notifications (notification_type, dedup_key, last_occurred_at DESC)
+    WHERE active = TRUE AND dedup_key IS NOT NULL;
+
+-- =====================================================
+--  coalesce_notifications : insertion groupée avec déduplication
+--  Les entrées de même (type, clé) sont fusionnées ; si une notification active de
+--  même (type, clé) est survenue dans la fenêtre, son compteur est incrémenté (elle
+--  redevient non lue, avec le dernier message) au lieu d'insérer une nouvelle ligne.
+--  Les entrées sans clé sont toujours insérées. Fenêtre par défaut réglable par base :
+--    ALTER DATABASE <db> SET app.notification_dedup_window = '10 minutes';
+--  Retourne le nombre de lignes insérées.
+-- =====================================================
+CREATE OR REPLACE FUNCTION coalesce_notifications(
+    p_messages TEXT[],
+    p_types TEXT[],
+    p_keys TEXT[],
+    p_counts INT[] DEFAULT NULL,
+    p_window INTERVAL DEFAULT NULL
+)
+RETURNS INT AS $$
+DECLARE
+    v_window INTERVAL := COALESCE(
+        p_window,
+        NULLIF(current_setting('app.notification_dedup_window', TRUE), '')::INTERVAL,
+        INTERVAL '5 minutes'
+    );
+    v_inserted INT;
+BEGIN
+    -- Verrou par (type, clé), pris dans un ordre fixe et avant la recherche (instruction
+    -- distincte, donc nouvel instantané) : deux transactions concurrentes ne créent pas
+    -- deux lignes pour le même événement
+    PERFORM pg_advisory_xact_lock(730002, k.lock_key)
+       FROM (SELECT DISTINCT hashtext(v.notification_type || '|' || v.dedup_key) AS lock_key
+               FROM unnest(p_types, p_keys) AS v(notification_type, dedup_key)
+              WHERE v.dedup_key IS NOT NULL
+              ORDER BY 1) AS k;
+
+    WITH input AS (
+        SELECT v.message, v.notification_type, v.dedup_key, COALESCE(v.occurrences, 1) AS occurrences, v.ord
+          FROM unnest(p_messages, p_types, p_keys, p_counts)
+               WITH ORDINALITY AS v(message, notification_type, dedup_key, occurrences, ord)
+    ), grouped AS (
+        SELECT MIN(ord) AS ord,
+               (array_agg(message ORDER BY ord DESC))[1] AS message,
+               notification_type, dedup_key,
+               SUM(occurrences)::INT AS occurrences
+          FROM input
+         WHERE dedup_key IS NOT NULL
+         GROUP BY notification_type, dedup_key
+    ), matched AS (
+        SELECT g.*, recent.id AS target_id
+          FROM grouped g
+          LEFT JOIN LATERAL (
+                SELECT n.id
+                  FROM notifications n
+                 WHERE n.active = TRUE
+                   AND n.notification_type = g.notification_type
+                   AND n.dedup_key = g.dedup_key
+                   AND n.last_occurred_at >= NOW() - v_window
+                 ORDER BY n.last_occurred_at DESC
+                 LIMIT 1
+          ) AS recent ON TRUE
+    ), bumped AS (
+        UPDATE notifications n
+           SET occurrences      = n.occurrences + m.occurrences,
+               message          = m.message,
+               last_occurred_at = NOW(),
+               read             = FALSE
+          FROM matched m
+         WHERE n.id = m.target_id
+    )
+    INSERT INTO notifications (message, notification_type, dedup_key, occurrences)
+    SELECT message, notification_type, dedup_key, occurrences
+      FROM (
+            SELECT ord, message, notification_type, dedup_key, occurrences
+              FROM matched
+             WHERE target_id IS NULL
+            UNION ALL
+            SELECT ord, message, notification_type, NULL, occurrences
+              FROM input
+             WHERE dedup_key IS NULL
+      ) AS pending
+     ORDER BY ord;
+    GET DIAGNOSTICS v_inserted = ROW_COUNT;
+    RETURN v_inserted;
+END;
+$$ LANGUAGE plpgsql;
+
 
 
 -- =====================================================
@@ -160,90 +264,137 @@ DROP TRIGGER IF EXISTS trigger_manage_pumps ON schedules;
 CREATE OR REPLACE FUNCTION manage_pumps_on_schedule_status()
 RETURNS TRIGGER AS $$
 DECLARE
-    pump_record RECORD;
+    v_inserted INT;
+    v_running INT[];
 BEGIN
+    -- Toutes les opérations sont ensemblistes : le nombre de requêtes exécutées
+    -- ne dépend plus du nombre de pompes liées au planning.
+    -- Les pompes ne sont pas modifiées ici : les démarrages / arrêts passent par la
+    -- file `pump_commands` (enqueue_pump_commands) et l'état des pompes est enregistré
+    -- par le worker après accusé de réception, comme pour les commandes de l'API.
+    -- L'état visé d'une pompe est celui de sa dernière commande non terminée, sinon
+    -- son état actuel ; les pompes sont verrouillées comme dans toggle_pump.
+    PERFORM 1
+       FROM pumps p
+       JOIN schedule_pumps sp ON sp.pump_id = p.id
+      WHERE sp.schedule_id = NEW.id
+      ORDER BY p.id
+        FOR UPDATE OF p;
+
     -- 🚀 1) Si la planification passe à "in_progress"
     IF NEW.status = 'in_progress' THEN
 
-        -- Récupérer toutes les pompes liées à la NOUVELLE planification
-        FOR pump_record IN
-            SELECT p.id
-              FROM pumps p
-              JOIN schedule_pumps sp ON p.id = sp.pump_id
-             WHERE sp.schedule_id = NEW.id
-        LOOP
-            -- A) Trouver si la pompe est déjà 'running' pour un autre planning en "in_progress"
-            --    et, le cas échéant, arrêter cette ancienne planification en la passant à 'completed'.
-            UPDATE schedules s
-               SET status = 'completed'  -- Au lieu de 'cancelled'
-              FROM schedule_pumps sp2
-             WHERE s.id = sp2.schedule_id
-               AND sp2.pump_id = pump_record.id
-               AND s.id <> NEW.id               -- Exclure la planification actuelle
-               AND s.status = 'in_progress';    -- L'autre planning en cours
-
-            -- B) Arrêter physiquement la pompe si elle tourne déjà
-            UPDATE pumps
-               SET is_on            = FALSE,
-                   status           = 'idle',
-                   total_usage_time = total_usage_time
-                                      + EXTRACT(EPOCH FROM (NOW() - last_start_time)) / 3600,
-                   last_start_time  = NULL
-             WHERE id = pump_record.id
-               AND status = 'running';
-
-            --   (On peut éventuellement insérer une notification pour l'arrêt forcé)
-            INSERT INTO notifications (message, notification_type)
-            VALUES (
-                '🛑 Pompe ID ' || pump_record.id || ' arrêtée pour faire place à la nouvelle planification ' || NEW.id,
-                'warning'
-            );
-
-            -- C) Démarrer la pompe pour la NOUVELLE planification
-            UPDATE pumps
-               SET is_on           = TRUE,
-                   status          = 'running',
-                   last_start_time = NOW(),
-                   last_activated  = NOW()
-             WHERE id = pump_record.id;
-
-            INSERT INTO notifications (message, notification_type)
-            VALUES (
-                '🚰 Pompe ID ' || pump_record.id || ' démarrée pour le champ ' || NEW.field_id || ' (planning ' || NEW.id || ')',
-                'info'
-            );
-        END LOOP;
+        -- Pompes déjà visées en marche avant l'arrêt des autres plannings (étape A) :
+        -- elles sont reprises par la nouvelle planification sans être redémarrées
+        SELECT COALESCE(array_agg(p.id), '{}')
+          INTO v_running
+          FROM pumps p
+          JOIN schedule_pumps sp ON sp.pump_id = p.id
+          LEFT JOIN LATERAL (
+                SELECT c.command
+                  FROM pump_commands c
+                 WHERE c.pump_id = p.id AND c.status IN ('pending', 'dispatching')
+                 ORDER BY c.id DESC
+                 LIMIT 1
+          ) AS last_cmd ON TRUE
+         WHERE sp.schedule_id = NEW.id
+           AND COALESCE(last_cmd.command = 'on', p.is_on);
+
+        -- A) Passer à 'completed' les autres plannings "in_progress" qui partagent
+        --    au moins une pompe avec la nouvelle planification (leurs autres pompes
+        --    sont arrêtées par l'appel récursif de ce trigger, branche 2).
+        --    Un planning récurrent repasse à 'planned' (occurrences suivantes conservées).
+        UPDATE schedules s
+           SET status = CASE WHEN s.recurrence_type = 'none' THEN 'completed' ELSE 'planned' END
+         WHERE s.status = 'in_progress'
+           AND s.id <> NEW.id
+           AND EXISTS (
+                SELECT 1
+                  FROM schedule_pumps sp_other
+                  JOIN schedule_pumps sp_new ON sp_new.pump_id = sp_other.pump_id
+                 WHERE sp_other.schedule_id = s.id
+                   AND sp_new.schedule_id = NEW.id
+           );
+
+        -- B) Mettre en file, en une seule requête, le démarrage des autres pompes (hors
+        --    maintenance) de la nouvelle planification, puis enregistrer toutes les
+        --    notifications en un seul appel (regroupées par pompe dans la fenêtre de
+        --    déduplication, voir coalesce_notifications).
+        SELECT coalesce_notifications(
+                   array_agg(n.message ORDER BY n.pump_id, n.notification_type DESC),
+                   array_agg(n.notification_type ORDER BY n.pump_id, n.notification_type DESC),
+                   array_agg(n.dedup_key ORDER BY n.pump_id, n.notification_type DESC)
+               )
+          INTO v_inserted
+          FROM (
+                SELECT r.id AS pump_id,
+                       '🔁 Pompe ID ' || r.id || ' déjà en marche, reprise par la nouvelle planification ' || NEW.id
+                           AS message,
+                       'warning' AS notification_type,
+                       'pump:' || r.id || ':handover' AS dedup_key
+                  FROM unnest(v_running) AS r(id)
+                UNION ALL
+                SELECT q.pump_id,
+                       '🚰 Démarrage de la pompe ID ' || q.pump_id || ' demandé pour le champ ' || NEW.field_id
+                           || ' (planning ' || NEW.id || ')',
+                       'info',
+                       'pump:' || q.pump_id || ':started'
+                  FROM enqueue_pump_commands(ARRAY(
+                        SELECT p.id
+                          FROM pumps p
+                          JOIN schedule_pumps sp ON sp.pump_id = p.id
+                         WHERE sp.schedule_id = NEW.id
+                           AND p.maintenance_status = 'ok'
+                           AND p.id <> ALL(v_running)
+                         ORDER BY p.id
+                  ), 'on') AS q
+          ) AS n;
     END IF;
 
-    -- 🛑 2) Si la planification passe à "completed" ou "cancelled"
-    IF NEW.status IN ('completed', 'cancelled') THEN
-        FOR pump_record IN
-            SELECT p.id
-              FROM pumps p
-              JOIN schedule_pumps sp ON p.id = sp.pump_id
-             WHERE sp.schedule_id = NEW.id
-               AND p.status = 'running'
-        LOOP
-            UPDATE pumps
-               SET is_on            = FALSE,
-                   status           = 'idle',
-                   total_usage_time = total_usage_time
-                                      + EXTRACT(EPOCH FROM (NOW() - last_start_time)) / 3600,
-                   last_start_time  = NULL
-             WHERE id = pump_record.id;
-
-            INSERT INTO notifications (message, notification_type)
-            VALUES (
-                '🛑 Pompe ID ' || pump_record.id || ' arrêtée pour le champ ' || NEW.field_id || ' (planning ' || NEW.id || ')',
-                'warning'
-            );
-        END LOOP;
+    -- 🛑 2) Si la planification passe à "completed" ou "cancelled", ou si un planning
+    --    récurrent termine une occurrence (retour de "in_progress" à "planned") : arrêt
+    --    des pompes visées en marche, sauf celles d'un autre planning "in_progress"
+    IF NEW.status IN ('completed', 'cancelled')
+       OR (OLD.status = 'in_progress' AND NEW.status = 'planned') THEN
+        SELECT coalesce_notifications(
+                   array_agg('🛑 Arrêt de la pompe ID ' || q.pump_id || ' demandé pour le champ ' || NEW.field_id
+                             || ' (planning ' || NEW.id || ')' ORDER BY q.pump_id),
+                   array_agg('warning'::TEXT ORDER BY q.pump_id),
+                   array_agg('pump:' || q.pump_id || ':stopped' ORDER BY q.pump_id)
+               )
+          INTO v_inserted
+          FROM enqueue_pump_commands(ARRAY(
+                SELECT p.id
+                  FROM pumps p
+                  JOIN schedule_pumps sp ON sp.pump_id = p.id
+                  LEFT JOIN LATERAL (
+                        SELECT c.command
+                          FROM pump_commands c
+                         WHERE c.pump_id = p.id AND c.status IN ('pending', 'dispatching')
+                         ORDER BY c.id DESC
+                         LIMIT 1
+                  ) AS last_cmd ON TRUE
+                 WHERE sp.schedule_id = NEW.id
+                   AND COALESCE(last_cmd.command = 'on', p.is_on)
+                   AND NOT EXISTS (
+                        SELECT 1
+                          FROM schedule_pumps sp_other
+                          JOIN schedules s ON s.id = sp_other.schedule_id
+                         WHERE sp_other.pump_id = p.id
+                           AND s.id <> NEW.id
+                           AND s.status = 'in_progress'
+                   )
+                 ORDER BY p.id
+          ), 'off') AS q;
     END IF;
 
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
 
+-- Index utilisé par la recherche des plannings partageant une pompe (étape A)
+CREATE INDEX IF NOT EXISTS idx_schedule_pumps_pump_id ON schedule_pumps (pump_id);
+
 -- ============================
 -- 3) (Re)Créer le trigger
 -- ============================
@@ -252,3 +403,713 @@ AFTER UPDATE ON schedules
 FOR EACH ROW
 WHEN (OLD.status IS DISTINCT FROM NEW.status)
 EXECUTE FUNCTION manage_pumps_on_schedule_status();
+
+
+-- =====================================================
+--  Notification des changements de plannings (LISTEN/NOTIFY)
+--  consommée par actuators/irrigation_scheduler.py
+-- =====================================================
+CREATE OR REPLACE FUNCTION notify_schedule_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('schedule_changes', OLD.id::text);
+    ELSE
+        PERFORM pg_notify('schedule_changes', NEW.id::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_notify_schedule_change ON schedules;
+CREATE TRIGGER trigger_notify_schedule_change
+AFTER INSERT OR UPDATE OR DELETE ON schedules
+FOR EACH ROW
+EXECUTE FUNCTION notify_schedule_change();
+
+
+-- =====================================================
+--  Détection des conflits de plannings par pompe
+--  Chaque ligne de schedule_pumps porte la période du planning (tsrange) ;
+--  une contrainte d'exclusion GiST interdit deux plannings actifs
+--  ('planned' / 'in_progress') qui se chevauchent sur une même pompe.
+-- =====================================================
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+ALTER TABLE schedule_pumps ADD COLUMN IF NOT EXISTS period TSRANGE;
+ALTER TABLE schedule_pumps ADD COLUMN IF NOT EXISTS active BOOLEAN NOT NULL DEFAULT TRUE;
+
+-- Renseigner période et activité à l'insertion d'une association planning-pompe
+CREATE OR REPLACE FUNCTION fill_schedule_pump_period()
+RETURNS TRIGGER AS $$
+BEGIN
+    SELECT tsrange(s.start_date + s.start_time, s.start_date + s.start_time + s.duration, '[)'),
+           s.status IN ('planned', 'in_progress')
+      INTO NEW.period, NEW.active
+      FROM schedules s
+     WHERE s.id = NEW.schedule_id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_fill_schedule_pump_period ON schedule_pumps;
+CREATE TRIGGER trigger_fill_schedule_pump_period
+BEFORE INSERT OR UPDATE OF schedule_id ON schedule_pumps
+FOR EACH ROW
+EXECUTE FUNCTION fill_schedule_pump_period();
+
+-- Répercuter les changements d'horaire / de statut d'un planning sur ses pompes
+CREATE OR REPLACE FUNCTION sync_schedule_pump_periods()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE schedule_pumps
+       SET period = tsrange(NEW.start_date + NEW.start_time, NEW.start_date + NEW.start_time + NEW.duration, '[)'),
+           active = NEW.status IN ('planned', 'in_progress')
+     WHERE schedule_id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_sync_schedule_pump_periods ON schedules;
+CREATE TRIGGER trigger_sync_schedule_pump_periods
+AFTER UPDATE ON schedules
+FOR EACH ROW
+WHEN (OLD.start_date IS DISTINCT FROM NEW.start_date
+      OR OLD.start_time IS DISTINCT FROM NEW.start_time
+      OR OLD.duration IS DISTINCT FROM NEW.duration
+      OR OLD.status IS DISTINCT FROM NEW.status)
+EXECUTE FUNCTION sync_schedule_pump_periods();
+
+-- Nettoyage des associations orphelines et reprise des lignes existantes
+DELETE FROM schedule_pumps sp
+ WHERE NOT EXISTS (SELECT 1 FROM schedules s WHERE s.id = sp.schedule_id);
+
+UPDATE schedule_pumps sp
+   SET period = tsrange(s.start_date + s.start_time, s.start_date + s.start_time + s.duration, '[)'),
+       active = s.status IN ('planned', 'in_progress')
+  FROM schedules s
+ WHERE s.id = sp.schedule_id
+   AND sp.period IS NULL;
+
+-- Contrainte d'exclusion (non créée, avec avertissement, si des conflits existent déjà)
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'schedule_pumps_no_overlap') THEN
+        ALTER TABLE schedule_pumps
+            ADD CONSTRAINT schedule_pumps_no_overlap
+            EXCLUDE USING gist (pump_id WITH =, period WITH &&) WHERE (active);
+    END IF;
+EXCEPTION WHEN exclusion_violation THEN
+    RAISE WARNING 'Plannings en conflit existants : contrainte schedule_pumps_no_overlap non créée';
+END;
+$$;
+
+
+-- =====================================================
+--  Plannings récurrents et occurrences matérialisées
+--  Une règle (quotidienne, hebdomadaire, tous les N jours, avec exceptions)
+--  est développée en occurrences concrètes sur une fenêtre glissante ;
+--  le planificateur et l'API interrogent schedule_occurrences par plage horaire.
+-- =====================================================
+ALTER TABLE schedules ADD COLUMN IF NOT EXISTS recurrence_type VARCHAR(20) NOT NULL DEFAULT 'none';
+ALTER TABLE schedules ADD COLUMN IF NOT EXISTS recurrence_interval INT NOT NULL DEFAULT 1;
+ALTER TABLE schedules ADD COLUMN IF NOT EXISTS recurrence_weekdays INT[] NULL; -- ISO : 1 = lundi … 7 = dimanche
+ALTER TABLE schedules ADD COLUMN IF NOT EXISTS recurrence_until DATE NULL;
+ALTER TABLE schedules ADD COLUMN IF NOT EXISTS recurrence_exceptions DATE[] NOT NULL DEFAULT '{}';
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'schedules_recurrence_check') THEN
+        ALTER TABLE schedules
+            ADD CONSTRAINT schedules_recurrence_check
+            CHECK (recurrence_type IN ('none', 'daily', 'weekly', 'every_n_days') AND recurrence_interval >= 1);
+    END IF;
+END;
+$$;
+
+CREATE TABLE IF NOT EXISTS schedule_occurrences (
+    id BIGSERIAL PRIMARY KEY,
+    schedule_id INT NOT NULL, -- Pas de contrainte
+    occurrence_date DATE NOT NULL,
+    starts_at TIMESTAMP NOT NULL,
+    ends_at TIMESTAMP NOT NULL,
+    status VARCHAR(50) NOT NULL DEFAULT 'planned', -- planned, in_progress, completed, missed
+    UNIQUE (schedule_id, occurrence_date)
+);
+
+-- Recherche par plage horaire (API) et occurrences à venir (planificateur)
+CREATE INDEX IF NOT EXISTS idx_schedule_occurrences_starts_at ON schedule_occurrences (starts_at);
+CREATE INDEX IF NOT EXISTS idx_schedule_occurrences_pending
+    ON schedule_occurrences (ends_at)
+    WHERE status IN ('planned', 'in_progress');
+
+-- Occurrences d'une règle de récurrence entre p_from et p_to (inclus).
+-- Utilisée pour matérialiser les occurrences et, côté API, pour vérifier les conflits
+-- d'un planning candidat avant son enregistrement.
+CREATE OR REPLACE FUNCTION schedule_rule_occurrences(
+    p_start_date DATE,
+    p_start_time TIME,
+    p_duration INTERVAL,
+    p_recurrence_type TEXT,
+    p_recurrence_interval INT,
+    p_recurrence_weekdays INT[],
+    p_recurrence_until DATE,
+    p_recurrence_exceptions DATE[],
+    p_from DATE,
+    p_to DATE
+)
+RETURNS TABLE (occurrence_date DATE, starts_at TIMESTAMP, ends_at TIMESTAMP) AS $$
+    SELECT d::date, d::date + p_start_time, d::date + p_start_time + p_duration
+      FROM generate_series(
+            -- Premier jour à générer, aligné sur le pas pour "tous les N jours"
+            p_start_date + CASE
+                WHEN p_recurrence_type = 'every_n_days'
+                THEN ((GREATEST(p_from - p_start_date, 0) + p_recurrence_interval - 1)
+                      / p_recurrence_interval) * p_recurrence_interval
+                ELSE GREATEST(p_from - p_start_date, 0)
+            END,
+            CASE
+                WHEN p_recurrence_type = 'none' THEN p_start_date
+                ELSE LEAST(COALESCE(p_recurrence_until, p_to), p_to)
+            END,
+            CASE WHEN p_recurrence_type = 'every_n_days' THEN p_recurrence_interval ELSE 1 END * INTERVAL '1 day'
+      ) AS d
+     WHERE d::date <> ALL(COALESCE(p_recurrence_exceptions, '{}'))
+       AND (p_recurrence_type <> 'weekly'
+            OR (EXTRACT(ISODOW FROM d)::int = ANY(COALESCE(p_recurrence_weekdays,
+                                                           ARRAY[EXTRACT(ISODOW FROM p_start_date)::int]))
+                AND ((d::date - (p_start_date - (EXTRACT(ISODOW FROM p_start_date)::int - 1))) / 7)
+                    % p_recurrence_interval = 0));
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Développe les règles en occurrences jusqu'à p_horizon_end (inclus).
+-- Les occurrences non démarrées qui ne correspondent plus à la règle sont supprimées,
+-- celles dont l'horaire a changé sont mises à jour ; l'historique n'est pas modifié.
+CREATE OR REPLACE FUNCTION materialize_schedule_occurrences(
+    p_schedule_ids INT[] DEFAULT NULL,
+    p_horizon_end DATE DEFAULT CURRENT_DATE + 30
+)
+RETURNS INT AS $$
+DECLARE
+    v_from DATE := CURRENT_DATE - 1;
+    v_count INT;
+BEGIN
+    -- Occurrences passées jamais démarrées
+    UPDATE schedule_occurrences
+       SET status = 'missed'
+     WHERE status = 'planned'
+       AND ends_at <= LOCALTIMESTAMP
+       AND (p_schedule_ids IS NULL OR schedule_id = ANY(p_schedule_ids));
+
+    WITH expected AS (
+        SELECT s.id AS schedule_id, o.occurrence_date, o.starts_at, o.ends_at
+          FROM schedules s
+         CROSS JOIN LATERAL schedule_rule_occurrences(
+                s.start_date, s.start_time, s.duration,
+                s.recurrence_type, s.recurrence_interval, s.recurrence_weekdays,
+                s.recurrence_until, s.recurrence_exceptions, v_from, p_horizon_end
+         ) AS o
+         WHERE s.status IN ('planned', 'in_progress')
+           AND (p_schedule_ids IS NULL OR s.id = ANY(p_schedule_ids))
+    ), removed AS (
+        DELETE FROM schedule_occurrences o
+         WHERE o.status = 'planned'
+           AND o.occurrence_date >= v_from
+           AND (p_schedule_ids IS NULL OR o.schedule_id = ANY(p_schedule_ids))
+           AND NOT EXISTS (
+                SELECT 1
+                  FROM expected e
+                 WHERE e.schedule_id = o.schedule_id
+                   AND e.occurrence_date = o.occurrence_date
+           )
+    )
+    INSERT INTO schedule_occurrences (schedule_id, occurrence_date, starts_at, ends_at)
+    SELECT schedule_id, occurrence_date, starts_at, ends_at
+      FROM expected
+        ON CONFLICT (schedule_id, occurrence_date) DO UPDATE
+       SET starts_at = EXCLUDED.starts_at,
+           ends_at   = EXCLUDED.ends_at
+     WHERE schedule_occurrences.status = 'planned'
+       AND (schedule_occurrences.starts_at, schedule_occurrences.ends_at)
+           IS DISTINCT FROM (EXCLUDED.starts_at, EXCLUDED.ends_at);
+
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Redévelopper un planning dès que sa règle, son horaire ou son statut change
+CREATE OR REPLACE FUNCTION materialize_changed_schedule()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM materialize_schedule_occurrences(ARRAY[NEW.id]);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_materialize_schedule ON schedules;
+CREATE TRIGGER trigger_materialize_schedule
+AFTER INSERT OR UPDATE OF start_date, start_time, duration, status,
+                          recurrence_type, recurrence_interval, recurrence_weekdays,
+                          recurrence_until, recurrence_exceptions
+ON schedules
+FOR EACH ROW
+EXECUTE FUNCTION materialize_changed_schedule();
+
+-- Reprise des plannings existants
+SELECT materialize_schedule_occurrences();
+
+
+-- =====================================================
+--  File de commandes des pompes (actionneurs)
+--  Alimentée par l'API / le service d'irrigation, consommée par
+--  communication/pump_command_worker.py (FOR UPDATE SKIP LOCKED, puis bail
+--  'dispatching' pendant l'envoi MQTT, hors transaction) :
+--  l'état de la pompe n'est enregistré qu'après accusé de réception MQTT.
+-- =====================================================
+CREATE TABLE IF NOT EXISTS pump_commands (
+    id BIGSERIAL PRIMARY KEY,
+    pump_id INT NOT NULL, -- Pas de contrainte
+    command VARCHAR(10) NOT NULL CHECK (command IN ('on', 'off')),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'dispatching', 'acked', 'failed')),
+    attempts INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    completed_at TIMESTAMP NULL,
+    last_error TEXT NULL
+);
+
+-- Bail du worker qui envoie la commande (réclamée à nouveau à expiration)
+ALTER TABLE pump_commands ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP NULL;
+ALTER TABLE pump_commands ADD COLUMN IF NOT EXISTS claimed_by VARCHAR(100) NULL;
+ALTER TABLE pump_commands DROP CONSTRAINT IF EXISTS pump_commands_status_check;
+ALTER TABLE pump_commands ADD CONSTRAINT pump_commands_status_check
+    CHECK (status IN ('pending', 'dispatching', 'acked', 'failed'));
+
+-- Réclamation des commandes non terminées et ordre des commandes d'une même pompe
+DROP INDEX IF EXISTS idx_pump_commands_pending;
+DROP INDEX IF EXISTS idx_pump_commands_pending_pump;
+CREATE INDEX IF NOT EXISTS idx_pump_commands_open
+    ON pump_commands (id)
+    WHERE status IN ('pending', 'dispatching');
+CREATE INDEX IF NOT EXISTS idx_pump_commands_open_pump
+    ON pump_commands (pump_id, id)
+    WHERE status IN ('pending', 'dispatching');
+
+-- Point d'entrée unique de la file : API (models/pumpModel.enqueue_pump_commands)
+-- et trigger des plannings (manage_pumps_on_schedule_status)
+CREATE OR REPLACE FUNCTION enqueue_pump_commands(p_pump_ids INT[], p_command TEXT)
+RETURNS SETOF pump_commands AS $$
+    INSERT INTO pump_commands (pump_id, command)
+    SELECT unnest(p_pump_ids), p_command
+    RETURNING *;
+$$ LANGUAGE sql;
+
+-- Réveil immédiat des workers à chaque ajout de commandes
+CREATE OR REPLACE FUNCTION notify_pump_commands()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('pump_commands', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_notify_pump_commands ON pump_commands;
+CREATE TRIGGER trigger_notify_pump_commands
+AFTER INSERT ON pump_commands
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_pump_commands();
+
+
+-- =====================================================
+--  Télémétrie des pompes (série temporelle)
+--  Échantillons bruts insérés par lots par actuators/pump_telemetry.py ;
+--  la ligne `pumps` n'est mise à jour qu'à intervalle régulier.
+-- =====================================================
+CREATE TABLE IF NOT EXISTS pump_telemetry (
+    id BIGSERIAL PRIMARY KEY,
+    pump_id INT NOT NULL, -- Pas de contrainte
+    recorded_at TIMESTAMP NOT NULL,
+    water_flow FLOAT NULL,
+    elapsed_time FLOAT NULL,
+    power_consumption FLOAT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_pump_telemetry_pump_time ON pump_telemetry (pump_id, recorded_at DESC);
+
+
+-- =====================================================
+--  Historique des cycles de pompes et agrégats de consommation
+--  Un trigger (par instruction) sur `pumps` ouvre un cycle au démarrage et le clôture à l'arrêt,
+--  puis met à jour de façon incrémentale les agrégats journaliers et mensuels
+--  par pompe et par champ (usage_rollups). Tous les chemins d'actionnement
+--  (worker de commandes, y compris pour les plannings, et contrôleur asynchrone) sont couverts.
+--  Unités : débit en L/min, puissance en kW, énergie en kWh.
+-- =====================================================
+CREATE TABLE IF NOT EXISTS pump_runs (
+    id BIGSERIAL PRIMARY KEY,
+    pump_id INT NOT NULL, -- Pas de contrainte
+    field_id INT NOT NULL, -- Pas de contrainte
+    schedule_id INT NULL, -- Pas de contrainte
+    started_at TIMESTAMP NOT NULL,
+    ended_at TIMESTAMP NULL,
+    duration_seconds DOUBLE PRECISION NULL,
+    flow_rate DOUBLE PRECISION NULL,
+    volume_liters DOUBLE PRECISION NULL,
+    energy_kwh DOUBLE PRECISION NULL
+);
+
+-- Un seul cycle ouvert par pompe
+CREATE UNIQUE INDEX IF NOT EXISTS idx_pump_runs_open ON pump_runs (pump_id) WHERE ended_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_pump_runs_pump_started ON pump_runs (pump_id, started_at DESC);
+
+CREATE TABLE IF NOT EXISTS usage_rollups (
+    scope VARCHAR(10) NOT NULL CHECK (scope IN ('pump', 'field')),
+    scope_id INT NOT NULL,
+    period VARCHAR(10) NOT NULL CHECK (period IN ('day', 'month')),
+    period_start DATE NOT NULL,
+    run_count INT NOT NULL DEFAULT 0,
+    duration_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    volume_liters DOUBLE PRECISION NOT NULL DEFAULT 0,
+    energy_kwh DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, scope_id, period, period_start)
+);
+
+CREATE OR REPLACE FUNCTION track_pump_runs()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_now TIMESTAMP := LOCALTIMESTAMP;
+BEGIN
+    -- 🛑 Clôture des cycles ouverts (arrêt, ou redémarrage pour un autre planning),
+    --    puis répartition de chaque cycle sur les jours traversés (le cycle compte pour son jour de début)
+    WITH changed AS (
+        SELECT n.id, n.power_consumption
+          FROM new_pumps n
+          JOIN old_pumps o ON o.id = n.id
+         WHERE o.is_on IS DISTINCT FROM n.is_on
+            OR (n.is_on AND o.last_start_time IS DISTINCT FROM n.last_start_time)
+    ), closed AS (
+        UPDATE pump_runs r
+           SET ended_at         = v_now,
+               duration_seconds = GREATEST(EXTRACT(EPOCH FROM (v_now - r.started_at)), 0),
+               volume_liters    = r.flow_rate * GREATEST(EXTRACT(EPOCH FROM (v_now - r.started_at)), 0) / 60,
+               energy_kwh       = COALESCE(c.power_consumption, 0)
+                                  * GREATEST(EXTRACT(EPOCH FROM (v_now - r.started_at)), 0) / 3600
+          FROM changed c
+         WHERE r.pump_id = c.id
+           AND r.ended_at IS NULL
+        RETURNING r.pump_id, r.field_id, r.started_at, r.ended_at, r.duration_seconds, r.volume_liters, r.energy_kwh
+    ), parts AS (
+        SELECT r.pump_id, r.field_id, r.duration_seconds, r.volume_liters, r.energy_kwh,
+               d::date AS day,
+               d::date = r.started_at::date AS is_first,
+               EXTRACT(EPOCH FROM (LEAST(r.ended_at, d + INTERVAL '1 day') - GREATEST(r.started_at, d))) AS seconds
+          FROM closed r
+         CROSS JOIN LATERAL generate_series(date_trunc('day', r.started_at), r.ended_at, INTERVAL '1 day') AS d
+    ), weighted AS (
+        SELECT pump_id, field_id, day, is_first, seconds, volume_liters, energy_kwh,
+               CASE WHEN duration_seconds > 0 THEN seconds / duration_seconds ELSE 1 END AS share
+          FROM parts
+         WHERE seconds > 0 OR is_first
+    )
+    INSERT INTO usage_rollups AS u (scope, scope_id, period, period_start,
+                                    run_count, duration_seconds, volume_liters, energy_kwh)
+    SELECT k.scope, k.scope_id, p.period,
+           CASE WHEN p.period = 'day' THEN w.day ELSE date_trunc('month', w.day)::date END,
+           SUM(CASE WHEN w.is_first THEN 1 ELSE 0 END),
+           SUM(w.seconds),
+           SUM(COALESCE(w.volume_liters, 0) * w.share),
+           SUM(COALESCE(w.energy_kwh, 0) * w.share)
+      FROM weighted w
+     CROSS JOIN LATERAL (VALUES ('pump', w.pump_id), ('field', w.field_id)) AS k(scope, scope_id)
+     CROSS JOIN (VALUES ('day'), ('month')) AS p(period)
+     GROUP BY 1, 2, 3, 4  -- Une seule ligne par clé : plusieurs cycles peuvent tomber sur le même agrégat
+        ON CONFLICT (scope, scope_id, period, period_start) DO UPDATE
+       SET run_count        = u.run_count + EXCLUDED.run_count,
+           duration_seconds = u.duration_seconds + EXCLUDED.duration_seconds,
+           volume_liters    = u.volume_liters + EXCLUDED.volume_liters,
+           energy_kwh       = u.energy_kwh + EXCLUDED.energy_kwh;
+
+    -- 🚀 Ouverture des nouveaux cycles (débit du planning en cours le plus récent, sinon débit mesuré)
+    INSERT INTO pump_runs (pump_id, field_id, schedule_id, started_at, flow_rate)
+    SELECT DISTINCT ON (n.id)
+           n.id, n.field_id, sc.id, COALESCE(n.last_start_time, v_now),
+           COALESCE(sc.flow_rate, NULLIF(n.water_flow, 0))
+      FROM new_pumps n
+      JOIN old_pumps o ON o.id = n.id
+      LEFT JOIN schedule_pumps sp ON sp.pump_id = n.id
+      LEFT JOIN schedules sc ON sc.id = sp.schedule_id AND sc.status = 'in_progress'
+     WHERE n.is_on
+       AND (o.is_on IS DISTINCT FROM n.is_on OR o.last_start_time IS DISTINCT FROM n.last_start_time)
+     ORDER BY n.id, sc.id IS NULL, sc.last_irrigation_time DESC NULLS LAST;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger par instruction : un arrêt ou démarrage groupé (plannings, commande en masse)
+-- coûte deux requêtes ensemblistes (clôture + agrégats, ouverture), quel que soit le nombre de pompes
+-- (les tables de transition excluent une liste de colonnes : le filtre est dans la fonction)
+DROP TRIGGER IF EXISTS trigger_track_pump_runs ON pumps;
+CREATE TRIGGER trigger_track_pump_runs
+AFTER UPDATE ON pumps
+REFERENCING OLD TABLE AS old_pumps NEW TABLE AS new_pumps
+FOR EACH STATEMENT
+EXECUTE FUNCTION track_pump_runs();
+
+
+-- =====================================================
+--  Diffusion des notifications (LISTEN/NOTIFY)
+--  Un seul NOTIFY par instruction INSERT (la charge utile est le plus grand
+--  ID inséré) ; chaque worker de l'API relit les nouvelles lignes en une requête
+--  puis les diffuse aux clients SSE / WebSocket (communication/notification_stream.py).
+-- =====================================================
+CREATE OR REPLACE FUNCTION notify_new_notifications()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_max_id INT;
+BEGIN
+    SELECT MAX(id) INTO v_max_id FROM inserted;
+    IF v_max_id IS NOT NULL THEN
+        PERFORM pg_notify('new_notifications', v_max_id::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_notify_new_notifications ON notifications;
+CREATE TRIGGER trigger_notify_new_notifications
+AFTER INSERT ON notifications
+REFERENCING NEW TABLE AS inserted
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_new_notifications();
+
+
+-- =====================================================
+--  Dernières mesures par champ (évaluation des conditions d'irrigation)
+--  `sensorreadings.raw_data` accumule les mesures de chaque capteur ; le trigger
+--  ci-dessous ne lit que les éléments ajoutés et conserve, par champ et par
+--  grandeur, la mesure la plus récente. Les conditions de toute une flotte de
+--  champs se lisent ainsi en une requête indexée.
+-- =====================================================
+CREATE TABLE IF NOT EXISTS field_latest_measurements (
+    field_id    INT NOT NULL,
+    metric      VARCHAR(30) NOT NULL,
+    value       DOUBLE PRECISION NOT NULL,
+    measured_at TIMESTAMP NOT NULL,
+    sensor_id   INT NOT NULL,
+    PRIMARY KEY (field_id, metric)
+);
+
+-- Dernière mesure de chaque capteur (interpolation spatiale de l'humidité du sol)
+CREATE TABLE IF NOT EXISTS sensor_latest_measurements (
+    sensor_id   INT NOT NULL,
+    metric      VARCHAR(30) NOT NULL,
+    value       DOUBLE PRECISION NOT NULL,
+    measured_at TIMESTAMP NOT NULL,
+    field_id    INT NOT NULL,
+    PRIMARY KEY (sensor_id, metric)
+);
+
+-- Agrégats journaliers par champ et par grandeur (calcul de l'ET0, pluie cumulée)
+CREATE TABLE IF NOT EXISTS field_daily_weather (
+    field_id     INT NOT NULL,
+    day          DATE NOT NULL,
+    metric       VARCHAR(30) NOT NULL,
+    min_value    DOUBLE PRECISION NOT NULL,
+    max_value    DOUBLE PRECISION NOT NULL,
+    sum_value    DOUBLE PRECISION NOT NULL,
+    sample_count INT NOT NULL,
+    PRIMARY KEY (field_id, day, metric)
+);
+CREATE INDEX IF NOT EXISTS idx_field_daily_weather_day ON field_daily_weather (day);
+
+-- Nom normalisé d'une grandeur mesurée (libellés des capteurs simulés ou réels)
+CREATE OR REPLACE FUNCTION normalize_measurement_type(p_type TEXT)
+RETURNS TEXT AS $$
+    SELECT CASE lower(p_type)
+               WHEN 'humidity'     THEN 'humidity'
+               WHEN 'humidité'     THEN 'humidity'
+               WHEN 'rainfall'     THEN 'rainfall'
+               WHEN 'pluviometry'  THEN 'rainfall'
+               WHEN 'pluviométrie' THEN 'rainfall'
+               WHEN 'temperature'  THEN 'temperature'
+               WHEN 'température'  THEN 'temperature'
+               WHEN 'ph'           THEN 'ph'
+               WHEN 'air_humidity'          THEN 'air_humidity'
+               WHEN 'relative_humidity'     THEN 'air_humidity'
+               WHEN 'humidité de l''air'    THEN 'air_humidity'
+               WHEN 'wind_speed'            THEN 'wind_speed'
+               WHEN 'vitesse du vent'       THEN 'wind_speed'
+               WHEN 'solar_radiation'       THEN 'solar_radiation'
+               WHEN 'rayonnement solaire'   THEN 'solar_radiation'
+           END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Horodatage d'une mesure (heure d'insertion si absent ou illisible)
+-- Le format est filtré par l'expression régulière ; une date impossible au bon format
+-- (ex. 2026-02-30) ne doit pas faire échouer l'insertion de tout le lot de mesures.
+CREATE OR REPLACE FUNCTION measurement_timestamp(p_value TEXT)
+RETURNS TIMESTAMP AS $$
+BEGIN
+    IF p_value IS NULL OR p_value !~ '^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?$' THEN
+        RETURN LOCALTIMESTAMP;
+    END IF;
+    RETURN p_value::TIMESTAMP;
+EXCEPTION WHEN others THEN
+    RETURN LOCALTIMESTAMP;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE OR REPLACE FUNCTION track_latest_measurements()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_known INT := 0;
+BEGIN
+    IF TG_OP = 'UPDATE' AND jsonb_typeof(OLD.raw_data) = 'array' THEN
+        v_known := jsonb_array_length(OLD.raw_data);
+    END IF;
+    IF jsonb_typeof(NEW.raw_data) <> 'array' THEN
+        RETURN NULL;
+    END IF;
+
+    WITH m AS (
+        SELECT normalize_measurement_type(e.elem->>'type') AS metric,
+               (e.elem->>'valeur')::DOUBLE PRECISION AS value,
+               measurement_timestamp(e.elem->>'timestamp') AS measured_at,
+               e.ord
+          FROM jsonb_array_elements(NEW.raw_data) WITH ORDINALITY AS e(elem, ord)
+         WHERE e.ord > v_known
+           AND jsonb_typeof(e.elem->'valeur') = 'number'
+           AND NOT e.elem ? 'anomaly'  -- Mesure signalée par la détection d'anomalies
+           AND normalize_measurement_type(e.elem->>'type') IS NOT NULL
+    ), latest AS (
+        INSERT INTO field_latest_measurements AS l (field_id, metric, value, measured_at, sensor_id)
+        SELECT DISTINCT ON (m.metric) NEW.field_id, m.metric, m.value, m.measured_at, NEW.sensor_id
+          FROM m
+         ORDER BY m.metric, m.measured_at DESC, m.ord DESC
+        ON CONFLICT (field_id, metric) DO UPDATE
+           SET value       = EXCLUDED.value,
+               measured_at = EXCLUDED.measured_at,
+               sensor_id   = EXCLUDED.sensor_id
+         WHERE l.measured_at <= EXCLUDED.measured_at
+    ), sensor_latest AS (
+        INSERT INTO sensor_latest_measurements AS s (sensor_id, metric, value, measured_at, field_id)
+        SELECT DISTINCT ON (m.metric) NEW.sensor_id, m.metric, m.value, m.measured_at, NEW.field_id
+          FROM m
+         ORDER BY m.metric, m.measured_at DESC, m.ord DESC
+        ON CONFLICT (sensor_id, metric) DO UPDATE
+           SET value       = EXCLUDED.value,
+               measured_at = EXCLUDED.measured_at,
+               field_id    = EXCLUDED.field_id
+         WHERE s.measured_at <= EXCLUDED.measured_at
+    )
+    INSERT INTO field_daily_weather AS d (field_id, day, metric, min_value, max_value, sum_value, sample_count)
+    SELECT NEW.field_id, m.measured_at::DATE, m.metric, MIN(m.value), MAX(m.value), SUM(m.value), COUNT(*)
+      FROM m
+     GROUP BY m.measured_at::DATE, m.metric
+    ON CONFLICT (field_id, day, metric) DO UPDATE
+       SET min_value    = LEAST(d.min_value, EXCLUDED.min_value),
+           max_value    = GREATEST(d.max_value, EXCLUDED.max_value),
+           sum_value    = d.sum_value + EXCLUDED.sum_value,
+           sample_count = d.sample_count + EXCLUDED.sample_count;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_track_latest_measurements ON sensorreadings;
+CREATE TRIGGER trigger_track_latest_measurements
+AFTER INSERT OR UPDATE OF raw_data ON sensorreadings
+FOR EACH ROW
+EXECUTE FUNCTION track_latest_measurements();
+
+-- Initialisation à partir des mesures existantes (une seule fois, table vide)
+INSERT INTO field_latest_measurements AS l (field_id, metric, value, measured_at, sensor_id)
+SELECT DISTINCT ON (m.field_id, m.metric) m.field_id, m.metric, m.value, m.measured_at, m.sensor_id
+  FROM (
+        SELECT sr.field_id, sr.sensor_id,
+               normalize_measurement_type(e.elem->>'type') AS metric,
+               (e.elem->>'valeur')::DOUBLE PRECISION AS value,
+               measurement_timestamp(e.elem->>'timestamp') AS measured_at
+          FROM sensorreadings sr
+         CROSS JOIN LATERAL jsonb_array_elements(
+                CASE WHEN jsonb_typeof(sr.raw_data) = 'array' THEN sr.raw_data ELSE '[]'::jsonb END
+         ) AS e(elem)
+         WHERE jsonb_typeof(e.elem->'valeur') = 'number'
+           AND NOT EXISTS (SELECT 1 FROM field_latest_measurements)
+  ) AS m
+ WHERE m.metric IS NOT NULL
+ ORDER BY m.field_id, m.metric, m.measured_at DESC
+ON CONFLICT (field_id, metric) DO NOTHING;
+
+INSERT INTO sensor_latest_measurements (sensor_id, metric, value, measured_at, field_id)
+SELECT DISTINCT ON (m.sensor_id, m.metric) m.sensor_id, m.metric, m.value, m.measured_at, m.field_id
+  FROM (
+        SELECT sr.field_id, sr.sensor_id,
+               normalize_measurement_type(e.elem->>'type') AS metric,
+               (e.elem->>'valeur')::DOUBLE PRECISION AS value,
+               measurement_timestamp(e.elem->>'timestamp') AS measured_at
+          FROM sensorreadings sr
+         CROSS JOIN LATERAL jsonb_array_elements(
+                CASE WHEN jsonb_typeof(sr.raw_data) = 'array' THEN sr.raw_data ELSE '[]'::jsonb END
+         ) AS e(elem)
+         WHERE jsonb_typeof(e.elem->'valeur') = 'number'
+           AND NOT EXISTS (SELECT 1 FROM sensor_latest_measurements)
+  ) AS m
+ WHERE m.metric IS NOT NULL
+ ORDER BY m.sensor_id, m.metric, m.measured_at DESC
+ON CONFLICT (sensor_id, metric) DO NOTHING;
+
+INSERT INTO field_daily_weather (field_id, day, metric, min_value, max_value, sum_value, sample_count)
+SELECT m.field_id, m.measured_at::DATE, m.metric, MIN(m.value), MAX(m.value), SUM(m.value), COUNT(*)
+  FROM (
+        SELECT sr.field_id,
+               normalize_measurement_type(e.elem->>'type') AS metric,
+               (e.elem->>'valeur')::DOUBLE PRECISION AS value,
+               measurement_timestamp(e.elem->>'timestamp') AS measured_at
+          FROM sensorreadings sr
+         CROSS JOIN LATERAL jsonb_array_elements(
+                CASE WHEN jsonb_typeof(sr.raw_data) = 'array' THEN sr.raw_data ELSE '[]'::jsonb END
+         ) AS e(elem)
+         WHERE jsonb_typeof(e.elem->'valeur') = 'number'
+           AND NOT EXISTS (SELECT 1 FROM field_daily_weather)
+  ) AS m
+ WHERE m.metric IS NOT NULL
+ GROUP BY m.field_id, m.measured_at::DATE, m.metric
+ON CONFLICT (field_id, day, metric) DO NOTHING;
+
+-- Seuils de la règle d'irrigation : valeur du champ, sinon de la culture, sinon
+-- valeur par défaut de l'application (IRRIGATION_HUMIDITY_THRESHOLD, ...)
+ALTER TABLE crop_types ADD COLUMN IF NOT EXISTS irrigation_humidity_threshold DOUBLE PRECISION NULL;
+ALTER TABLE crop_types ADD COLUMN IF NOT EXISTS irrigation_rainfall_threshold DOUBLE PRECISION NULL;
+ALTER TABLE fields ADD COLUMN IF NOT EXISTS irrigation_humidity_threshold DOUBLE PRECISION NULL;
+ALTER TABLE fields ADD COLUMN IF NOT EXISTS irrigation_rainfall_threshold DOUBLE PRECISION NULL;
+
+
+-- =====================================================
+--  Quarantaine des mesures aberrantes
+--  Les mesures rejetées par la détection d'anomalies à l'ingestion (valeur de
+--  saturation, hors plage, capteur bloqué) ne sont pas ajoutées à `raw_data` ;
+--  elles sont conservées ici pour diagnostic.
+-- =====================================================
+CREATE TABLE IF NOT EXISTS sensor_quarantine (
+    id          BIGSERIAL PRIMARY KEY,
+    sensor_id   INT NOT NULL,
+    field_id    INT NULL,
+    metric      VARCHAR(30) NOT NULL,
+    value       DOUBLE PRECISION NOT NULL,
+    reason      VARCHAR(20) NOT NULL,
+    measurement JSONB NOT NULL,
+    received_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_sensor_quarantine_sensor ON sensor_quarantine (sensor_id, id DESC);
+
+
+-- =====================================================
+--  Activité des capteurs
+--  `last_seen_at` : dernier contact (écrit par lots par le suivi d'activité).
+--  `offline_since` : renseigné quand le suivi passe un capteur silencieux à
+--  `inactive` ; un tel capteur redevient `active` à sa prochaine mesure,
+--  contrairement à un capteur désactivé manuellement (offline_since NULL).
+-- =====================================================
+ALTER TABLE sensors ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMP NULL;
+ALTER TABLE sensors ADD COLUMN IF NOT EXISTS offline_since TIMESTAMP NULL;
@@ -0,0 +1,183 @@
+import logging
+import math
+import os
+import threading
+
+from utils.metrics import SENSOR_ANOMALIES
+
+logger = logging.getLogger(__name__)
+
+# 📌 Poids de la dernière mesure dans la moyenne/variance exponentielles
+EWMA_ALPHA = float(os.getenv("ANOMALY_EWMA_ALPHA", "0.05"))
+# 📌 Écart à la moyenne (en écarts-types) au-delà duquel une mesure est aberrante
+EWMA_Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", "6"))
+# 📌 Mesures nécessaires avant d'appliquer le test statistique
+EWMA_WARMUP = int(os.getenv("ANOMALY_WARMUP", "20"))
+# 📌 Nombre de valeurs identiques consécutives signalant un capteur bloqué
+#    (36 mesures à 5 min = 3 h ; à adapter à la fréquence et à la résolution des capteurs)
+STUCK_REPEAT = int(os.getenv("ANOMALY_STUCK_REPEAT", "36"))
+# 📌 Anomalies mises en quarantaine (non enregistrées) ; les autres sont enregistrées et signalées
+QUARANTINE_REASONS = frozenset(
+    reason.strip() for reason in os.getenv("ANOMALY_QUARANTINE_REASONS", "saturated,out_of_range,stuck").split(",")
+)
+
+# 📌 Plages physiquement plausibles par grandeur (mêmes noms que `normalize_measurement_type`)
+VALID_RANGES = {
+    "humidity": (0.0, 100.0),
+    "air_humidity": (0.0, 100.0),
+    "temperature": (-40.0, 70.0),
+    "rainfall": (0.0, 500.0),
+    "ph": (0.0, 14.0),
+    "wind_speed": (0.0, 75.0),
+    "solar_radiation": (0.0, 1500.0),
+    "water_level": (0.0, 100.0),
+    "n": (0.0, 2000.0),
+    "p": (0.0, 2000.0),
+    "k": (0.0, 2000.0),
+}
+# 📌 Valeurs renvoyées par des capteurs saturés ou déconnectés, par grandeur : une valeur
+#    plausible pour une autre grandeur (ex. 255 W/m² de rayonnement) n'est pas écartée
+NPK_SATURATION_VALUES = frozenset({255.0, 65535.0})
+SATURATION_VALUES = {
+    "n": NPK_SATURATION_VALUES,
+    "p": NPK_SATURATION_VALUES,
+    "k": NPK_SATURATION_VALUES,
+    "temperature": frozenset({-127.0}),  # Sonde DS18B20 débranchée
+}
+# 📌 Codes de valeur manquante, quelle que soit la grandeur
+MISSING_VALUES = frozenset({-999.0, -9999.0})
+# 📌 Pleine échelle des convertisseurs analogiques (8 à 16 bits), pour les grandeurs sans plage connue
+ADC_FULL_SCALE_VALUES = frozenset({255.0, 1023.0, 4095.0, 65535.0})
+# 📌 Grandeurs dont une valeur constante est normale (pas de pluie pendant des jours, cuve pleine)
+STUCK_EXEMPT = frozenset({"rainfall", "water_level"})
+
+_SENTINELS = {metric: MISSING_VALUES | SATURATION_VALUES.get(metric, frozenset()) for metric in VALID_RANGES}
+_UNKNOWN_SENTINELS = MISSING_VALUES | ADC_FULL_SCALE_VALUES
+
+# Libellés des capteurs vers les noms normalisés (miroir de `normalize_measurement_type`)
+_METRIC_NAMES = {
+    "humidity": "humidity", "humidité": "humidity",
+    "rainfall": "rainfall", "pluviometry": "rainfall", "pluviométrie": "rainfall",
+    "temperature": "temperature", "température": "temperature", "tempreature": "temperature",
+    "ph": "ph",
+    "air_humidity": "air_humidity", "relative_humidity": "air_humidity", "humidité de l'air": "air_humidity",
+    "wind_speed": "wind_speed", "vitesse du vent": "wind_speed",
+    "solar_radiation": "solar_radiation", "rayonnement solaire": "solar_radiation",
+    "water_level": "water_level", "niveau d'eau": "water_level",
+    "n": "n", "p": "p", "k": "k",
+}
+
+
+def normalize_metric(label):
+    """🏷️ Nom normalisé d'une grandeur (None si inconnue : seuls les tests génériques s'appliquent)."""
+    return _METRIC_NAMES.get(str(label).lower())
+
+
+class AnomalyDetector:
+    """
+    🚨 Détection en ligne des mesures aberrantes, par capteur et par grandeur.
+
+    Chaque mise à jour est en O(1) et sans allocation : l'état d'une série est une
+    petite liste `[moyenne, variance, nombre, dernière valeur, répétitions]`. Quatre
+    tests, du moins au plus coûteux : valeur de saturation, plage physique, valeur
+    bloquée, puis écart à la moyenne exponentielle (EWMA) en écarts-types. Les
+    mesures hors plage ou saturées ne modifient pas les statistiques ; les autres
+    les mettent à jour, écrêtées à la limite du test pour qu'un pic isolé ne gonfle
+    pas la variance (un changement de niveau durable finit par être absorbé).
+    """
+
+    def __init__(self, alpha=EWMA_ALPHA, z_threshold=EWMA_Z_THRESHOLD, warmup=EWMA_WARMUP,
+                 stuck_repeat=STUCK_REPEAT):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        self.stuck_repeat = stuck_repeat
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def update(self, sensor_id, metric, value):
+        """
+        🔍 Intègre une mesure et renvoie la raison de l'anomalie (`saturated`,
+        `out_of_range`, `stuck`, `outlier`) ou None si la mesure est normale.
+        """
+        if value in _SENTINELS.get(metric, _UNKNOWN_SENTINELS):
+            return "saturated"
+        bounds = VALID_RANGES.get(metric)
+        if bounds is not None and not bounds[0] <= value <= bounds[1]:
+            return "out_of_range"
+        if value != value or value in (math.inf, -math.inf):
+            return "out_of_range"
+
+        key = (sensor_id, metric)
+        with self._lock:
+            state = self._series.get(key)
+            if state is None:
+                self._series[key] = [value, 0.0, 1, value, 1]
+                return None
+            mean, variance, count, last, repeats = state
+            repeats = repeats + 1 if value == last else 1
+            state[3] = value
+            state[4] = repeats
+
+            reason = None
+            if repeats >= self.stuck_repeat and metric not in STUCK_EXEMPT:
+                reason = "stuck"
+            # Écart-type plancher : 0,1 % de la plage, pour les séries presque constantes
+            floor = (bounds[1] - bounds[0]) * 1e-3 if bounds is not None else 1e-6
+            limit = self.z_threshold * max(math.sqrt(variance), floor)
+            delta = value - mean
+            if count >= self.warmup and abs(delta) > limit:
+                reason = reason or "outlier"
+                delta = limit if delta > 0 else -limit
+            # Mise à jour incrémentale de la moyenne et de la variance exponentielles
+            increment = self.alpha * delta
+            state[0] = mean + increment
+            state[1] = (1.0 - self.alpha) * (variance + delta * increment)
+            state[2] = count + 1
+        return reason
+
+    def inspect(self, sensor_id, measurements):
+        """
+        🧪 Sépare les mesures d'un message en mesures à enregistrer et mesures en
+        quarantaine. Les mesures signalées mais enregistrées reçoivent la clé
+        `anomaly` (ignorée par les agrégats en base).
+
+        :param measurements: Éléments `{"type", "valeur", "unit", "timestamp"}` ;
+                             `valeur` peut être un dictionnaire (NPK).
+        :return: `(accepted, quarantined)` ; chaque élément en quarantaine est
+                 `(measurement, metric, value, reason)`.
+        """
+        accepted, quarantined = [], []
+        for measurement in measurements:
+            label = measurement.get("type")
+            raw = measurement.get("valeur")
+            components = raw.items() if isinstance(raw, dict) else ((None, raw),)
+            worst = None
+            for component, value in components:
+                metric = normalize_metric(component if component is not None else label) or str(label).lower()
+                try:
+                    reason = self.update(sensor_id, metric, float(value))
+                except (TypeError, ValueError):
+                    continue  # Valeur non numérique : laissée telle quelle
+                if reason is None:
+                    continue
+                SENSOR_ANOMALIES.labels(metric, reason).inc()
+                if worst is None or (reason in QUARANTINE_REASONS and worst[2] not in QUARANTINE_REASONS):
+                    worst = (metric, float(value), reason)
+            if worst is not None and worst[2] in QUARANTINE_REASONS:
+                quarantined.append((measurement, *worst))
+            elif worst is not None:
+                accepted.append(dict(measurement, anomaly=worst[2]))
+            else:
+                accepted.append(measurement)
+        return accepted, quarantined
+
+    def forget(self, sensor_id):
+        """🗑️ Oublie les statistiques d'un capteur (remplacement, recalibrage)."""
+        with self._lock:
+            for key in [key for key in self._series if key[0] == sensor_id]:
+                del self._series[key]
+
+
+# ✅ Détecteur partagé par les chemins d'ingestion du processus
+anomaly_detector = AnomalyDetector()
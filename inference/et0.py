@@ -0,0 +1,161 @@
+"""
+💧 Évapotranspiration de référence (ET0, mm/jour) selon FAO-56.
+
+Toutes les fonctions opèrent sur des tableaux NumPy de forme (champs × jours) :
+Penman-Monteith (éq. 6) quand température, humidité de l'air et rayonnement sont
+disponibles, Hargreaves (éq. 52) quand seules les températures le sont. Vent absent :
+2 m/s, valeur recommandée par FAO-56.
+"""
+import logging
+import os
+from datetime import timedelta
+
+import numpy as np
+
+from models.weatherModel import get_daily_weather, get_fields_location
+
+logger = logging.getLogger(__name__)
+
+# 📌 Altitude utilisée pour la pression atmosphérique (m)
+DEFAULT_ELEVATION_M = float(os.getenv("ET0_DEFAULT_ELEVATION_M", "0"))
+DEFAULT_WIND_SPEED = 2.0          # m/s à 2 m
+SOLAR_CONSTANT = 0.0820           # MJ m-2 min-1
+STEFAN_BOLTZMANN = 4.903e-9       # MJ K-4 m-2 jour-1
+W_M2_TO_MJ_DAY = 0.0864           # moyenne journalière W/m² -> MJ m-2 jour-1
+
+PENMAN_MONTEITH = 1
+HARGREAVES = 2
+
+ET0_METRICS = ("temperature", "air_humidity", "wind_speed", "solar_radiation", "rainfall")
+
+
+def saturation_vapour_pressure(t):
+    """e°(T) en kPa (éq. 11)."""
+    return 0.6108 * np.exp(17.27 * t / (t + 237.3))
+
+
+def extraterrestrial_radiation(latitude_deg, day_of_year):
+    """Ra en MJ m-2 jour-1 (éq. 21) ; latitude (champs × 1) et jour de l'année (1 × jours)."""
+    phi = np.radians(latitude_deg)
+    angle = 2 * np.pi * day_of_year / 365
+    dr = 1 + 0.033 * np.cos(angle)
+    delta = 0.409 * np.sin(angle - 1.39)
+    omega = np.arccos(np.clip(-np.tan(phi) * np.tan(delta), -1.0, 1.0))
+    return (24 * 60 / np.pi) * SOLAR_CONSTANT * dr * (
+        omega * np.sin(phi) * np.sin(delta) + np.cos(phi) * np.cos(delta) * np.sin(omega)
+    )
+
+
+def hargreaves(t_min, t_max, ra):
+    """ET0 de Hargreaves (éq. 52), Ra converti en évaporation équivalente."""
+    t_mean = (t_max + t_min) / 2
+    return 0.0023 * (t_mean + 17.8) * np.sqrt(np.maximum(t_max - t_min, 0.0)) * 0.408 * ra
+
+
+def penman_monteith(t_min, t_max, rh_mean, wind, rs, ra, elevation=DEFAULT_ELEVATION_M):
+    """ET0 de Penman-Monteith (éq. 6), pas de temps journalier (G = 0)."""
+    t_mean = (t_max + t_min) / 2
+    pressure = 101.3 * ((293 - 0.0065 * elevation) / 293) ** 5.26
+    gamma = 0.000665 * pressure
+    es = (saturation_vapour_pressure(t_max) + saturation_vapour_pressure(t_min)) / 2
+    ea = np.clip(rh_mean, 0, 100) / 100 * es
+    delta = 4098 * saturation_vapour_pressure(t_mean) / (t_mean + 237.3) ** 2
+
+    rso = (0.75 + 2e-5 * elevation) * ra
+    rns = 0.77 * rs
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative_rs = np.clip(np.where(rso > 0, rs / rso, 1.0), 0.3, 1.0)
+    rnl = STEFAN_BOLTZMANN * ((t_max + 273.16) ** 4 + (t_min + 273.16) ** 4) / 2 \
+        * (0.34 - 0.14 * np.sqrt(ea)) * (1.35 * relative_rs - 0.35)
+    rn = rns - rnl
+
+    return (0.408 * delta * rn + gamma * (900 / (t_mean + 273)) * wind * (es - ea)) \
+        / (delta + gamma * (1 + 0.34 * wind))
+
+
+def compute_et0(latitude_deg, day_of_year, t_min, t_max, rh_mean=None, wind=None, rs=None,
+                elevation=DEFAULT_ELEVATION_M):
+    """
+    🧮 ET0 journalière pour une grille champs × jours, en un passage.
+
+    Les entrées absentes sont des NaN (ou None pour toute la grille) ; chaque cellule
+    utilise Penman-Monteith si possible, sinon Hargreaves, sinon reste NaN.
+    :param rs: Rayonnement solaire en MJ m-2 jour-1.
+    :return: `(et0, methode)` ; méthode 0 (aucune), PENMAN_MONTEITH ou HARGREAVES.
+    """
+    shape = np.broadcast_shapes(np.shape(t_min), np.shape(t_max))
+    missing = np.full(shape, np.nan)
+    rh_mean = missing if rh_mean is None else rh_mean
+    rs = missing if rs is None else rs
+    wind = np.where(np.isnan(missing if wind is None else wind), DEFAULT_WIND_SPEED, wind)
+    ra = extraterrestrial_radiation(np.reshape(latitude_deg, (-1, 1)), np.reshape(day_of_year, (1, -1)))
+
+    has_temperature = np.isfinite(t_min) & np.isfinite(t_max)
+    has_pm = has_temperature & np.isfinite(rh_mean) & np.isfinite(rs)
+    with np.errstate(invalid="ignore"):
+        et0 = hargreaves(t_min, t_max, ra)
+        if has_pm.any():  # Grille sans humidité ni rayonnement : Hargreaves seul
+            et0 = np.where(has_pm, penman_monteith(t_min, t_max, rh_mean, wind, rs, ra, elevation), et0)
+    et0 = np.where(has_temperature, np.maximum(et0, 0.0), np.nan)
+    method = np.where(has_pm, PENMAN_MONTEITH, np.where(has_temperature, HARGREAVES, 0))
+    return et0, method
+
+
+def weather_grid(rows, field_ids, start, days):
+    """
+    🗂️ Range les agrégats journaliers (`get_daily_weather`) dans des tableaux champs × jours.
+    :return: Dictionnaire `(metric, statistique)` -> tableau (NaN si absent).
+    """
+    field_index = {field_id: i for i, field_id in enumerate(field_ids)}
+    grids = {}
+    if not rows:
+        return grids
+    fi = np.array([field_index.get(row["field_id"], -1) for row in rows])
+    di = np.array([(row["day"] - start).days for row in rows])
+    keep = (fi >= 0) & (di >= 0) & (di < days)
+    metrics = np.array([row["metric"] for row in rows])
+    for stat in ("min_value", "max_value", "mean_value", "sum_value"):
+        values = np.array([row[stat] for row in rows], dtype=np.float64)
+        for metric in set(metrics[keep]):
+            selected = keep & (metrics == metric)
+            grid = np.full((len(field_ids), days), np.nan)
+            grid[fi[selected], di[selected]] = values[selected]
+            grids[(metric, stat)] = grid
+    return grids
+
+
+def daily_et0_for_fields(field_ids, start, end):
+    """
+    🌾 ET0 journalière des champs entre `start` et `end` (inclus) à partir des mesures.
+
+    :return: Dictionnaire `field_ids`, `days`, `et0` (champs × jours, mm), `method`,
+             `rainfall` (cumul journalier, mm).
+    """
+    locations = get_fields_location(field_ids)
+    field_ids = [row["field_id"] for row in locations]
+    days = (end - start).days + 1
+    day_list = [start + timedelta(days=i) for i in range(days)]
+    if not field_ids or days <= 0:
+        return {"field_ids": field_ids, "days": day_list, "et0": np.empty((len(field_ids), 0)),
+                "method": np.empty((len(field_ids), 0), dtype=int), "rainfall": np.empty((len(field_ids), 0))}
+
+    grids = weather_grid(get_daily_weather(field_ids, start, end, ET0_METRICS), field_ids, start, days)
+    missing = np.full((len(field_ids), days), np.nan)
+    radiation = grids.get(("solar_radiation", "mean_value"), missing) * W_M2_TO_MJ_DAY
+
+    et0, method = compute_et0(
+        np.array([row["latitude"] for row in locations], dtype=np.float64),
+        np.array([d.timetuple().tm_yday for d in day_list]),
+        grids.get(("temperature", "min_value"), missing),
+        grids.get(("temperature", "max_value"), missing),
+        rh_mean=grids.get(("air_humidity", "mean_value"), missing),
+        wind=grids.get(("wind_speed", "mean_value"), missing),
+        rs=radiation,
+    )
+    return {
+        "field_ids": field_ids,
+        "days": day_list,
+        "et0": et0,
+        "method": method,
+        "rainfall": grids.get(("rainfall", "sum_value"), missing),
+    }
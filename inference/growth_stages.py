@@ -0,0 +1,174 @@
+import logging
+import math
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from models.fieldModel import get_fields_planting_info
+
+logger = logging.getLogger(__name__)
+
+DAYS_PER_MONTH = 30.44
+# 📌 Un calendrier est recalculé au-delà de cette durée (modifications faites par un autre worker)
+GROWTH_STAGE_CACHE_TTL_SECONDS = float(os.getenv("GROWTH_STAGE_CACHE_TTL_SECONDS", "600"))
+
+# 📌 Stades du maïs (individus `crop_growth` de l'ontologie) et début de chaque stade
+#    en fraction du cycle de la culture
+GROWTH_STAGES = (
+    ("Germination", "Germination", 0.00),
+    ("Emergence", "Emergence (VE)", 0.05),
+    ("Vegetatif", "Végétatif (V2, V5, V10)", 0.10),
+    ("Floraison", "Floraison (VT/R1)", 0.50),
+    ("Remplissage_Grains", "Remplissage des grains (R3/R4)", 0.65),
+    ("Maturation", "Maturation (R6)", 0.85),
+)
+# 📌 Coefficients culturaux Kc du maïs par stade (FAO-56, tableau 12 ; Kc moyen des
+#    phases de développement et de fin de cycle)
+CROP_COEFFICIENTS = {
+    "Germination": 0.30,
+    "Emergence": 0.30,
+    "Vegetatif": 0.75,
+    "Floraison": 1.20,
+    "Remplissage_Grains": 1.20,
+    "Maturation": 0.78,
+}
+STAGE_KEYS = tuple(key for key, _, _ in GROWTH_STAGES)
+STAGE_LABELS = tuple(label for _, label, _ in GROWTH_STAGES)
+_STAGE_STARTS = np.array([start for _, _, start in GROWTH_STAGES])
+
+
+def lifecycle_in_days(duration, unit):
+    """📅 Durée du cycle d'une culture en jours (`unit` : 'days' ou 'months')."""
+    if duration is None:
+        return None
+    return duration * DAYS_PER_MONTH if unit == "months" else float(duration)
+
+
+class StageCalendar:
+    """
+    🗓️ Calendrier des stades d'un champ : un tableau indexé par jour depuis le semis
+    donne l'indice du stade, d'où une recherche en O(1).
+    """
+
+    __slots__ = ("planting_date", "lifecycle_days", "day_index", "loaded_at")
+
+    def __init__(self, planting_date, lifecycle_days):
+        self.planting_date = planting_date
+        self.lifecycle_days = lifecycle_days
+        days = np.arange(math.ceil(lifecycle_days))
+        self.day_index = (np.searchsorted(_STAGE_STARTS, days / lifecycle_days, side="right") - 1).astype(np.int8)
+        self.loaded_at = time.monotonic()
+
+    def matches(self, planting_date, lifecycle_days):
+        return self.planting_date == planting_date and self.lifecycle_days == lifecycle_days
+
+    def stage_index(self, day):
+        """🔍 Indice du stade au jour `day` (None avant le semis ou après la fin du cycle)."""
+        offset = (day - self.planting_date).days
+        if 0 <= offset < len(self.day_index):
+            return int(self.day_index[offset])
+        return None
+
+    def periods(self):
+        """📋 Dates de début et de fin (incluse) de chaque stade."""
+        boundaries = np.flatnonzero(np.diff(self.day_index)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(self.day_index)])) - 1
+        return [
+            {
+                "stage": STAGE_KEYS[self.day_index[start]],
+                "stage_label": STAGE_LABELS[self.day_index[start]],
+                "start_date": self.planting_date + timedelta(days=int(start)),
+                "end_date": self.planting_date + timedelta(days=int(end)),
+            }
+            for start, end in zip(starts, ends)
+        ]
+
+
+class GrowthStageService:
+    """
+    🌱 Stade de croissance des champs, à partir de la date de semis et du cycle de la culture.
+
+    Le calendrier de chaque champ est calculé une fois puis gardé en mémoire ; il est
+    invalidé explicitement (modification du champ ou de sa culture), recalculé si les
+    données fournies par l'appelant diffèrent (semis ou cycle modifiés), et rechargé
+    après `GROWTH_STAGE_CACHE_TTL_SECONDS` pour suivre les modifications faites par
+    d'autres workers.
+    """
+
+    def __init__(self, ttl=GROWTH_STAGE_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._calendars = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, calendar):
+        return calendar is not None and time.monotonic() - calendar.loaded_at < self.ttl
+
+    def _store(self, field_id, planting_date, lifecycle_days):
+        calendar = None
+        if planting_date is not None and lifecycle_days:
+            calendar = StageCalendar(planting_date, lifecycle_days)
+        with self._lock:
+            if calendar is None:
+                self._calendars.pop(field_id, None)
+            else:
+                self._calendars[field_id] = calendar
+        return calendar
+
+    def load(self, field_ids=None):
+        """📥 (Re)calcule les calendriers des champs donnés (tous si None) en une requête."""
+        rows = get_fields_planting_info(field_ids)
+        for row in rows:
+            self._store(row["field_id"], row["planting_date"],
+                        lifecycle_in_days(row["lifecycle_duration"], row["lifecycle_unit"]))
+        if field_ids is not None:
+            with self._lock:
+                for field_id in set(field_ids) - {row["field_id"] for row in rows}:
+                    self._calendars.pop(field_id, None)
+        logger.debug("🌱 %d calendriers de stades calculés.", len(rows))
+        return len(rows)
+
+    def calendar(self, field_id):
+        """🗓️ Calendrier d'un champ (None sans date de semis ou culture)."""
+        calendar = self._calendars.get(field_id)
+        if not self._fresh(calendar):
+            self.load([field_id])
+            calendar = self._calendars.get(field_id)
+        return calendar
+
+    def calendar_for(self, field_id, planting_date, lifecycle_days):
+        """
+        🗓️ Calendrier d'un champ dont l'appelant connaît déjà le semis et le cycle
+        (aucun accès à la base ; recalculé si ces données ont changé).
+        """
+        calendar = self._calendars.get(field_id)
+        if calendar is not None and self._fresh(calendar) and calendar.matches(planting_date, lifecycle_days):
+            return calendar
+        return self._store(field_id, planting_date, lifecycle_days)
+
+    def stage_for(self, field_id, day=None):
+        """🔍 Stade d'un champ au jour `day` (aujourd'hui par défaut), ou None."""
+        calendar = self.calendar(field_id)
+        if calendar is None:
+            return None
+        index = calendar.stage_index(day or date.today())
+        if index is None:
+            return None
+        return {"stage": STAGE_KEYS[index], "stage_label": STAGE_LABELS[index]}
+
+    def invalidate(self, field_id):
+        """🗑️ Oublie le calendrier d'un champ (recalculé à la prochaine demande)."""
+        with self._lock:
+            self._calendars.pop(field_id, None)
+
+    def invalidate_all(self):
+        """🗑️ Oublie tous les calendriers (ex. cycle d'une culture modifié)."""
+        with self._lock:
+            self._calendars.clear()
+
+
+# ✅ Service partagé par les routes, la recommandation et l'inférence
+growth_stage_service = GrowthStageService()
@@ -1,6 +1,12 @@
+import logging
 import pickle
+import time
 import numpy as np
 
+from utils.metrics import INFERENCE_DURATION
+
+logger = logging.getLogger(__name__)
+
 class InferenceEngine:
     def __init__(self, model_path):
         """
@@ -10,9 +16,9 @@ class InferenceEngine:
         try:
             with open(model_path, 'rb') as f:
                 self.model = pickle.load(f)
-            print("✅ Inference model successfully loaded.")
+            logger.info("✅ Inference model successfully loaded.")
         except Exception as e:
-            print(f"❌ Error loading model: {e}")
+            logger.error("❌ Error loading model: %s", e)
             self.model = None
 
     def preprocess_data(self, sensor_data):
@@ -30,7 +36,7 @@ class InferenceEngine:
             ]).reshape(1, -1)
             return features
         except Exception as e:
-            print(f"❌ Error in data preprocessing: {e}")
+            logger.error("❌ Error in data preprocessing: %s", e)
             return None
 
     def predict_action(self, sensor_data):
@@ -41,7 +47,9 @@ class InferenceEngine:
         """
         preprocessed_data = self.preprocess_data(sensor_data)
         if preprocessed_data is not None and self.model:
+            start = time.perf_counter()
             prediction = self.model.predict(preprocessed_data)[0]
+            INFERENCE_DURATION.labels(type(self.model).__name__).observe(time.perf_counter() - start)
             if prediction == 1:
                 return "START"
             elif prediction == 0:
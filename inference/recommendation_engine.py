@@ -0,0 +1,169 @@
+import logging
+import os
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from inference.et0 import daily_et0_for_fields
+from inference.growth_stages import (
+    CROP_COEFFICIENTS, GROWTH_STAGES, STAGE_KEYS, growth_stage_service, lifecycle_in_days
+)
+from models.fieldModel import get_fields_agronomic_state
+
+logger = logging.getLogger(__name__)
+
+# 📌 Ontologie chargée au premier calcul (chemin surchargeable)
+ONTOLOGY_PATH = os.getenv(
+    "ONTOLOGY_PATH", str(Path(__file__).resolve().parent.parent / "data" / "MergeMaizeIrrigOnto.rdf")
+)
+# 📌 Irrigation recommandée quand l'humidité du sol passe sous ce ratio du besoin du stade
+MOISTURE_TRIGGER_RATIO = float(os.getenv("RECOMMENDATION_MOISTURE_TRIGGER_RATIO", "0.6"))
+# 📌 Au-delà, la mesure d'humidité est ignorée
+MAX_READING_AGE_HOURS = float(os.getenv("IRRIGATION_MAX_READING_AGE_HOURS", "6"))
+# 📌 Jours écoulés pris en compte pour le bilan ETc - pluie
+ET_LOOKBACK_DAYS = int(os.getenv("RECOMMENDATION_ET_LOOKBACK_DAYS", "3"))
+_KC = np.array([CROP_COEFFICIENTS[key] for key in STAGE_KEYS])
+
+
+class RecommendationEngine:
+    """
+    💡 Recommandations d'irrigation pour tous les champs en un passage vectorisé.
+
+    Les besoins en eau des stades sont lus une seule fois dans l'ontologie ; l'état
+    des champs (semis, cycle, superficie, dernière humidité) est lu en une requête,
+    le stade de chaque champ provient de son calendrier en cache (`growth_stages`),
+    puis besoin, décision et volume sont calculés avec NumPy pour l'ensemble des
+    champs. Le besoin du stade est interprété comme une lame d'eau (mm) :
+    1 mm sur 1 ha = 10 000 L. Quand l'ET0 des derniers jours est connue, la lame
+    recommandée est le bilan ETc (Kc du stade × ET0) moins la pluie ; sinon c'est
+    le besoin du stade.
+    """
+
+    def __init__(self, ontology_path=ONTOLOGY_PATH):
+        self.ontology_path = ontology_path
+        self._stage_labels = None
+        self._stage_needs = None
+        self._lock = threading.Lock()
+
+    def _load_stages(self):
+        with self._lock:
+            if self._stage_needs is not None:
+                return
+            from ontology.ontology_loader import OntologyHandler
+
+            needs = OntologyHandler(self.ontology_path).get_stage_water_needs()
+            self._stage_labels = np.array([
+                (needs.get(key) or {}).get("label") or label for key, label, _ in GROWTH_STAGES
+            ], dtype=object)
+            self._stage_needs = np.array([
+                (needs.get(key) or {}).get("water_amount", np.nan) for key, _, _ in GROWTH_STAGES
+            ], dtype=np.float64)
+            missing = [key for key, _, _ in GROWTH_STAGES if key not in needs]
+            if missing:
+                logger.warning("⚠️ Besoin en eau absent de l'ontologie pour les stades : %s", ", ".join(missing))
+
+    def compute(self, rows, today=None, et0_mm=None, rainfall_mm=None):
+        """
+        🧮 Calcule les recommandations à partir des lignes de `get_fields_agronomic_state`.
+        :param et0_mm: ET0 cumulée de la période de bilan, alignée sur `rows` (NaN si inconnue).
+        :param rainfall_mm: Pluie cumulée de la même période, alignée sur `rows`.
+        :return: Liste de dictionnaires, un par champ, dans l'ordre des lignes.
+        """
+        self._load_stages()
+        if not rows:
+            return []
+        today = today or date.today()
+
+        def column(key, default=np.nan):
+            return np.array([default if row[key] is None else row[key] for row in rows], dtype=np.float64)
+
+        stage_index = np.full(len(rows), -1, dtype=np.int64)
+        for i, row in enumerate(rows):
+            calendar = growth_stage_service.calendar_for(
+                row["field_id"], row["planting_date"],
+                lifecycle_in_days(row["lifecycle_duration"], row["lifecycle_unit"]),
+            )
+            index = calendar.stage_index(today) if calendar is not None else None
+            if index is not None:
+                stage_index[i] = index
+        in_season = stage_index >= 0
+        stage_index = np.maximum(stage_index, 0)
+
+        days = np.array([
+            (today - row["planting_date"]).days if row["planting_date"] else np.nan for row in rows
+        ], dtype=np.float64)
+        moisture = column("soil_moisture")
+        area_ha = column("size", 0.0)
+
+        need_mm = np.where(in_season, self._stage_needs[stage_index], np.nan)
+        has_need = np.isfinite(need_mm)
+        # Sans mesure récente, la recommandation suit le seul besoin du stade
+        irrigate = has_need & (np.isnan(moisture) | (moisture < need_mm * MOISTURE_TRIGGER_RATIO))
+
+        et0_mm = np.full(len(rows), np.nan) if et0_mm is None else np.asarray(et0_mm, dtype=np.float64)
+        rainfall_mm = np.zeros(len(rows)) if rainfall_mm is None else np.nan_to_num(rainfall_mm)
+        kc = np.where(in_season, _KC[stage_index], np.nan)
+        etc_mm = kc * et0_mm
+        from_et = np.isfinite(etc_mm)
+        depth_mm = np.where(irrigate, np.where(from_et, np.maximum(etc_mm - rainfall_mm, 0.0), need_mm), 0.0)
+        volume_liters = depth_mm * area_ha * 10_000.0
+
+        results = []
+        for i, row in enumerate(rows):
+            results.append({
+                "field_id": row["field_id"],
+                "field_name": row["name"],
+                "crop_name": row["crop_name"],
+                "days_since_planting": int(days[i]) if np.isfinite(days[i]) else None,
+                "stage": STAGE_KEYS[stage_index[i]] if in_season[i] else None,
+                "stage_label": self._stage_labels[stage_index[i]] if in_season[i] else None,
+                "water_need_mm": float(need_mm[i]) if has_need[i] else None,
+                "soil_moisture": float(moisture[i]) if np.isfinite(moisture[i]) else None,
+                "crop_coefficient": float(kc[i]) if in_season[i] else None,
+                "et0_mm": round(float(et0_mm[i]), 2) if np.isfinite(et0_mm[i]) else None,
+                "etc_mm": round(float(etc_mm[i]), 2) if from_et[i] else None,
+                "rainfall_mm": round(float(rainfall_mm[i]), 2),
+                "depth_source": "et0" if from_et[i] else "ontology",
+                "irrigate": bool(irrigate[i]),
+                "recommended_depth_mm": round(float(depth_mm[i]), 2),
+                "recommended_volume_liters": round(float(volume_liters[i]), 1),
+            })
+        return results
+
+    def recommend(self, field_ids=None, today=None):
+        """💡 Recommandations pour les champs donnés (tous si `field_ids` est None)."""
+        today = today or date.today()
+        rows = get_fields_agronomic_state(field_ids, MAX_READING_AGE_HOURS)
+        if not rows:
+            return []
+        et0_mm = rainfall_mm = None
+        if ET_LOOKBACK_DAYS > 0:
+            balance = daily_et0_for_fields([row["field_id"] for row in rows],
+                                           today - timedelta(days=ET_LOOKBACK_DAYS), today - timedelta(days=1))
+            # Champs sans localisation : absents du bilan, ils gardent le besoin du stade
+            position = {field_id: i for i, field_id in enumerate(balance["field_ids"])}
+            et0_sum = np.where(np.isfinite(balance["et0"]).any(axis=1), np.nansum(balance["et0"], axis=1), np.nan)
+            rain_sum = np.nansum(balance["rainfall"], axis=1)
+            et0_mm = np.full(len(rows), np.nan)
+            rainfall_mm = np.zeros(len(rows))
+            for i, row in enumerate(rows):
+                if row["field_id"] in position:
+                    et0_mm[i] = et0_sum[position[row["field_id"]]]
+                    rainfall_mm[i] = rain_sum[position[row["field_id"]]]
+        return self.compute(rows, today, et0_mm, rainfall_mm)
+
+    def fields_needing_irrigation(self, field_ids):
+        """
+        🚿 Champs pour lesquels une irrigation est recommandée ; utilisable comme
+        `condition_checker` du planificateur.
+        """
+        field_ids = set(field_ids)
+        if not field_ids:
+            return set()
+        return {r["field_id"] for r in self.recommend(field_ids) if r["irrigate"]}
+
+
+# ✅ Moteur partagé (ontologie chargée à la première recommandation)
+recommendation_engine = RecommendationEngine()
@@ -0,0 +1,271 @@
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from models.spatialModel import get_field_geometry, get_sensor_locations, get_sensor_measurements
+from utils.kd_tree import KDTree, project
+
+logger = logging.getLogger(__name__)
+
+# 📌 L'index des capteurs est reconstruit après ce délai (modifications faites par d'autres workers)
+SENSOR_INDEX_TTL_SECONDS = float(os.getenv("SENSOR_INDEX_TTL_SECONDS", "300"))
+# 📌 Taille d'une maille de la grille d'humidité, et nombre maximal de mailles par côté
+MOISTURE_GRID_CELL_SIZE_M = float(os.getenv("MOISTURE_GRID_CELL_SIZE_M", "10"))
+MOISTURE_GRID_MAX_CELLS_PER_SIDE = int(os.getenv("MOISTURE_GRID_MAX_CELLS_PER_SIDE", "200"))
+# 📌 Capteurs pris en compte au-delà du bord du champ (champs voisins)
+MOISTURE_GRID_SEARCH_MARGIN_M = float(os.getenv("MOISTURE_GRID_SEARCH_MARGIN_M", "250"))
+MOISTURE_GRID_MAX_SENSORS = int(os.getenv("MOISTURE_GRID_MAX_SENSORS", "32"))
+# 📌 Exposant de la pondération par l'inverse de la distance
+IDW_POWER = float(os.getenv("MOISTURE_GRID_IDW_POWER", "2"))
+# 📌 Intervalle minimal entre deux relectures des mesures d'un champ
+MOISTURE_GRID_REFRESH_SECONDS = float(os.getenv("MOISTURE_GRID_REFRESH_SECONDS", "10"))
+# 📌 Au-delà, la mesure d'un capteur est ignorée
+MAX_READING_AGE_HOURS = float(os.getenv("IRRIGATION_MAX_READING_AGE_HOURS", "6"))
+DEFAULT_HUMIDITY_THRESHOLD = float(os.getenv("IRRIGATION_HUMIDITY_THRESHOLD", "30"))
+SOIL_MOISTURE_METRIC = "humidity"
+
+
+def idw_weights(cell_x, cell_y, sensor_x, sensor_y, power=IDW_POWER):
+    """
+    🧮 Matrice (mailles × capteurs) des poids normalisés de l'interpolation par
+    l'inverse de la distance : grille = poids @ valeurs. Une maille confondue
+    avec un capteur prend exactement sa valeur.
+    """
+    distance = np.hypot(cell_x[:, None] - sensor_x[None, :], cell_y[:, None] - sensor_y[None, :])
+    exact = distance < 1e-6
+    with np.errstate(divide="ignore"):
+        weights = np.where(exact.any(axis=1, keepdims=True), exact.astype(np.float64), distance ** -power)
+    return weights / weights.sum(axis=1, keepdims=True)
+
+
+class SensorIndex:
+    """
+    📍 Index spatial (arbre k-d) des capteurs, en coordonnées métriques locales.
+
+    Construit en une requête puis gardé en mémoire ; invalidé à la création,
+    modification ou suppression d'un capteur et relu après `SENSOR_INDEX_TTL_SECONDS`.
+    L'arbre n'est reconstruit que si les positions changent ; les autres attributs
+    (nom, statut…) sont rafraîchis à chaque relecture.
+    """
+
+    def __init__(self, ttl=SENSOR_INDEX_TTL_SECONDS):
+        self.ttl = ttl
+        self._version = 0
+        self._signature = None
+        self._tree = None
+        self._sensors = {}
+        self._origin_latitude = 0.0
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _ensure(self):
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return
+            rows = get_sensor_locations()
+            self._loaded_at = time.monotonic()
+            signature = tuple((row["sensor_id"], row["latitude"], row["longitude"]) for row in rows)
+            if self._tree is not None and signature == self._signature:
+                # Positions inchangées : arbre et grilles conservés, seuls nom, type, statut
+                # et champ des capteurs sont rafraîchis
+                self._sensors = {row["sensor_id"]: dict(row, x=self._sensors[row["sensor_id"]]["x"],
+                                                        y=self._sensors[row["sensor_id"]]["y"]) for row in rows}
+                return
+            self._origin_latitude = float(np.mean([row["latitude"] for row in rows])) if rows else 0.0
+            x, y = self.project([row["latitude"] for row in rows], [row["longitude"] for row in rows])
+            self._sensors = {row["sensor_id"]: dict(row, x=float(xi), y=float(yi)) for row, xi, yi in zip(rows, x, y)}
+            self._tree = KDTree((sensor["x"], sensor["y"], sensor_id) for sensor_id, sensor in self._sensors.items())
+            self._signature = signature
+            self._version += 1
+            logger.debug("📍 Index spatial construit : %d capteurs.", len(rows))
+
+    @property
+    def version(self):
+        """🔢 Incrémenté à chaque modification de la position des capteurs."""
+        self._ensure()
+        return self._version
+
+    def project(self, latitude, longitude):
+        """🗺️ Coordonnées métriques (x, y) dans le repère de l'index."""
+        return project(latitude, longitude, self._origin_latitude)
+
+    def sensor(self, sensor_id):
+        self._ensure()
+        return self._sensors.get(sensor_id)
+
+    def _describe(self, matches):
+        return [
+            {key: self._sensors[sensor_id][key] for key in ("sensor_id", "name", "type", "status", "field_id",
+                                                             "latitude", "longitude")}
+            | {"distance_m": round(distance, 2)}
+            for distance, sensor_id in matches
+        ]
+
+    def nearest(self, latitude, longitude, k=1):
+        """🔍 Les `k` capteurs les plus proches d'un point, avec leur distance (m)."""
+        self._ensure()
+        x, y = self.project(latitude, longitude)
+        return self._describe(self._tree.nearest(float(x), float(y), k))
+
+    def within(self, latitude, longitude, radius_m):
+        """🔍 Capteurs situés à moins de `radius_m` mètres d'un point, du plus proche au plus lointain."""
+        self._ensure()
+        x, y = self.project(latitude, longitude)
+        return self._describe(self._tree.within(float(x), float(y), radius_m))
+
+    def invalidate(self):
+        """🗑️ Force la relecture des capteurs à la prochaine requête."""
+        with self._lock:
+            self._loaded_at = None
+
+
+class FieldMoistureGrid:
+    """🗺️ Grille d'humidité d'un champ : géométrie, capteurs voisins et poids IDW en cache."""
+
+    def __init__(self, geometry, sensors, index_version):
+        self.field_id = geometry["field_id"]
+        self.index_version = index_version
+        self.humidity_threshold = geometry["humidity_threshold"]
+        side_m = math.sqrt(geometry["size"] * 10_000.0)  # Champ assimilé à un carré centré sur sa position
+        self.cols = self.rows = max(1, min(MOISTURE_GRID_MAX_CELLS_PER_SIDE, math.ceil(side_m / MOISTURE_GRID_CELL_SIZE_M)))
+        self.cell_size_m = side_m / self.cols
+        center_x, center_y = sensor_index.project(geometry["latitude"], geometry["longitude"])
+        offsets = (np.arange(self.cols) + 0.5) * self.cell_size_m - side_m / 2
+        grid_x, grid_y = np.meshgrid(center_x + offsets, center_y + offsets[::-1])  # Ligne 0 au nord
+        self.cell_x, self.cell_y = grid_x.ravel(), grid_y.ravel()
+        self.south_west = (
+            geometry["latitude"] - math.degrees(side_m / 2 / 6_371_000.0),
+            geometry["longitude"] - math.degrees(side_m / 2 / 6_371_000.0 / math.cos(math.radians(geometry["latitude"]))),
+        )
+        self.sensors = sensors
+        self.sensor_ids = np.array([sensor["sensor_id"] for sensor in sensors], dtype=np.int64)
+        self.sensor_x = np.array([sensor["x"] for sensor in sensors], dtype=np.float64)
+        self.sensor_y = np.array([sensor["y"] for sensor in sensors], dtype=np.float64)
+        self.values = np.full(len(sensors), np.nan)
+        self.measured_at = [None] * len(sensors)
+        self.active = np.zeros(len(sensors), dtype=bool)
+        self.weights = None
+        self.raster = np.full(self.rows * self.cols, np.nan)
+        self.refreshed_at = None
+        self.lock = threading.Lock()
+
+    def apply(self, measurements, now):
+        """
+        🔄 Intègre les dernières mesures : rien n'est recalculé si elles sont inchangées,
+        seul le produit poids × valeurs l'est si les mêmes capteurs restent valides, et
+        les poids ne sont recalculés que si l'ensemble des capteurs valides change.
+        """
+        position = {sensor_id: i for i, sensor_id in enumerate(self.sensor_ids.tolist())}
+        changed = False
+        for row in measurements:
+            i = position[row["sensor_id"]]
+            if self.measured_at[i] != row["measured_at"] or self.values[i] != row["value"]:
+                self.values[i], self.measured_at[i] = row["value"], row["measured_at"]
+                changed = True
+        oldest = now - timedelta(hours=MAX_READING_AGE_HOURS)
+        active = np.array([at is not None and at >= oldest for at in self.measured_at], dtype=bool)
+        if (active != self.active).any() or (self.weights is None and active.any()):
+            self.active = active
+            self.weights = (idw_weights(self.cell_x, self.cell_y, self.sensor_x[active], self.sensor_y[active])
+                            if active.any() else None)
+            changed = True
+        if changed:
+            self.raster = (self.weights @ self.values[self.active] if self.weights is not None
+                           else np.full(self.rows * self.cols, np.nan))
+        self.refreshed_at = time.monotonic()
+        return changed
+
+    def as_dict(self):
+        threshold = DEFAULT_HUMIDITY_THRESHOLD if self.humidity_threshold is None else self.humidity_threshold
+        has_data = self.weights is not None
+        grid = self.raster.reshape(self.rows, self.cols)
+        return {
+            "field_id": self.field_id,
+            "rows": self.rows,
+            "cols": self.cols,
+            "cell_size_m": round(self.cell_size_m, 3),
+            "south_west_latitude": self.south_west[0],
+            "south_west_longitude": self.south_west[1],
+            "humidity_threshold": threshold,
+            "min": float(grid.min()) if has_data else None,
+            "mean": float(grid.mean()) if has_data else None,
+            "max": float(grid.max()) if has_data else None,
+            "dry_cells_ratio": float((grid < threshold).mean()) if has_data else None,
+            "sensors": [
+                {
+                    "sensor_id": sensor["sensor_id"],
+                    "latitude": sensor["latitude"],
+                    "longitude": sensor["longitude"],
+                    "value": float(self.values[i]) if self.active[i] else None,
+                    "measured_at": self.measured_at[i],
+                }
+                for i, sensor in enumerate(self.sensors)
+            ],
+            "values": np.round(grid, 2).tolist() if has_data else None,
+        }
+
+
+class MoistureGridService:
+    """
+    💧 Grilles d'humidité du sol par champ (modulation intra-parcellaire de l'irrigation).
+
+    La géométrie, les capteurs voisins (index spatial) et les poids IDW d'un champ
+    sont calculés une fois ; ensuite chaque rafraîchissement relit en une requête
+    la dernière mesure de ces seuls capteurs et ne recalcule que ce qui a changé.
+    """
+
+    def __init__(self):
+        self._grids = {}
+        self._lock = threading.Lock()
+
+    def _build(self, field_id):
+        geometry = get_field_geometry(field_id)
+        if geometry is None:
+            return None
+        half_diagonal = math.sqrt(geometry["size"] * 10_000.0 / 2)
+        nearby = sensor_index.within(geometry["latitude"], geometry["longitude"],
+                                     half_diagonal + MOISTURE_GRID_SEARCH_MARGIN_M)
+        sensors = [sensor_index.sensor(match["sensor_id"]) for match in nearby[:MOISTURE_GRID_MAX_SENSORS]]
+        grid = FieldMoistureGrid(geometry, sensors, sensor_index.version)
+        logger.debug("🗺️ Grille du champ %s : %d×%d mailles, %d capteurs voisins.",
+                     field_id, grid.rows, grid.cols, len(sensors))
+        return grid
+
+    def grid(self, field_id, now=None):
+        """🗺️ Grille d'humidité à jour d'un champ (None si le champ n'existe pas)."""
+        now = now or datetime.now()
+        with self._lock:
+            grid = self._grids.get(field_id)
+        if grid is None or grid.index_version != sensor_index.version:
+            grid = self._build(field_id)
+            if grid is None:
+                self.invalidate(field_id)
+                return None
+            with self._lock:
+                self._grids[field_id] = grid
+        with grid.lock:
+            if grid.refreshed_at is None or time.monotonic() - grid.refreshed_at >= MOISTURE_GRID_REFRESH_SECONDS:
+                measurements = get_sensor_measurements(grid.sensor_ids.tolist(), SOIL_MOISTURE_METRIC) \
+                    if len(grid.sensor_ids) else []
+                grid.apply(measurements, now)
+            return grid.as_dict()
+
+    def invalidate(self, field_id):
+        """🗑️ Oublie la grille d'un champ (géométrie ou seuil modifiés, champ supprimé)."""
+        with self._lock:
+            self._grids.pop(field_id, None)
+
+    def invalidate_all(self):
+        """🗑️ Oublie toutes les grilles (ex. seuil d'humidité d'une culture modifié)."""
+        with self._lock:
+            self._grids.clear()
+
+
+# ✅ Index et grilles partagés par les routes
+sensor_index = SensorIndex()
+moisture_grid_service = MoistureGridService()
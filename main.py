@@ -1,23 +1,36 @@
+import asyncio
 import logging
+import os
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 
+from actuators.irrigation_scheduler import IrrigationScheduler
+from actuators.irrigation_service import evaluate_environmental_conditions
+from actuators.pump_telemetry import telemetry_buffer
+from communication.notification_stream import notification_hub
+from communication.sensor_ingest import sensor_ingest
+from communication.sensor_liveness import sensor_liveness
+from models.notificationModel import notification_aggregator
 from database.init_db import init_database
 from routes.auth import router as auth_router
 from routes.cropRouter import router as crop_router
 from routes.fieldRouter import router as field_router
 from routes.iotDataRouter import router as iot_data_router  # Ajout de la route IoT Data
+from routes.metricsRouter import router as metrics_router
 from routes.pumpRouter import router as pump_router
+from routes.recommendationRouter import router as recommendation_router
 from routes.scheduleRouter import router as schedule_router
 from routes.notificationsRoute import router as notifications_router
 from routes.sensorRouter import router as sensor_router
 from routes.sensorsReadingsRoute import router as sensorsReadings_router
+from utils.logging_config import setup_logging
+from utils.metrics import MetricsMiddleware
 
-# ✅ Configuration du logging
+# ✅ Configuration du logging (file non bloquante, niveaux par module via LOG_LEVELS)
+setup_logging()
 logger = logging.getLogger("uvicorn")
-logger.setLevel(logging.DEBUG)
 
 init_database()
 # ✅ Initialisation de FastAPI
@@ -38,6 +51,9 @@ app.add_middleware(
     allow_headers=["*"],  # Autoriser tous les en-têtes
 )
 
+# ✅ Mesure de la latence des requêtes par route (exposée sur /metrics)
+app.add_middleware(MetricsMiddleware)
+
 # ✅ Ajout des routes API
 app.include_router(auth_router, prefix="/api/auth", tags=["Authentification"])
 app.include_router(pump_router, prefix="/api/pumps", tags=["Pumps"])
@@ -48,6 +64,78 @@ app.include_router(crop_router, prefix="/api/crops", tags=["Crops"])
 app.include_router(sensor_router, prefix="/api/sensors", tags=["Sensors"])
 app.include_router(notifications_router, prefix="/api/notifications", tags=["Notifications"])
 app.include_router(iot_data_router, prefix="/api/iot-data", tags=["ioTDataReader"])  # Intégration de la route IoT Data
+app.include_router(recommendation_router, prefix="/api/recommendations", tags=["Recommendations"])
+app.include_router(metrics_router, prefix="/metrics", tags=["Monitoring"])
+
+# ✅ Planificateur d'irrigation (un seul actif grâce au verrou consultatif PostgreSQL)
+irrigation_scheduler = IrrigationScheduler(condition_checker=evaluate_environmental_conditions)
+
+
+@app.on_event("startup")
+def start_irrigation_scheduler():
+    if os.getenv("IRRIGATION_SCHEDULER_ENABLED", "false").lower() == "true":
+        irrigation_scheduler.start()
+
+
+@app.on_event("shutdown")
+def stop_irrigation_scheduler():
+    irrigation_scheduler.stop()
+
+
+# ✅ Écriture groupée de la télémétrie des pompes
+@app.on_event("startup")
+def start_pump_telemetry():
+    telemetry_buffer.start()
+
+
+@app.on_event("shutdown")
+def stop_pump_telemetry():
+    telemetry_buffer.stop()
+
+
+# ✅ Enregistrement groupé des mesures reçues en MQTT
+@app.on_event("startup")
+def start_sensor_ingest():
+    sensor_ingest.start()
+
+
+@app.on_event("shutdown")
+def stop_sensor_ingest():
+    sensor_ingest.stop()
+
+
+# ✅ Diffusion des notifications (un écouteur PostgreSQL par worker)
+@app.on_event("startup")
+async def start_notification_hub():
+    notification_hub.start(asyncio.get_running_loop())
+
+
+@app.on_event("shutdown")
+def stop_notification_hub():
+    notification_hub.stop()
+
+
+# ✅ Agrégation des notifications (écritures groupées et dédupliquées)
+@app.on_event("startup")
+def start_notification_aggregator():
+    notification_aggregator.start()
+
+
+@app.on_event("shutdown")
+def stop_notification_aggregator():
+    notification_aggregator.stop()
+
+
+# ✅ Suivi de l'activité des capteurs (statut et dernier contact écrits par lots)
+@app.on_event("startup")
+def start_sensor_liveness():
+    sensor_liveness.start()
+
+
+@app.on_event("shutdown")
+def stop_sensor_liveness():
+    sensor_liveness.stop()
+
 
 # ✅ Route principale pour vérifier l'état de l'API
 @app.get("/", tags=["Root"])
@@ -1,4 +1,6 @@
+import sys
 from database.database import get_db_cursor
+from utils.metrics import instrument_module
 import psycopg2
 
 def create_crop(name: str, lifecycle_duration: int, unit: str):
@@ -47,7 +49,7 @@ def update_crop(crop_id: int, updates: dict):
     if cursor and conn:
         fields = ", ".join([f"{key} = %s" for key in updates.keys()])
         values = list(updates.values()) + [crop_id]
-        query = f"UPDATE crops SET {fields} WHERE id = %s RETURNING *;"
+        query = f"UPDATE crop_types SET {fields} WHERE id = %s RETURNING *;"
         cursor.execute(query, values)
         updated_crop = cursor.fetchone()
         conn.commit()
@@ -63,3 +65,7 @@ def delete_crop(crop_id: int):
         conn.commit()
         cursor.close()
         conn.close()
+
+
+# 📊 Instrumentation (nombre d'appels et durée) de toutes les fonctions du module
+instrument_module(sys.modules[__name__])
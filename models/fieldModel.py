@@ -1,14 +1,15 @@
+import sys
 import logging
 
 from pydantic import BaseModel
 
 from database.database import get_db_cursor
+from utils.metrics import instrument_module
 import psycopg2
 from datetime import datetime, date
 from typing import Optional
 
-# ✅ Configuration du logger
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+# ✅ Logger du module (configuration centralisée dans utils.logging_config)
 logger = logging.getLogger(__name__)
 
 
@@ -25,16 +26,10 @@ def create_field(
     """🌾 Ajouter un nouveau champ avec gestion stricte des types"""
     cursor, conn = get_db_cursor()
 
-    # ✅ Log des données reçues pour debug
-    logger.info("📩 Données reçues pour création de champ :")
-    logger.info(" - name: %s (type: %s)", name, type(name))
-    logger.info(" - location: %s (type: %s)", location, type(location))
-    logger.info(" - latitude: %s (type: %s)", latitude, type(latitude))
-    logger.info(" - longitude: %s (type: %s)", longitude, type(longitude))
-    logger.info(" - size: %s (type: %s)", size, type(size))
-    logger.info(" - sensor_density: %s (type: %s)", sensor_density, type(sensor_density))
-    logger.info(" - crop_type_id: %s (type: %s)", crop_type_id, type(crop_type_id))
-    logger.info(" - planting_date: %s (type: %s)", planting_date, type(planting_date))
+    logger.debug(
+        "📩 Création de champ : name=%r location=%r lat=%r lon=%r size=%r sensor_density=%r crop_type_id=%r planting_date=%r",
+        name, location, latitude, longitude, size, sensor_density, crop_type_id, planting_date
+    )
 
     if cursor and conn:
         try:
@@ -95,6 +90,55 @@ def get_field_by_id(field_id: int):
         conn.close()
         return field
 
+def get_fields_planting_info(field_ids=None):
+    """🌱 Date de semis et cycle de la culture des champs (tous si `field_ids` est None)"""
+    cursor, conn = get_db_cursor()
+    if cursor and conn:
+        try:
+            cursor.execute("""
+                SELECT f.id AS field_id, f.planting_date,
+                       c.lifecycle_duration, c.unit AS lifecycle_unit
+                  FROM fields f
+                  LEFT JOIN crop_types c ON c.id = f.crop_type_id
+                 WHERE %(field_ids)s::int[] IS NULL OR f.id = ANY(%(field_ids)s::int[]);
+            """, {"field_ids": list(field_ids) if field_ids is not None else None})
+            return cursor.fetchall()
+        except psycopg2.Error as e:
+            raise Exception(f"❌ Erreur lors de la lecture des dates de semis : {e}")
+        finally:
+            cursor.close()
+            conn.close()
+
+def get_fields_agronomic_state(field_ids=None, max_reading_age_hours: float = 6.0):
+    """
+    🌱 Date de semis, cycle de la culture, superficie et dernière humidité du sol de
+    chaque champ (tous les champs si `field_ids` est None), en une requête.
+    """
+    cursor, conn = get_db_cursor()
+    if cursor and conn:
+        try:
+            cursor.execute("""
+                SELECT f.id AS field_id, f.name, f.size, f.planting_date,
+                       c.name AS crop_name, c.lifecycle_duration, c.unit AS lifecycle_unit,
+                       h.value AS soil_moisture, h.measured_at AS moisture_measured_at
+                  FROM fields f
+                  LEFT JOIN crop_types c ON c.id = f.crop_type_id
+                  LEFT JOIN field_latest_measurements h
+                         ON h.field_id = f.id AND h.metric = 'humidity'
+                        AND h.measured_at >= LOCALTIMESTAMP - make_interval(secs => %(max_age)s)
+                 WHERE %(field_ids)s::int[] IS NULL OR f.id = ANY(%(field_ids)s::int[])
+                 ORDER BY f.id;
+            """, {
+                "field_ids": list(field_ids) if field_ids is not None else None,
+                "max_age": max_reading_age_hours * 3600,
+            })
+            return cursor.fetchall()
+        except psycopg2.Error as e:
+            raise Exception(f"❌ Erreur lors de la lecture de l'état des champs : {e}")
+        finally:
+            cursor.close()
+            conn.close()
+
 def update_field(field_id: int, updates: dict):
     """🛠️ Mettre à jour un champ"""
     cursor, conn = get_db_cursor()
@@ -144,3 +188,7 @@ class FieldUpdate(BaseModel):
     sensor_density: Optional[float] = None
     crop_type_id: Optional[int] = None
     planting_date: Optional[date] = None  # ✅ Correction du type
+
+
+# 📊 Instrumentation (nombre d'appels et durée) de toutes les fonctions du module
+instrument_module(sys.modules[__name__])
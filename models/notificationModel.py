@@ -1,7 +1,21 @@
+import os
+import sys
+import logging
+import threading
 from database.database import get_db_cursor
+from utils.metrics import instrument_module
 import psycopg2
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+# 📌 Fenêtre de regroupement des notifications de même (type, clé)
+NOTIFICATION_DEDUP_WINDOW_SECONDS = float(os.getenv("NOTIFICATION_DEDUP_WINDOW_SECONDS", "300"))
+# 📌 Fréquence d'écriture du tampon de l'agrégateur
+NOTIFICATION_FLUSH_INTERVAL_SECONDS = float(os.getenv("NOTIFICATION_FLUSH_INTERVAL_SECONDS", "2"))
+# 📌 Au-delà, l'écriture est anticipée
+NOTIFICATION_FLUSH_BATCH_SIZE = 1000
+
 
 def create_notification(
         message: str,
@@ -38,21 +52,52 @@ def create_notification(
             raise Exception(f"❌ Erreur lors de la création de la notification : {e}")
 
 
-def get_notifications():
-    """🔍 Récupérer toutes les notifications actives"""
+def get_notifications(before_id: int = None, limit: int = 50, unread_only: bool = False):
+    """
+    🔍 Récupérer une page de notifications actives, des plus récentes aux plus anciennes.
+
+    Pagination par clé : la page suivante s'obtient avec `before_id` = dernier ID reçu
+    (parcours de l'index `idx_notifications_active_id`, sans OFFSET).
+    """
     cursor, conn = get_db_cursor()
     if cursor and conn:
-        cursor.execute("SELECT * FROM notifications WHERE active = TRUE ORDER BY timestamp DESC;")
-        notifications = cursor.fetchall()
+        try:
+            # ✅ Timestamp formaté directement par PostgreSQL
+            cursor.execute("""
+                SELECT id, message, notification_type, read, active, dedup_key, occurrences,
+                       to_char(timestamp, 'YYYY-MM-DD HH24:MI:SS') AS timestamp,
+                       to_char(last_occurred_at, 'YYYY-MM-DD HH24:MI:SS') AS last_occurred_at
+                  FROM notifications
+                 WHERE active = TRUE
+                   AND (%(before_id)s::int IS NULL OR id < %(before_id)s)
+                   AND (NOT %(unread_only)s OR read = FALSE)
+                 ORDER BY id DESC
+                 LIMIT %(limit)s;
+            """, {"before_id": before_id, "limit": limit, "unread_only": unread_only})
+            return cursor.fetchall()
+        except psycopg2.Error as e:
+            raise Exception(f"❌ Erreur lors de la récupération des notifications : {e}")
+        finally:
+            cursor.close()
+            conn.close()
 
-        # ✅ Convertir le champ timestamp en format lisible
-        for notification in notifications:
-            if notification["timestamp"]:
-                notification["timestamp"] = notification["timestamp"].strftime('%Y-%m-%d %H:%M:%S')
 
-        cursor.close()
-        conn.close()
-        return notifications
+def count_unread_notifications():
+    """🔔 Nombre de notifications actives non lues (index partiel `idx_notifications_unread`)"""
+    cursor, conn = get_db_cursor()
+    if cursor and conn:
+        try:
+            cursor.execute("""
+                SELECT COUNT(*) AS unread
+                  FROM notifications
+                 WHERE active = TRUE AND read = FALSE;
+            """)
+            return cursor.fetchone()["unread"]
+        except psycopg2.Error as e:
+            raise Exception(f"❌ Erreur lors du comptage des notifications : {e}")
+        finally:
+            cursor.close()
+            conn.close()
 
 
 def get_notification_by_id(notification_id: int):
@@ -107,3 +152,188 @@ def deactivate_notification(notification_id: int):
         cursor.close()
         conn.close()
         return updated_notification
+
+
+def _bulk_update_notifications(assignment: str, condition: str, ids=None, up_to=None):
+    """📦 Applique `assignment` aux notifications sélectionnées par IDs et/ou date, en une requête"""
+    if ids is None and up_to is None:
+        raise Exception("❌ Sélection vide : préciser des IDs et/ou une date limite.")
+    cursor, conn = get_db_cursor()
+    if cursor and conn:
+        try:
+            cursor.execute(f"""
+                UPDATE notifications
+                   SET {assignment}
+                 WHERE {condition}
+                   AND (%(ids)s::int[] IS NULL OR id = ANY(%(ids)s::int[]))
+                   AND (%(up_to)s::timestamp IS NULL OR timestamp <= %(up_to)s::timestamp);
+            """, {"ids": ids, "up_to": up_to})
+            updated = cursor.rowcount
+            conn.commit()
+            return updated
+        except psycopg2.Error as e:
+            conn.rollback()
+            raise Exception(f"❌ Erreur lors de la mise à jour groupée des notifications : {e}")
+        finally:
+            cursor.close()
+            conn.close()
+
+
+def mark_notifications_as_read(ids=None, up_to=None):
+    """✅ Marquer comme lues des notifications (liste d'IDs et/ou jusqu'à `up_to`) ; renvoie le nombre modifié"""
+    return _bulk_update_notifications("read = TRUE", "active = TRUE AND read = FALSE", ids, up_to)
+
+
+def deactivate_notifications(ids=None, up_to=None):
+    """🛑 Désactiver des notifications (liste d'IDs et/ou jusqu'à `up_to`) ; renvoie le nombre modifié"""
+    return _bulk_update_notifications("active = FALSE", "active = TRUE", ids, up_to)
+
+
+def get_notifications_after(last_id: int, limit: int = 500):
+    """📬 Notifications actives d'ID supérieur à `last_id`, par ordre croissant (reprise d'un flux)"""
+    cursor, conn = get_db_cursor()
+    if cursor and conn:
+        try:
+            cursor.execute("""
+                SELECT id, message, notification_type, timestamp, read, occurrences
+                  FROM notifications
+                 WHERE id > %s AND active = TRUE
+                 ORDER BY id
+                 LIMIT %s;
+            """, (last_id, limit))
+            return cursor.fetchall()
+        except psycopg2.Error as e:
+            raise Exception(f"❌ Erreur lors de la récupération des notifications : {e}")
+        finally:
+            cursor.close()
+            conn.close()
+
+
+def coalesce_notifications(entries, window_seconds: float = None):
+    """
+    🧮 Enregistre des notifications en une requête, en les regroupant par (type, clé).
+
+    Une notification active de même (type, clé) survenue dans la fenêtre voit son
+    compteur `occurrences` incrémenté au lieu d'une nouvelle insertion.
+
+    :param entries: Liste de tuples `(message, notification_type, dedup_key, occurrences)`,
+                    `dedup_key` à None pour une notification jamais regroupée.
+    :return: Nombre de nouvelles lignes insérées.
+    :raises psycopg2.OperationalError: Base de données injoignable.
+    """
+    if not entries:
+        return 0
+    window = NOTIFICATION_DEDUP_WINDOW_SECONDS if window_seconds is None else window_seconds
+    cursor, conn = get_db_cursor()
+    if not (cursor and conn):
+        # Levée (et non None) : l'agrégateur remet alors le lot en attente
+        raise psycopg2.OperationalError("❌ Impossible de se connecter à la base de données.")
+    try:
+        messages, types, keys, counts = (list(column) for column in zip(*entries))
+        cursor.execute("""
+            SELECT coalesce_notifications(
+                       %s::text[], %s::text[], %s::text[], %s::int[], make_interval(secs => %s)
+                   ) AS inserted;
+        """, (messages, types, keys, counts, window))
+        inserted = cursor.fetchone()["inserted"]
+        conn.commit()
+        return inserted
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise Exception(f"❌ Erreur lors de l'enregistrement groupé des notifications : {e}")
+    finally:
+        cursor.close()
+        conn.close()
+
+
+class NotificationAggregator:
+    """
+    📢 Agrégateur de notifications.
+
+    `notify()` ne touche pas la base : les notifications de même (type, clé) sont
+    fusionnées en mémoire (compteur + dernier message), puis un thread les écrit
+    périodiquement en une requête via `coalesce_notifications`, qui prolonge les
+    notifications déjà présentes dans la fenêtre de déduplication. Une rafale
+    d'événements identiques ne produit ainsi qu'une ligne.
+    """
+
+    def __init__(self, flush_interval=NOTIFICATION_FLUSH_INTERVAL_SECONDS,
+                 window_seconds=NOTIFICATION_DEDUP_WINDOW_SECONDS):
+        self.flush_interval = flush_interval
+        self.window_seconds = window_seconds
+        self._pending = {}
+        self._unkeyed = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def notify(self, message: str, notification_type: str, key: str = None):
+        """
+        ➕ Ajoute une notification au tampon (aucun accès à la base).
+
+        :param key: Clé de regroupement (ex. `pump:12:started`) ; None pour une
+                    notification qui n'est jamais regroupée.
+        """
+        with self._lock:
+            if key is None:
+                self._unkeyed.append([message, notification_type, None, 1])
+            else:
+                entry = self._pending.get((notification_type, key))
+                if entry is None:
+                    self._pending[(notification_type, key)] = [message, notification_type, key, 1]
+                else:
+                    entry[0] = message
+                    entry[3] += 1
+            full = len(self._pending) + len(self._unkeyed) >= NOTIFICATION_FLUSH_BATCH_SIZE
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """💾 Écrit les notifications en attente ; renvoie le nombre de lignes insérées."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            unkeyed, self._unkeyed = self._unkeyed, []
+        entries = [tuple(entry) for entry in pending.values()] + [tuple(entry) for entry in unkeyed]
+        if not entries:
+            return 0
+        try:
+            return coalesce_notifications(entries, self.window_seconds)
+        except Exception as e:
+            logger.error("❌ Écriture de %d notifications échouée, nouvel essai au prochain cycle : %s", len(entries), e)
+            with self._lock:  # Fusion avec les notifications arrivées entre-temps
+                for slot, entry in pending.items():
+                    newer = self._pending.setdefault(slot, entry)
+                    if newer is not entry:
+                        newer[3] += entry[3]
+                self._unkeyed[:0] = unkeyed
+            return 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+        self.flush()
+
+    def start(self):
+        """▶️ Démarre le thread d'écriture."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="notification-aggregator", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """⏹️ Arrête le thread après une dernière écriture."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+# ✅ Agrégateur partagé (démarré au lancement de l'application)
+notification_aggregator = NotificationAggregator()
+
+
+# 📊 Instrumentation (nombre d'appels et durée) de toutes les fonctions du module
+instrument_module(sys.modules[__name__])
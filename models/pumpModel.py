@@ -1,5 +1,7 @@
+import sys
 import psycopg2
 from database.database import get_db_connection
+from utils.metrics import instrument_module
 
 def create_pump(name: str, field_id: int):
     """🆕 Créer une nouvelle pompe"""
@@ -130,39 +132,155 @@ def delete_pump(pump_id: int):
         conn.close()
 
 
-def toggle_pump(pump_id: int):
-    """🔄 Activer/Désactiver une pompe"""
+def enqueue_pump_commands(pump_ids: list, command: str, cursor=None):
+    """
+    📨 Ajoute une commande ('on' / 'off') par pompe dans la file `pump_commands`
+    (fonction SQL `enqueue_pump_commands`, partagée avec le trigger des plannings).
+    L'état des pompes est mis à jour par le worker après accusé de réception.
+
+    :param cursor: Curseur d'une transaction en cours (sinon une connexion est ouverte et validée).
+    :return: Liste des commandes créées (`id`, `pump_id`, `command`, `status`).
+    """
+    query = """
+        SELECT id, pump_id, command, status, created_at
+          FROM enqueue_pump_commands(%s::int[], %s);
+    """
+    if cursor is not None:
+        cursor.execute(query, (list(pump_ids), command))
+        return cursor.fetchall()
+
     conn = get_db_connection()
     if not conn:
         raise Exception("❌ Impossible de se connecter à la base de données.")
 
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-            # 🔄 Récupérer l'état actuel de la pompe
-            cursor.execute("SELECT is_on FROM pumps WHERE id = %s;", (pump_id,))
-            pump = cursor.fetchone()
+            cursor.execute(query, (list(pump_ids), command))
+            commands = cursor.fetchall()
+            conn.commit()
+            return commands
 
-            if not pump:
-                return None  # Pompe inexistante
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise Exception(f"❌ Erreur lors de l'envoi de la commande aux pompes: {e}")
 
-            new_status = not pump["is_on"]
+    finally:
+        conn.close()
 
-            # 🔄 Mettre à jour l'état de la pompe
-            cursor.execute("""
-                UPDATE pumps 
-                SET is_on = %s, last_activated = NOW() 
-                WHERE id = %s 
-                RETURNING *;
-            """, (new_status, pump_id))
 
-            updated_pump = cursor.fetchone()
+def bulk_set_pump_state(command: str, pump_ids: list = None, field_id: int = None):
+    """
+    🎛️ Allumer / éteindre un ensemble de pompes (liste d'IDs et/ou champ) en une transaction.
+
+    Les pompes dont l'état visé (dernière commande non terminée, sinon état actuel) est
+    déjà le bon sont ignorées, ainsi que les pompes en maintenance pour un démarrage.
+    Une commande par pompe est mise en file (envoi concurrent par les workers) et une
+    seule notification récapitulative est créée.
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise Exception("❌ Impossible de se connecter à la base de données.")
+
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            cursor.execute("""
+                WITH selected AS (
+                    SELECT p.id, p.maintenance_status,
+                           COALESCE(last_cmd.command = 'on', p.is_on) AS targeted_on
+                      FROM pumps p
+                      LEFT JOIN LATERAL (
+                            SELECT c.command
+                              FROM pump_commands c
+                             WHERE c.pump_id = p.id AND c.status IN ('pending', 'dispatching')
+                             ORDER BY c.id DESC
+                             LIMIT 1
+                      ) AS last_cmd ON TRUE
+                     WHERE (%(pump_ids)s::int[] IS NULL OR p.id = ANY(%(pump_ids)s::int[]))
+                       AND (%(field_id)s::int IS NULL OR p.field_id = %(field_id)s)
+                     ORDER BY p.id
+                       FOR UPDATE OF p
+                ), queued AS (
+                    INSERT INTO pump_commands (pump_id, command)
+                    SELECT id, %(command)s
+                      FROM selected
+                     WHERE targeted_on IS DISTINCT FROM (%(command)s = 'on')
+                       AND (%(command)s = 'off' OR maintenance_status = 'ok')
+                     ORDER BY id
+                    RETURNING id, pump_id, command, status, created_at
+                ), notified AS (
+                    INSERT INTO notifications (message, notification_type)
+                    SELECT CASE WHEN %(command)s = 'on' THEN '🚰 Démarrage' ELSE '🛑 Arrêt' END
+                           || ' groupé demandé pour ' || COUNT(*) || ' pompe(s)'
+                           || COALESCE(' du champ ' || %(field_id)s::int, ''),
+                           CASE WHEN %(command)s = 'on' THEN 'info' ELSE 'warning' END
+                      FROM queued
+                    HAVING COUNT(*) > 0
+                )
+                SELECT (SELECT COUNT(*) FROM selected) AS matched,
+                       COALESCE((SELECT json_agg(q ORDER BY q.pump_id) FROM queued q), '[]') AS commands;
+            """, {"command": command, "pump_ids": pump_ids, "field_id": field_id})
+            result = cursor.fetchone()
             conn.commit()
+            return result
 
-            # ✅ Convertir `datetime` en string
-            if updated_pump and updated_pump["last_activated"]:
-                updated_pump["last_activated"] = updated_pump["last_activated"].isoformat()
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise Exception(f"❌ Erreur lors de la commande groupée des pompes: {e}")
+
+    finally:
+        conn.close()
 
-            return updated_pump
+
+def get_pump_command(command_id: int):
+    """🔍 Récupérer une commande de pompe (suivi de l'acquittement)"""
+    conn = get_db_connection()
+    if not conn:
+        raise Exception("❌ Impossible de se connecter à la base de données.")
+
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            cursor.execute("SELECT * FROM pump_commands WHERE id = %s;", (command_id,))
+            return cursor.fetchone()
+
+    except psycopg2.Error as e:
+        raise Exception(f"❌ Erreur lors de la récupération de la commande: {e}")
+
+    finally:
+        conn.close()
+
+
+def toggle_pump(pump_id: int):
+    """🔄 Demander l'activation/désactivation d'une pompe (commande mise en file)"""
+    conn = get_db_connection()
+    if not conn:
+        raise Exception("❌ Impossible de se connecter à la base de données.")
+
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            # 🔄 État visé : dernière commande non terminée, sinon état actuel de la pompe
+            #    (verrou sur la pompe : deux bascules rapprochées s'enchaînent au lieu de se dupliquer)
+            cursor.execute("""
+                SELECT COALESCE(last_cmd.command = 'on', p.is_on) AS targeted_on
+                  FROM pumps p
+                  LEFT JOIN LATERAL (
+                        SELECT c.command
+                          FROM pump_commands c
+                         WHERE c.pump_id = p.id AND c.status IN ('pending', 'dispatching')
+                         ORDER BY c.id DESC
+                         LIMIT 1
+                  ) AS last_cmd ON TRUE
+                 WHERE p.id = %s
+                   FOR UPDATE OF p;
+            """, (pump_id,))
+            pump = cursor.fetchone()
+
+            if not pump:
+                return None  # Pompe inexistante
+
+            # 📨 La pompe change d'état une fois la commande acquittée par le matériel
+            command = enqueue_pump_commands([pump_id], "off" if pump["targeted_on"] else "on", cursor)[0]
+            conn.commit()
+            return command
 
     except psycopg2.Error as e:
         conn.rollback()
@@ -170,3 +288,7 @@ def toggle_pump(pump_id: int):
 
     finally:
         conn.close()
+
+
+# 📊 Instrumentation (nombre d'appels et durée) de toutes les fonctions du module
+instrument_module(sys.modules[__name__])
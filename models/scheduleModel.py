@@ -1,31 +1,141 @@
+import json
+import os
+import sys
+from collections import defaultdict
 from database.database import get_db_cursor
+from utils.interval_tree import IntervalTree
+from utils.metrics import instrument_module
 import psycopg2
+from psycopg2 import errors as pg_errors
 import logging
 
-# Configuration du logger
-logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+# Logger du module (configuration centralisée dans utils.logging_config)
 logger = logging.getLogger(__name__)
 
-def create_schedule(field_id: int, start_date: str, start_time: str, duration: str, status: str, flow_rate: float, pump_ids: list):
+ACTIVE_STATUSES = ("planned", "in_progress")
+# 📌 Fenêtre glissante (en jours) sur laquelle les règles de récurrence sont développées
+OCCURRENCE_HORIZON_DAYS = int(os.getenv("OCCURRENCE_HORIZON_DAYS", "30"))
+RECURRENCE_FIELDS = ["recurrence_type", "recurrence_interval", "recurrence_weekdays",
+                     "recurrence_until", "recurrence_exceptions"]
+
+
+class ScheduleConflictError(Exception):
+    """⛔ Le planning chevauche, sur au moins une pompe, d'autres plannings actifs."""
+
+    def __init__(self, conflicting_schedule_ids):
+        self.conflicting_schedule_ids = conflicting_schedule_ids
+        super().__init__(f"❌ Conflit avec les plannings {conflicting_schedule_ids} sur une ou plusieurs pompes.")
+
+
+def _rule(schedule: dict):
+    """📐 Horaire et règle de récurrence d'un planning (valeurs par défaut si absentes)."""
+    recurrence_type = schedule.get("recurrence_type") or "none"
+    return {
+        "start_date": schedule["start_date"],
+        "start_time": schedule["start_time"],
+        "duration": schedule["duration"],
+        "recurrence_type": getattr(recurrence_type, "value", recurrence_type),
+        "recurrence_interval": schedule.get("recurrence_interval") or 1,
+        "recurrence_weekdays": schedule.get("recurrence_weekdays"),
+        "recurrence_until": schedule.get("recurrence_until"),
+        "recurrence_exceptions": schedule.get("recurrence_exceptions") or [],
+    }
+
+
+# Fenêtres d'un planning candidat : sa première période (comme `schedule_pumps.period`)
+# et ses occurrences sur la fenêtre développée (comme `schedule_occurrences`)
+_CANDIDATE_WINDOWS_SQL = """
+    SELECT %(start_date)s::date + %(start_time)s::time AS starts_at,
+           %(start_date)s::date + %(start_time)s::time + %(duration)s::interval AS ends_at
+    UNION
+    SELECT starts_at, ends_at
+      FROM schedule_rule_occurrences(
+            %(start_date)s::date, %(start_time)s::time, %(duration)s::interval,
+            %(recurrence_type)s, %(recurrence_interval)s, %(recurrence_weekdays)s::int[],
+            %(recurrence_until)s::date, %(recurrence_exceptions)s::date[],
+            CURRENT_DATE - 1, CURRENT_DATE + %(horizon)s)
+"""
+
+# Fenêtres des plannings actifs des pompes : première période et occurrences non terminées
+_EXISTING_WINDOWS_SQL = """
+    SELECT sp.pump_id, sp.schedule_id, lower(sp.period) AS starts_at, upper(sp.period) AS ends_at
+      FROM schedule_pumps sp
+     WHERE sp.active AND sp.pump_id = ANY(%(pump_ids)s::int[])
+       AND sp.schedule_id IS DISTINCT FROM %(exclude)s
+    UNION ALL
+    SELECT sp.pump_id, o.schedule_id, o.starts_at, o.ends_at
+      FROM schedule_occurrences o
+      JOIN schedule_pumps sp ON sp.schedule_id = o.schedule_id
+     WHERE sp.active AND sp.pump_id = ANY(%(pump_ids)s::int[])
+       AND o.schedule_id IS DISTINCT FROM %(exclude)s
+       AND o.status IN ('planned', 'in_progress')
+"""
+
+
+def _find_conflicting_schedule_ids(cursor, schedule: dict, pump_ids, exclude_schedule_id=None):
+    """
+    🔎 Plannings actifs qui chevauchent, sur l'une des pompes, la première période ou
+    l'une des occurrences (sur la fenêtre développée) du planning donné. La contrainte
+    d'exclusion ne couvre que la première période : les plannings récurrents sont
+    comparés occurrence par occurrence.
+    """
+    if not pump_ids:
+        return []
+    cursor.execute(f"""
+        WITH candidate AS ({_CANDIDATE_WINDOWS_SQL}),
+             existing AS ({_EXISTING_WINDOWS_SQL})
+        SELECT DISTINCT e.schedule_id
+          FROM existing e
+          JOIN candidate c ON e.starts_at < c.ends_at AND c.starts_at < e.ends_at
+         ORDER BY e.schedule_id;
+    """, {**_rule(schedule), "horizon": OCCURRENCE_HORIZON_DAYS,
+          "pump_ids": list(pump_ids), "exclude": exclude_schedule_id})
+    return [row["schedule_id"] for row in cursor.fetchall()]
+
+
+def create_schedule(field_id: int, start_date: str, start_time: str, duration: str, status: str, flow_rate: float, pump_ids: list,
+                    recurrence_type: str = "none", recurrence_interval: int = 1, recurrence_weekdays: list = None,
+                    recurrence_until=None, recurrence_exceptions: list = None):
+    schedule = {
+        "start_date": start_date, "start_time": start_time, "duration": duration,
+        "recurrence_type": recurrence_type, "recurrence_interval": recurrence_interval,
+        "recurrence_weekdays": recurrence_weekdays, "recurrence_until": recurrence_until,
+        "recurrence_exceptions": recurrence_exceptions,
+    }
     cursor, conn = get_db_cursor()
     if cursor and conn:
         try:
+            # Vérification des chevauchements (la contrainte d'exclusion reste le garde-fou)
+            if status in ACTIVE_STATUSES:
+                conflicts = _find_conflicting_schedule_ids(cursor, schedule, pump_ids or [])
+                if conflicts:
+                    raise ScheduleConflictError(conflicts)
+
+            # Les occurrences sont développées par le trigger `trigger_materialize_schedule`
             cursor.execute("""
-                INSERT INTO schedules (field_id, start_date, start_time, duration, status, flow_rate)
-                VALUES (%s, %s, %s, %s, %s, %s) RETURNING id;
-            """, (field_id, start_date, start_time, duration, status, flow_rate))
+                INSERT INTO schedules (field_id, start_date, start_time, duration, status, flow_rate,
+                                       recurrence_type, recurrence_interval, recurrence_weekdays,
+                                       recurrence_until, recurrence_exceptions)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::date[]) RETURNING id;
+            """, (field_id, start_date, start_time, duration, status, flow_rate,
+                  recurrence_type, recurrence_interval, recurrence_weekdays,
+                  recurrence_until, recurrence_exceptions or []))
 
             schedule_id = cursor.fetchone()["id"]
 
-            # Enregistrement des pompes liées
-            for pump_id in pump_ids:
+            # Enregistrement des pompes liées (une seule requête)
+            if pump_ids:
                 cursor.execute("""
-                    INSERT INTO schedule_pumps (pump_id,schedule_id)
-                    VALUES (%s, %s);
-                """, (pump_id,schedule_id))
+                    INSERT INTO schedule_pumps (pump_id, schedule_id)
+                    SELECT unnest(%s::int[]), %s;
+                """, (list(pump_ids), schedule_id))
 
             conn.commit()
             return schedule_id
+        except pg_errors.ExclusionViolation:
+            # Course avec une autre écriture : on relit les conflits après annulation
+            conn.rollback()
+            raise ScheduleConflictError(_find_conflicting_schedule_ids(cursor, schedule, pump_ids or []))
         except psycopg2.Error as e:
             conn.rollback()
             raise Exception(f"Erreur PostgreSQL: {e}")
@@ -39,7 +149,7 @@ def update_schedule(schedule_id: int, updates: dict):
     updated_schedule = None
     if cursor and conn:
         try:
-            logger.info(f"📥 Mise à jour du planning ID {schedule_id} avec les données: {updates}")
+            logger.debug("📥 Mise à jour du planning ID %s avec les données: %s", schedule_id, updates)
 
             # Vérification de l'existence du planning avant la mise à jour
             cursor.execute("SELECT * FROM schedules WHERE id = %s;", (schedule_id,))
@@ -48,7 +158,7 @@ def update_schedule(schedule_id: int, updates: dict):
                 raise Exception(f"❌ Le planning avec ID {schedule_id} n'existe pas.")
 
             # Prépare une liste des champs autorisés à mettre à jour
-            valid_fields = ["field_id", "start_date", "start_time", "duration", "status", "flow_rate"]
+            valid_fields = ["field_id", "start_date", "start_time", "duration", "status", "flow_rate"] + RECURRENCE_FIELDS
 
             # Construit des fragments de requête pour chaque champ présent dans `updates`
             set_clauses = []
@@ -56,13 +166,35 @@ def update_schedule(schedule_id: int, updates: dict):
 
             for field in valid_fields:
                 if field in updates:
-                    set_clauses.append(f"{field} = %s")
+                    if field == "recurrence_exceptions":
+                        set_clauses.append(f"{field} = COALESCE(%s::date[], '{{}}')")
+                    else:
+                        set_clauses.append(f"{field} = %s")
                     values.append(updates[field])
 
             # S'il n'y a aucun champ valide à mettre à jour, on arrête
             if not set_clauses:
                 raise Exception("❌ Aucune donnée valide à mettre à jour.")
 
+            # Vérification des chevauchements avec la fenêtre et les pompes résultantes
+            merged = {**existing_schedule, **{k: v for k, v in updates.items() if k in valid_fields}}
+            if "pump_ids" in updates and isinstance(updates["pump_ids"], list):
+                pump_ids = updates["pump_ids"]
+            else:
+                cursor.execute("SELECT pump_id FROM schedule_pumps WHERE schedule_id = %s;", (schedule_id,))
+                pump_ids = [row["pump_id"] for row in cursor.fetchall()]
+            if merged["status"] in ACTIVE_STATUSES:
+                conflicts = _find_conflicting_schedule_ids(cursor, merged, pump_ids, schedule_id)
+                if conflicts:
+                    raise ScheduleConflictError(conflicts)
+
+            # MàJ des pump_ids si nécessaire : les anciennes associations sont supprimées
+            # avant l'UPDATE, sinon `sync_schedule_pump_periods` déplacerait aussi les
+            # pompes retirées vers la nouvelle fenêtre (faux conflit d'exclusion)
+            replace_pumps = "pump_ids" in updates and isinstance(updates["pump_ids"], list)
+            if replace_pumps:
+                cursor.execute("DELETE FROM schedule_pumps WHERE schedule_id = %s;", (schedule_id,))
+
             # Construire la requête UPDATE dynamiquement
             set_clause = ", ".join(set_clauses)
             query = f"UPDATE schedules SET {set_clause} WHERE id = %s RETURNING *;"
@@ -71,20 +203,19 @@ def update_schedule(schedule_id: int, updates: dict):
             cursor.execute(query, tuple(values))
             updated_schedule = cursor.fetchone()
 
-            # MàJ des pump_ids si nécessaire
-            if "pump_ids" in updates and isinstance(updates["pump_ids"], list):
-                # On supprime d'abord toutes les associations existantes
-                cursor.execute("DELETE FROM schedule_pumps WHERE schedule_id = %s;", (schedule_id,))
-                # Puis on insère les nouvelles associations
-                for pump_id in updates["pump_ids"]:
-                    cursor.execute(
-                        "INSERT INTO schedule_pumps (pump_id, schedule_id) VALUES (%s, %s);",
-                        (pump_id, schedule_id)
-                    )
+            # Puis on insère les nouvelles associations (période du planning mis à jour)
+            if replace_pumps and updates["pump_ids"]:
+                cursor.execute("""
+                    INSERT INTO schedule_pumps (pump_id, schedule_id)
+                    SELECT unnest(%s::int[]), %s;
+                """, (updates["pump_ids"], schedule_id))
 
             conn.commit()
             return updated_schedule
 
+        except pg_errors.ExclusionViolation:
+            conn.rollback()
+            raise ScheduleConflictError(_find_conflicting_schedule_ids(cursor, merged, pump_ids, schedule_id))
         except psycopg2.Error as e:
             conn.rollback()
             logger.error("❌ Erreur lors de la mise à jour du planning ID %s: %s", schedule_id, e)
@@ -93,8 +224,11 @@ def update_schedule(schedule_id: int, updates: dict):
             cursor.close()
             conn.close()
 
-def get_schedules():
-    """📋 Récupérer tous les plannings avec les pompes associées"""
+def get_schedules(start=None, end=None):
+    """
+    📋 Récupérer les plannings avec les pompes associées.
+    Si `start` / `end` sont fournis, seuls les plannings ayant une occurrence dans la plage sont retournés.
+    """
     cursor, conn = get_db_cursor()
     if cursor and conn:
         try:
@@ -107,12 +241,25 @@ def get_schedules():
                        s.status,
                        s.flow_rate,
                        s.last_irrigation_time,
+                       s.recurrence_type,
+                       s.recurrence_interval,
+                       s.recurrence_weekdays,
+                       s.recurrence_until,
+                       s.recurrence_exceptions,
                        COALESCE(ARRAY_AGG(sp.pump_id) FILTER (WHERE sp.pump_id IS NOT NULL), '{}') AS pump_ids
                 FROM schedules s
                 LEFT JOIN schedule_pumps sp ON s.id = sp.schedule_id
-                GROUP BY s.id, s.field_id, s.start_date, s.start_time, s.duration, s.status, s.flow_rate, s.last_irrigation_time
+                WHERE (%(start)s::timestamp IS NULL AND %(end)s::timestamp IS NULL)
+                   OR EXISTS (
+                        SELECT 1
+                          FROM schedule_occurrences o
+                         WHERE o.schedule_id = s.id
+                           AND (%(end)s::timestamp IS NULL OR o.starts_at < %(end)s)
+                           AND (%(start)s::timestamp IS NULL OR o.ends_at > %(start)s)
+                   )
+                GROUP BY s.id
                 ORDER BY s.start_time;
-            """)
+            """, {"start": start, "end": end})
             schedules = cursor.fetchall()
             return schedules
         except psycopg2.Error as e:
@@ -148,6 +295,9 @@ def delete_schedule(schedule_id: int):
         try:
             cursor.execute("DELETE FROM schedules WHERE id = %s RETURNING id;", (schedule_id,))
             deleted_id = cursor.fetchone()
+            # Libérer les créneaux des pompes et les occurrences (pas de clé étrangère en cascade)
+            cursor.execute("DELETE FROM schedule_pumps WHERE schedule_id = %s;", (schedule_id,))
+            cursor.execute("DELETE FROM schedule_occurrences WHERE schedule_id = %s;", (schedule_id,))
             conn.commit()
             return deleted_id
         except psycopg2.Error as e:
@@ -158,6 +308,134 @@ def delete_schedule(schedule_id: int):
             cursor.close()
             conn.close()
 
+def get_schedule_occurrences(start, end, field_id: int = None):
+    """🗓️ Occurrences (passées ou à venir) qui chevauchent la plage `[start, end)`."""
+    cursor, conn = get_db_cursor()
+    if cursor and conn:
+        try:
+            cursor.execute("""
+                SELECT o.id, o.schedule_id, s.field_id, o.occurrence_date, o.starts_at, o.ends_at, o.status
+                  FROM schedule_occurrences o
+                  JOIN schedules s ON s.id = o.schedule_id
+                 WHERE o.starts_at < %s
+                   AND o.ends_at > %s
+                   AND (%s::int IS NULL OR s.field_id = %s)
+                 ORDER BY o.starts_at, o.schedule_id;
+            """, (end, start, field_id, field_id))
+            return cursor.fetchall()
+        except psycopg2.Error as e:
+            logger.error("❌ Erreur lors de la récupération des occurrences: %s", e)
+            raise Exception(f"Erreur PostgreSQL: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+
+def materialize_occurrences(horizon_days: int = OCCURRENCE_HORIZON_DAYS):
+    """🔁 Prolonge la fenêtre glissante des occurrences pour tous les plannings actifs."""
+    cursor, conn = get_db_cursor()
+    if cursor and conn:
+        try:
+            cursor.execute(
+                "SELECT materialize_schedule_occurrences(NULL, CURRENT_DATE + %s) AS count;",
+                (horizon_days,)
+            )
+            count = cursor.fetchone()["count"]
+            conn.commit()
+            logger.debug("🔁 %s occurrences créées ou mises à jour (horizon %s jours)", count, horizon_days)
+            return count
+        except psycopg2.Error as e:
+            conn.rollback()
+            logger.error("❌ Erreur lors du développement des occurrences: %s", e)
+            raise Exception(f"Erreur PostgreSQL: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+
+def validate_schedule_plan(schedules: list):
+    """
+    🧮 Vérifie un lot de plannings candidats avant enregistrement.
+
+    Les fenêtres (première période et occurrences sur la fenêtre développée) sont
+    calculées en une requête, celles des plannings actifs des pompes concernées
+    (périodes et occurrences matérialisées) chargées en une autre, puis un arbre
+    d'intervalles par pompe détecte les chevauchements avec l'existant et entre candidats.
+
+    :return: Liste de `{"index", "conflicting_schedule_ids", "conflicting_indexes"}`
+             pour chaque candidat en conflit (liste vide si le lot est valide).
+    """
+    candidates = [(i, s) for i, s in enumerate(schedules)
+                  if s.get("status", "planned") in ACTIVE_STATUSES and s.get("pump_ids")]
+    if not candidates:
+        return []
+
+    cursor, conn = get_db_cursor()
+    if cursor and conn:
+        try:
+            cursor.execute("""
+                SELECT c.idx, w.starts_at, w.ends_at
+                  FROM jsonb_to_recordset(%s::jsonb) AS c(
+                        idx int, start_date date, start_time time, duration interval,
+                        recurrence_type text, recurrence_interval int, recurrence_weekdays jsonb,
+                        recurrence_until date, recurrence_exceptions jsonb)
+                 CROSS JOIN LATERAL (
+                        SELECT c.start_date + c.start_time AS starts_at,
+                               c.start_date + c.start_time + c.duration AS ends_at
+                        UNION
+                        SELECT o.starts_at, o.ends_at
+                          FROM schedule_rule_occurrences(
+                                c.start_date, c.start_time, c.duration,
+                                c.recurrence_type, c.recurrence_interval,
+                                CASE WHEN jsonb_typeof(c.recurrence_weekdays) = 'array' THEN
+                                    ARRAY(SELECT jsonb_array_elements_text(c.recurrence_weekdays)::int)
+                                END,
+                                c.recurrence_until,
+                                ARRAY(SELECT jsonb_array_elements_text(c.recurrence_exceptions)::date),
+                                CURRENT_DATE - 1, CURRENT_DATE + %s) AS o
+                 ) AS w;
+            """, (
+                json.dumps([{"idx": i, **_rule(s)} for i, s in candidates], default=str),
+                OCCURRENCE_HORIZON_DAYS,
+            ))
+            windows = defaultdict(list)
+            for row in cursor.fetchall():
+                windows[row["idx"]].append((row["starts_at"], row["ends_at"]))
+
+            pump_ids = sorted({pump_id for _, s in candidates for pump_id in s["pump_ids"]})
+            cursor.execute(_EXISTING_WINDOWS_SQL + ";", {"pump_ids": pump_ids, "exclude": None})
+            existing = defaultdict(list)
+            for row in cursor.fetchall():
+                existing[row["pump_id"]].append((row["starts_at"], row["ends_at"], row["schedule_id"]))
+        except psycopg2.Error as e:
+            logger.error("❌ Erreur lors de la validation des plannings: %s", e)
+            raise Exception(f"Erreur PostgreSQL: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+
+    planned = defaultdict(list)
+    for i, s in candidates:
+        for pump_id in set(s["pump_ids"]):
+            planned[pump_id].extend((start, end, i) for start, end in windows[i])
+
+    existing_trees = {pump_id: IntervalTree(items) for pump_id, items in existing.items()}
+    planned_trees = {pump_id: IntervalTree(items) for pump_id, items in planned.items()}
+
+    conflicts = []
+    for i, s in candidates:
+        schedule_ids, indexes = set(), set()
+        for pump_id in set(s["pump_ids"]):
+            for start, end in windows[i]:
+                if pump_id in existing_trees:
+                    schedule_ids.update(existing_trees[pump_id].overlaps(start, end))
+                indexes.update(j for j in planned_trees[pump_id].overlaps(start, end) if j != i)
+        if schedule_ids or indexes:
+            conflicts.append({
+                "index": i,
+                "conflicting_schedule_ids": sorted(schedule_ids),
+                "conflicting_indexes": sorted(indexes),
+            })
+    return conflicts
+
 def start_irrigation(schedule_id: int):
     """🚀 Démarrer l'irrigation"""
     cursor, conn = get_db_cursor()
@@ -177,3 +455,7 @@ def start_irrigation(schedule_id: int):
         finally:
             cursor.close()
             conn.close()
+
+
+# 📊 Instrumentation (nombre d'appels et durée) de toutes les fonctions du module
+instrument_module(sys.modules[__name__])
@@ -1,4 +1,6 @@
+import sys
 from database.database import get_db_cursor
+from utils.metrics import instrument_module
 import psycopg2
 
 def create_sensor(name: str, type: str, location: str, latitude: float, longitude: float, installation_date: str, status: str, field_id: int = None):
@@ -27,8 +29,6 @@ def get_sensors():
     cursor.execute("SELECT * FROM sensors")
     sensors = cursor.fetchall()
 
-    print("🔍 Capteurs récupérés depuis la BD:", sensors)  # ✅ Ajoute ceci pour debug
-
     # ✅ Convertir installation_date en format string
     for sensor in sensors:
         if sensor["installation_date"]:
@@ -83,3 +83,7 @@ def get_sensor_by_id(sensor_id: int):
     cursor.close()
     conn.close()
     return sensor
+
+
+# 📊 Instrumentation (nombre d'appels et durée) de toutes les fonctions du module
+instrument_module(sys.modules[__name__])
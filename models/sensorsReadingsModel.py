@@ -1,23 +1,52 @@
+import sys
+import logging
 from fastapi.encoders import jsonable_encoder
 import json  # ✅ Utilisation du module standard JSON
 import psycopg2.extras
+from communication.sensor_liveness import sensor_liveness
 from database.database import get_db_connection
+from inference.anomaly_detector import anomaly_detector
+from models.notificationModel import notification_aggregator
+from utils.metrics import instrument_module
 from schema.sensorReadingsSchema import SensorReading
 
+logger = logging.getLogger(__name__)
+
 class SensorReadingsModel:
     @staticmethod
     def save_sensor_data(sensor_data: SensorReading):
-        """ Ajoute ou met à jour les mesures d'un capteur dans `raw_data`. """
+        """
+        Ajoute ou met à jour les mesures d'un capteur dans `raw_data`.
+        Les mesures aberrantes (détection en ligne) sont mises en quarantaine ou signalées.
+        :return: `{"stored": <nombre>, "quarantined": <nombre>}`, ou None en cas d'erreur.
+        """
+        sensor_liveness.heartbeat(sensor_data.sensor_id)
         conn = get_db_connection()
         if not conn:
-            print("❌ Impossible de se connecter à la BD pour enregistrer les mesures.")
+            logger.error("❌ Impossible de se connecter à la BD pour enregistrer les mesures.")
             return
 
         try:
             cursor = conn.cursor()
 
-            # ✅ Convertir la nouvelle donnée en JSONB
-            new_measurement = jsonable_encoder(sensor_data.raw_data)
+            # ✅ Convertir la nouvelle donnée en JSONB, puis écarter les mesures aberrantes
+            new_measurement, quarantined = anomaly_detector.inspect(
+                sensor_data.sensor_id, jsonable_encoder(sensor_data.raw_data)
+            )
+            if quarantined:
+                cursor.execute("""
+                    INSERT INTO sensor_quarantine (sensor_id, field_id, metric, value, reason, measurement)
+                    SELECT %s, %s, v.metric, v.value, v.reason, v.measurement
+                      FROM unnest(%s::text[], %s::float8[], %s::text[], %s::jsonb[]) AS v(metric, value, reason, measurement);
+                """, (
+                    sensor_data.sensor_id, sensor_data.field_id,
+                    [q[1] for q in quarantined], [q[2] for q in quarantined], [q[3] for q in quarantined],
+                    [json.dumps(q[0]) for q in quarantined],
+                ))
+            if not new_measurement:
+                conn.commit()
+                SensorReadingsModel._notify_anomalies(sensor_data.sensor_id, quarantined, [])
+                return {"stored": 0, "quarantined": len(quarantined)}
 
             # ✅ Vérifier si le capteur a déjà un enregistrement
             cursor.execute("""
@@ -33,7 +62,8 @@ class SensorReadingsModel:
                     WHERE sensor_id = %s
                 """, (json.dumps(new_measurement), sensor_data.sensor_id))
 
-                print(f"🔄 Mise à jour des mesures pour le capteur {sensor_data.sensor_id}.")
+                logger.info("🔄 Mise à jour des mesures pour le capteur %s.", sensor_data.sensor_id,
+                            extra={"sample": "ingest"})
             else:
                 # ✅ Créer un nouvel enregistrement s'il n'existe pas encore
                 cursor.execute("""
@@ -45,12 +75,180 @@ class SensorReadingsModel:
                     json.dumps(new_measurement)  # ✅ Utilisation correcte de JSONB
                 ))
 
-                print(f"✅ Nouveau capteur enregistré {sensor_data.sensor_id} avec ses premières mesures.")
+                logger.info("✅ Nouveau capteur enregistré %s avec ses premières mesures.", sensor_data.sensor_id)
+
+            conn.commit()
+            SensorReadingsModel._notify_anomalies(
+                sensor_data.sensor_id, quarantined, [m for m in new_measurement if "anomaly" in m]
+            )
+            return {"stored": len(new_measurement), "quarantined": len(quarantined)}
+
+        except Exception as e:
+            logger.error("❌ Erreur lors de l'enregistrement des données : %s", e)
+        finally:
+            cursor.close()
+            conn.close()
+
+    @staticmethod
+    def save_sensor_data_bulk(readings):
+        """
+        Enregistre un lot de messages de capteurs en une transaction : statut des
+        capteurs lu en une requête, mesures regroupées par capteur puis ajoutées à
+        `raw_data` (ou insérées) en une requête, quarantaine en une requête.
+        :return: `{"received", "stored", "quarantined", "rejected"}`, ou None si le lot est refusé.
+        :raises psycopg2.OperationalError: Base indisponible (le lot peut être réessayé tel quel).
+        """
+        if not readings:
+            return {"received": 0, "stored": 0, "quarantined": 0, "rejected": []}
+        inspected, rejected = SensorReadingsModel.inspect_readings(readings)
+        result = SensorReadingsModel.save_inspected_readings(inspected)
+        if result is None:
+            return None
+        return {"received": len(readings), **result, "rejected": rejected}
+
+    @staticmethod
+    def inspect_readings(readings):
+        """
+        Écarte les messages des capteurs refusés, puis passe les autres au détecteur
+        d'anomalies et au suivi de présence, une seule fois par message : le résultat
+        peut ensuite être réessayé ou découpé par `save_inspected_readings` sans
+        compter deux fois les mesures dans l'état du détecteur.
+        :return: `(inspectés, capteurs refusés)`, un tuple `(sensor_id, field_id, kept, rejected)`
+                 par message accepté.
+        :raises psycopg2.OperationalError: Base indisponible (aucun message inspecté).
+        """
+        conn = get_db_connection()
+        if not conn:
+            raise psycopg2.OperationalError("❌ Impossible de se connecter à la BD pour enregistrer les mesures.")
+
+        cursor = conn.cursor()
+        try:
+            # ✅ Même règle que `is_sensor_active` : actif, ou inactif faute de mesures
+            cursor.execute("""
+                SELECT id FROM sensors
+                 WHERE id = ANY(%s::int[])
+                   AND (status = 'active' OR (status = 'inactive' AND offline_since IS NOT NULL));
+            """, (list({reading.sensor_id for reading in readings}),))
+            accepted_ids = {row["id"] for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+            conn.close()
+
+        inspected = []
+        for reading in readings:
+            sensor_liveness.heartbeat(reading.sensor_id)
+            if reading.sensor_id in accepted_ids:
+                kept, rejected = anomaly_detector.inspect(reading.sensor_id, jsonable_encoder(reading.raw_data))
+                inspected.append((reading.sensor_id, reading.field_id, kept, rejected))
+        return inspected, sorted({reading.sensor_id for reading in readings} - accepted_ids)
+
+    @staticmethod
+    def save_inspected_readings(inspected):
+        """
+        Enregistre en une transaction des messages déjà inspectés (`inspect_readings`),
+        sans repasser par le détecteur : peut être réessayé ou découpé sans effet de bord.
+        :return: `{"stored", "quarantined"}`, ou None si le lot est refusé (rien n'est enregistré).
+        :raises psycopg2.OperationalError: Base indisponible (le lot peut être réessayé tel quel).
+        """
+        batches, quarantine, flagged = {}, [], {}
+        for sensor_id, field_id, kept, rejected in inspected:
+            quarantine.extend((sensor_id, field_id, *q) for q in rejected)
+            batches.setdefault(sensor_id, (field_id, []))[1].extend(kept)
+            flagged.setdefault(sensor_id, ([], []))
+            flagged[sensor_id][0].extend(rejected)
+            flagged[sensor_id][1].extend(m for m in kept if "anomaly" in m)
+        rows = sorted((sensor_id, field_id, measurements) for sensor_id, (field_id, measurements) in batches.items()
+                      if measurements)
+        if not rows and not quarantine:
+            return {"stored": 0, "quarantined": 0}
+
+        conn = get_db_connection()
+        if not conn:
+            raise psycopg2.OperationalError("❌ Impossible de se connecter à la BD pour enregistrer les mesures.")
 
+        cursor = conn.cursor()
+        try:
+            if quarantine:
+                cursor.execute("""
+                    INSERT INTO sensor_quarantine (sensor_id, field_id, metric, value, reason, measurement)
+                    SELECT * FROM unnest(%s::int[], %s::int[], %s::text[], %s::float8[], %s::text[], %s::jsonb[]);
+                """, (
+                    [q[0] for q in quarantine], [q[1] for q in quarantine], [q[3] for q in quarantine],
+                    [q[4] for q in quarantine], [q[5] for q in quarantine], [json.dumps(q[2]) for q in quarantine],
+                ))
+            if rows:
+                cursor.execute("""
+                    WITH v AS (
+                        SELECT * FROM unnest(%s::int[], %s::int[], %s::jsonb[]) AS v(sensor_id, field_id, data)
+                    ), updated AS (
+                        UPDATE sensorreadings sr
+                           SET raw_data = sr.raw_data || v.data
+                          FROM v
+                         WHERE sr.sensor_id = v.sensor_id
+                     RETURNING sr.sensor_id
+                    )
+                    INSERT INTO sensorreadings (sensor_id, field_id, raw_data)
+                    SELECT v.sensor_id, v.field_id, v.data
+                      FROM v
+                     WHERE v.sensor_id NOT IN (SELECT sensor_id FROM updated);
+                """, ([r[0] for r in rows], [r[1] for r in rows], [json.dumps(r[2]) for r in rows]))
             conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            raise
+        except Exception as e:
+            conn.rollback()
+            logger.error("❌ Erreur lors de l'enregistrement groupé des données : %s", e)
+            return None
+        finally:
+            cursor.close()
+            conn.close()
+
+        # Lot validé : une erreur ici ne doit plus le faire passer pour refusé (réécriture en double)
+        try:
+            for sensor_id, (rejected, flagged_measurements) in flagged.items():
+                SensorReadingsModel._notify_anomalies(sensor_id, rejected, flagged_measurements)
+        except Exception as e:
+            logger.error("❌ Notification des anomalies impossible : %s", e)
+        stored = sum(len(r[2]) for r in rows)
+        logger.info("🔄 %d mesures de %d capteurs enregistrées par lot.", stored, len(rows),
+                    extra={"sample": "ingest"})
+        return {"stored": stored, "quarantined": len(quarantine)}
+
+    @staticmethod
+    def _notify_anomalies(sensor_id, quarantined, flagged):
+        """ Notifications regroupées par capteur, grandeur et type d'anomalie (aucun accès à la base). """
+        for _, metric, value, reason in quarantined:
+            notification_aggregator.notify(
+                f"⚠️ Mesure {metric} = {value:g} du capteur ID {sensor_id} mise en quarantaine ({reason})",
+                "warning", key=f"sensor:{sensor_id}:{metric}:{reason}",
+            )
+        for measurement in flagged:
+            notification_aggregator.notify(
+                f"⚠️ Mesure {measurement['type']} inhabituelle du capteur ID {sensor_id} ({measurement['anomaly']})",
+                "info", key=f"sensor:{sensor_id}:{measurement['type']}:{measurement['anomaly']}",
+            )
+
+    @staticmethod
+    def get_quarantined_measurements(sensor_id=None, limit: int = 100):
+        """ Dernières mesures mises en quarantaine (toutes ou celles d'un capteur). """
+        conn = get_db_connection()
+        if not conn:
+            logger.error("❌ Impossible de se connecter à la BD.")
+            return []
 
+        try:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor.execute("""
+                SELECT id, sensor_id, field_id, metric, value, reason, measurement, received_at
+                  FROM sensor_quarantine
+                 WHERE %(sensor_id)s::int IS NULL OR sensor_id = %(sensor_id)s::int
+                 ORDER BY id DESC
+                 LIMIT %(limit)s;
+            """, {"sensor_id": sensor_id, "limit": limit})
+            return cursor.fetchall()
         except Exception as e:
-            print(f"❌ Erreur lors de l'enregistrement des données : {e}")
+            logger.error("❌ Erreur lors de la lecture de la quarantaine : %s", e)
+            return []
         finally:
             cursor.close()
             conn.close()
@@ -60,7 +258,7 @@ class SensorReadingsModel:
         """ Récupère toutes les mesures avec les noms des capteurs et des champs, même s'ils n'ont pas encore de mesures. """
         conn = get_db_connection()
         if not conn:
-            print("❌ Impossible de se connecter à la BD.")
+            logger.error("❌ Impossible de se connecter à la BD.")
             return []
 
         try:
@@ -86,7 +284,7 @@ class SensorReadingsModel:
                 for row in readings
             ]
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération des mesures : {e}")
+            logger.error("❌ Erreur lors de la récupération des mesures : %s", e)
             return []
         finally:
             cursor.close()
@@ -97,7 +295,7 @@ class SensorReadingsModel:
         """ Récupère la dernière mesure d'un capteur donné sous `raw_data`. """
         conn = get_db_connection()
         if not conn:
-            print("❌ Impossible de se connecter à la BD pour la lecture.")
+            logger.error("❌ Impossible de se connecter à la BD pour la lecture.")
             return {}
 
         try:
@@ -118,7 +316,7 @@ class SensorReadingsModel:
             } if data else {}  # ✅ Retourne un objet vide s'il n'y a aucun enregistrement.
 
         except Exception as e:
-            print(f"❌ Erreur lors de la lecture des données : {e}")
+            logger.error("❌ Erreur lors de la lecture des données : %s", e)
             return {}
 
         finally:
@@ -130,7 +328,7 @@ class SensorReadingsModel:
         """ Récupère l'ID du champ auquel un capteur est associé. """
         conn = get_db_connection()
         if not conn:
-            print("❌ Impossible de se connecter à la BD pour récupérer l'ID du champ.")
+            logger.error("❌ Impossible de se connecter à la BD pour récupérer l'ID du champ.")
             return None
 
         try:
@@ -141,7 +339,7 @@ class SensorReadingsModel:
             result = cursor.fetchone()
             return result["field_id"] if result else None
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération de l'ID du champ du capteur {sensor_id} : {e}")
+            logger.error("❌ Erreur lors de la récupération de l'ID du champ du capteur %s : %s", sensor_id, e)
             return None
         finally:
             cursor.close()
@@ -152,7 +350,7 @@ class SensorReadingsModel:
         """ Récupère toutes les mesures des capteurs sous forme de `raw_data` JSONB. """
         conn = get_db_connection()
         if not conn:
-            print("❌ Impossible de se connecter à la BD pour récupérer les mesures.")
+            logger.error("❌ Impossible de se connecter à la BD pour récupérer les mesures.")
             return {}
 
         try:
@@ -174,7 +372,7 @@ class SensorReadingsModel:
             ] if readings else {}  # ✅ Retourne un objet vide s'il n'y a aucun enregistrement.
 
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération des mesures : {e}")
+            logger.error("❌ Erreur lors de la récupération des mesures : %s", e)
             return {}
 
         finally:
@@ -187,7 +385,7 @@ class SensorReadingsModel:
         """ Récupère toutes les mesures des capteurs sous forme de `raw_data` JSONB. Renvoie `{}` si aucun enregistrement. """
         conn = get_db_connection()
         if not conn:
-            print("❌ Impossible de se connecter à la base de données pour la récupération des mesures.")
+            logger.error("❌ Impossible de se connecter à la base de données pour la récupération des mesures.")
             return {}
 
         try:
@@ -211,7 +409,7 @@ class SensorReadingsModel:
                 for row in readings
             ]
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération des mesures : {e}")
+            logger.error("❌ Erreur lors de la récupération des mesures : %s", e)
             return {}
         finally:
             cursor.close()
@@ -222,7 +420,7 @@ class SensorReadingsModel:
         """ Récupère la dernière mesure d'un capteur donné sous `raw_data`. """
         conn = get_db_connection()
         if not conn:
-            print("❌ Impossible de se connecter à la base de données pour la lecture.")
+            logger.error("❌ Impossible de se connecter à la base de données pour la lecture.")
             return None
         try:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
@@ -235,17 +433,17 @@ class SensorReadingsModel:
             """, (sensor_id,))
             data = cursor.fetchone()
             if data:
-                print(f"✅ Données récupérées pour le capteur {sensor_id}.")
+                logger.debug("✅ Données récupérées pour le capteur %s.", sensor_id)
                 return {
                     "sensor_id": data["sensor_id"],
                     "field_id": data["field_id"],
                     "raw_data": json.loads(data["raw_data"])  # ✅ JSONB converti en dict
                 }
             else:
-                print(f"❌ Aucune donnée trouvée pour le capteur {sensor_id}.")
+                logger.error("❌ Aucune donnée trouvée pour le capteur %s.", sensor_id)
                 return None
         except Exception as e:
-            print(f"❌ Erreur lors de la lecture des données : {e}")
+            logger.error("❌ Erreur lors de la lecture des données : %s", e)
             return None
         finally:
             cursor.close()
@@ -253,22 +451,24 @@ class SensorReadingsModel:
 
     @staticmethod
     def is_sensor_active(sensor_id: int):
-        """ Vérifie si un capteur est actif. """
+        """ Vérifie si un capteur est actif (ou seulement silencieux depuis un moment : il est réactivé à sa prochaine mesure). """
         conn = get_db_connection()
         if not conn:
-            print("❌ Impossible de se connecter à la base de données pour vérifier le capteur.")
+            logger.error("❌ Impossible de se connecter à la base de données pour vérifier le capteur.")
             return False
         try:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
             cursor.execute("""
-                SELECT status
+                SELECT status, offline_since
                 FROM sensors
                 WHERE id = %s
             """, (sensor_id,))
             result = cursor.fetchone()
-            return result and result["status"] == "active"
+            return bool(result) and (
+                result["status"] == "active" or (result["status"] == "inactive" and result["offline_since"] is not None)
+            )
         except Exception as e:
-            print(f"❌ Erreur lors de la vérification du capteur : {e}")
+            logger.error("❌ Erreur lors de la vérification du capteur : %s", e)
             return False
         finally:
             cursor.close()
@@ -279,7 +479,7 @@ class SensorReadingsModel:
         """ Récupère le type d'un capteur (humidity, temperature, npk, etc.) """
         conn = get_db_connection()
         if not conn:
-            print("❌ Impossible de se connecter à la BD pour récupérer le type du capteur.")
+            logger.error("❌ Impossible de se connecter à la BD pour récupérer le type du capteur.")
             return "unknown"
 
         try:
@@ -292,7 +492,7 @@ class SensorReadingsModel:
             result = cursor.fetchone()
             return result["type"] if result else "unknown"
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération du type du capteur : {e}")
+            logger.error("❌ Erreur lors de la récupération du type du capteur : %s", e)
             return "unknown"
         finally:
             cursor.close()
@@ -303,7 +503,7 @@ class SensorReadingsModel:
         """ Récupère le statut de tous les capteurs. """
         conn = get_db_connection()
         if not conn:
-            print("❌ Impossible de se connecter à la base de données pour récupérer les capteurs.")
+            logger.error("❌ Impossible de se connecter à la base de données pour récupérer les capteurs.")
             return []
         try:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
@@ -314,7 +514,7 @@ class SensorReadingsModel:
             sensors = cursor.fetchall()
             return [dict(sensor) for sensor in sensors]
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération des capteurs : {e}")
+            logger.error("❌ Erreur lors de la récupération des capteurs : %s", e)
             return []
         finally:
             cursor.close()
@@ -325,7 +525,7 @@ class SensorReadingsModel:
         """ Récupère uniquement les capteurs actifs. """
         conn = get_db_connection()
         if not conn:
-            print("❌ Impossible de se connecter à la base de données pour récupérer les capteurs actifs.")
+            logger.error("❌ Impossible de se connecter à la base de données pour récupérer les capteurs actifs.")
             return []
         try:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
@@ -337,8 +537,12 @@ class SensorReadingsModel:
             active_sensors = cursor.fetchall()
             return [sensor["id"] for sensor in active_sensors]
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération des capteurs actifs : {e}")
+            logger.error("❌ Erreur lors de la récupération des capteurs actifs : %s", e)
             return []
         finally:
             cursor.close()
             conn.close()
+
+
+# 📊 Instrumentation (nombre d'appels et durée) de toutes les fonctions du module
+instrument_module(sys.modules[__name__])
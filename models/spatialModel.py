@@ -0,0 +1,73 @@
+import sys
+import logging
+
+import psycopg2
+
+from database.database import get_db_cursor
+from utils.metrics import instrument_module
+
+# ✅ Logger du module (configuration centralisée dans utils.logging_config)
+logger = logging.getLogger(__name__)
+
+
+def get_sensor_locations():
+    """📍 Position de tous les capteurs (construction de l'index spatial)"""
+    cursor, conn = get_db_cursor()
+    if cursor and conn:
+        try:
+            cursor.execute("""
+                SELECT id AS sensor_id, name, type, status, field_id, latitude, longitude
+                  FROM sensors
+                 ORDER BY id;
+            """)
+            return cursor.fetchall()
+        except psycopg2.Error as e:
+            raise Exception(f"❌ Erreur lors de la lecture de la position des capteurs : {e}")
+        finally:
+            cursor.close()
+            conn.close()
+
+
+def get_field_geometry(field_id: int):
+    """🌾 Centre, superficie et seuil d'humidité (champ, sinon culture) d'un champ"""
+    cursor, conn = get_db_cursor()
+    if cursor and conn:
+        try:
+            cursor.execute("""
+                SELECT f.id AS field_id, f.latitude, f.longitude, f.size,
+                       COALESCE(f.irrigation_humidity_threshold, c.irrigation_humidity_threshold) AS humidity_threshold
+                  FROM fields f
+                  LEFT JOIN crop_types c ON c.id = f.crop_type_id
+                 WHERE f.id = %s;
+            """, (field_id,))
+            return cursor.fetchone()
+        except psycopg2.Error as e:
+            raise Exception(f"❌ Erreur lors de la lecture de la géométrie du champ : {e}")
+        finally:
+            cursor.close()
+            conn.close()
+
+
+def get_sensor_measurements(sensor_ids, metric: str):
+    """
+    📡 Dernière mesure d'une grandeur pour plusieurs capteurs, lue dans
+    `sensor_latest_measurements` (alimentée par trigger, une ligne par capteur).
+    """
+    cursor, conn = get_db_cursor()
+    if cursor and conn:
+        try:
+            cursor.execute("""
+                SELECT sensor_id, value, measured_at
+                  FROM sensor_latest_measurements
+                 WHERE sensor_id = ANY(%s::int[]) AND metric = %s;
+            """, (list(sensor_ids), metric))
+            return cursor.fetchall()
+        except psycopg2.Error as e:
+            raise Exception(f"❌ Erreur lors de la lecture des dernières mesures des capteurs : {e}")
+        finally:
+            cursor.close()
+            conn.close()
+
+
+# 📊 Instrumentation (nombre d'appels et durée) de toutes les fonctions du module
+instrument_module(sys.modules[__name__])
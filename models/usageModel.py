@@ -0,0 +1,112 @@
+import sys
+import logging
+from datetime import date, timedelta
+
+import psycopg2
+
+from database.database import get_db_cursor
+from utils.metrics import instrument_module
+
+# ✅ Logger du module (configuration centralisée dans utils.logging_config)
+logger = logging.getLogger(__name__)
+
+
+def get_usage_rollups(scope: str, scope_id: int, period: str, start, end):
+    """
+    📊 Agrégats de consommation (eau, énergie, durée) d'une pompe ou d'un champ.
+    Lecture directe de `usage_rollups` par clé primaire : le coût ne dépend pas
+    du nombre de cycles enregistrés.
+
+    :param scope: 'pump' ou 'field'.
+    :param period: 'day' ou 'month'.
+    :param start: Première période incluse (DATE).
+    :param end: Dernière période incluse (DATE).
+    """
+    cursor, conn = get_db_cursor()
+    if cursor and conn:
+        try:
+            cursor.execute("""
+                SELECT period_start, run_count, duration_seconds, volume_liters, energy_kwh
+                  FROM usage_rollups
+                 WHERE scope = %s
+                   AND scope_id = %s
+                   AND period = %s
+                   AND period_start BETWEEN (CASE WHEN %s = 'month' THEN date_trunc('month', %s::date)::date ELSE %s::date END)
+                                        AND %s::date
+                 ORDER BY period_start;
+            """, (scope, scope_id, period, period, start, start, end))
+            return cursor.fetchall()
+        except psycopg2.Error as e:
+            logger.error("❌ Erreur lors de la lecture des agrégats %s %s: %s", scope, scope_id, e)
+            raise Exception(f"Erreur PostgreSQL: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+
+
+def get_open_pump_run(pump_id: int):
+    """🚰 Cycle en cours d'une pompe (None si elle est arrêtée)."""
+    cursor, conn = get_db_cursor()
+    if cursor and conn:
+        try:
+            cursor.execute("""
+                SELECT id, schedule_id, started_at, flow_rate,
+                       EXTRACT(EPOCH FROM (LOCALTIMESTAMP - started_at)) AS duration_seconds,
+                       flow_rate * EXTRACT(EPOCH FROM (LOCALTIMESTAMP - started_at)) / 60 AS volume_liters
+                  FROM pump_runs
+                 WHERE pump_id = %s AND ended_at IS NULL;
+            """, (pump_id,))
+            return cursor.fetchone()
+        except psycopg2.Error as e:
+            logger.error("❌ Erreur lors de la lecture du cycle en cours de la pompe %s: %s", pump_id, e)
+            raise Exception(f"Erreur PostgreSQL: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+
+
+def get_pump_runs(pump_id: int, limit: int = 50):
+    """📜 Derniers cycles (démarrage / arrêt) d'une pompe."""
+    cursor, conn = get_db_cursor()
+    if cursor and conn:
+        try:
+            cursor.execute("""
+                SELECT * FROM pump_runs
+                 WHERE pump_id = %s
+                 ORDER BY started_at DESC
+                 LIMIT %s;
+            """, (pump_id, limit))
+            return cursor.fetchall()
+        except psycopg2.Error as e:
+            logger.error("❌ Erreur lors de la lecture de l'historique de la pompe %s: %s", pump_id, e)
+            raise Exception(f"Erreur PostgreSQL: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+
+
+def get_usage_report(scope: str, scope_id: int, period: str = "day", start: date = None, end: date = None):
+    """
+    🧾 Rapport de consommation : périodes agrégées et totaux.
+    Par défaut, les 30 derniers jours ou les 12 derniers mois.
+    """
+    end = end or date.today()
+    if start is None:
+        start = end - timedelta(days=29) if period == "day" else date(end.year - 1, end.month, 1)
+    periods = get_usage_rollups(scope, scope_id, period, start, end)
+    report = {
+        "scope": scope,
+        "id": scope_id,
+        "period": period,
+        "periods": periods,
+        "total_duration_seconds": sum(p["duration_seconds"] for p in periods),
+        "total_volume_liters": sum(p["volume_liters"] for p in periods),
+        "total_energy_kwh": sum(p["energy_kwh"] for p in periods),
+    }
+    if scope == "pump":
+        report["current_run"] = get_open_pump_run(scope_id)
+    return report
+
+
+# 📊 Instrumentation (nombre d'appels et durée) de toutes les fonctions du module
+instrument_module(sys.modules[__name__])
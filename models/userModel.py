@@ -1,6 +1,11 @@
+import logging
+import sys
 import psycopg2
 from database.database import get_db_connection
-from utils.security import get_password_hash
+from utils.metrics import instrument_module
+from utils.security import invalidate_user_cache
+
+logger = logging.getLogger(__name__)
 
 
 def get_user_by_email(email: str):
@@ -13,26 +18,23 @@ def get_user_by_email(email: str):
         with conn.cursor() as cursor:
             cursor.execute("SELECT * FROM users WHERE email = %s;", (email,))
             user = cursor.fetchone()
-            if user:
-                print(f"✅ Utilisateur trouvé : {user}")  # Ajout du log
-            else:
-                print(f"⚠️ Aucun utilisateur trouvé pour l'email {email}")
+            if not user:
+                logger.debug("⚠️ Aucun utilisateur trouvé pour l'email %s", email)
             return user
     except psycopg2.Error as e:
-        print(f"❌ Erreur lors de la récupération de l'utilisateur : {e}")
+        logger.error("❌ Erreur lors de la récupération de l'utilisateur : %s", e)
         return None
     finally:
         conn.close()
 
-def register_user(username: str, email: str, password: str, role: str):
-    """🆕 Insère un nouvel utilisateur."""
+def register_user(username: str, email: str, hashed_password: str, role: str):
+    """🆕 Insère un nouvel utilisateur (le mot de passe est déjà haché par l'appelant)."""
     conn = get_db_connection()
     if not conn:
         raise Exception("❌ Erreur : impossible de se connecter à la base de données.")
 
     try:
         with conn.cursor() as cursor:
-            hashed_password = get_password_hash(password)
             cursor.execute("""
                 INSERT INTO users (username, email, password_hash, role)
                 VALUES (%s, %s, %s, %s) RETURNING id;
@@ -45,10 +47,15 @@ def register_user(username: str, email: str, password: str, role: str):
                 raise Exception("❌ Erreur : Aucun ID retourné après insertion. Vérifiez la structure de la table.")
 
             conn.commit()
+            invalidate_user_cache(username)
             return user_id["id"]  # Retourner l'ID de l'utilisateur
 
     except psycopg2.Error as e:
         conn.rollback()
         raise Exception(f"❌ Erreur lors de l'inscription: {e}")
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+
+# 📊 Instrumentation (nombre d'appels et durée) de toutes les fonctions du module
+instrument_module(sys.modules[__name__])
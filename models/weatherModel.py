@@ -0,0 +1,67 @@
+import sys
+import logging
+
+import psycopg2
+
+from database.database import get_db_cursor
+from utils.metrics import instrument_module
+
+# ✅ Logger du module (configuration centralisée dans utils.logging_config)
+logger = logging.getLogger(__name__)
+
+
+def get_daily_weather(field_ids, start, end, metrics=None):
+    """
+    🌤️ Agrégats journaliers (min, max, moyenne, cumul) des mesures de plusieurs champs.
+    Lecture directe de `field_daily_weather`, alimentée par trigger à l'arrivée des mesures.
+
+    :param field_ids: Champs concernés (tous si None).
+    :param start: Premier jour inclus (DATE).
+    :param end: Dernier jour inclus (DATE).
+    :param metrics: Grandeurs à lire (toutes si None), ex. ['temperature', 'rainfall'].
+    """
+    cursor, conn = get_db_cursor()
+    if cursor and conn:
+        try:
+            cursor.execute("""
+                SELECT field_id, day, metric, min_value, max_value,
+                       sum_value / sample_count AS mean_value, sum_value
+                  FROM field_daily_weather
+                 WHERE day BETWEEN %(start)s AND %(end)s
+                   AND (%(field_ids)s::int[] IS NULL OR field_id = ANY(%(field_ids)s::int[]))
+                   AND (%(metrics)s::text[] IS NULL OR metric = ANY(%(metrics)s::text[]));
+            """, {
+                "start": start,
+                "end": end,
+                "field_ids": list(field_ids) if field_ids is not None else None,
+                "metrics": list(metrics) if metrics is not None else None,
+            })
+            return cursor.fetchall()
+        except psycopg2.Error as e:
+            raise Exception(f"❌ Erreur lors de la lecture des agrégats météo : {e}")
+        finally:
+            cursor.close()
+            conn.close()
+
+
+def get_fields_location(field_ids=None):
+    """📍 Latitude (degrés) des champs (tous si `field_ids` est None)"""
+    cursor, conn = get_db_cursor()
+    if cursor and conn:
+        try:
+            cursor.execute("""
+                SELECT id AS field_id, latitude
+                  FROM fields
+                 WHERE %(field_ids)s::int[] IS NULL OR id = ANY(%(field_ids)s::int[])
+                 ORDER BY id;
+            """, {"field_ids": list(field_ids) if field_ids is not None else None})
+            return cursor.fetchall()
+        except psycopg2.Error as e:
+            raise Exception(f"❌ Erreur lors de la lecture de la position des champs : {e}")
+        finally:
+            cursor.close()
+            conn.close()
+
+
+# 📊 Instrumentation (nombre d'appels et durée) de toutes les fonctions du module
+instrument_module(sys.modules[__name__])
@@ -1,7 +1,10 @@
+import logging
 import rdflib
 import sys
 from pprint import pprint
 
+logger = logging.getLogger(__name__)
+
 class OntologyHandler:
     def __init__(self, ontology_path):
         """
@@ -18,9 +21,9 @@ class OntologyHandler:
         """
         try:
             self.graph.parse(self.ontology_path, format="xml")
-            print("Ontology successfully loaded.")
+            logger.info("Ontology successfully loaded.")
         except Exception as e:
-            print(f"Error loading ontology: {e}")
+            logger.error("Error loading ontology: %s", e)
 
     def normalize_label(self, label):
         """
@@ -70,6 +73,30 @@ class OntologyHandler:
         results = self.graph.query(query)
         return [(str(row[0]), str(row[1])) for row in results]
 
+    def get_stage_water_needs(self):
+        """
+        Retrieve the water need of every growth stage in a single query.
+        :return: Dictionary keyed by stage local name (e.g. "Floraison") with its label
+                 (None if the ontology has none) and its water amount.
+        """
+        query = """
+        PREFIX ont: <http://www.semanticweb.org/pc/ontologies/2025/0/mergemaizeirrigonto#>
+        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+        SELECT ?stage ?label ?amount WHERE {
+          ?stage a ont:crop_growth ;
+                 ont:waterNeed ?waterNeed .
+          ?waterNeed ont:waterAmount ?amount .
+          OPTIONAL { ?stage rdfs:label ?label . }
+        }
+        """
+        needs = {}
+        for stage, label, amount in self.graph.query(query):
+            needs[str(stage).split("#")[-1]] = {
+                "label": str(label) if label is not None else None,
+                "water_amount": float(amount),
+            }
+        return needs
+
     def get_entity_properties(self, entity):
         """
         Get all properties and values for a given entity.
@@ -1,12 +1,18 @@
 import logging
+import os
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import validate_email
+from starlette.concurrency import run_in_threadpool
 from starlette.responses import JSONResponse
 
 from models.baseModel import UserRole
 from models.userModel import get_user_by_email, register_user
-from utils.security import get_password_hash, verify_password, create_access_token, get_current_user
+from utils.metrics import AUTH_RATE_LIMITED
+from utils.rate_limit import SlidingWindowRateLimiter
+from utils.security import (
+    PasswordHasherBusy, get_password_hash_async, verify_password_async, create_access_token, get_current_user
+)
 from schema.userSchema import UserCreate
 
 logger = logging.getLogger(__name__)
@@ -15,15 +21,42 @@ router = APIRouter(prefix="", tags=["Authentification"])
 # ✅ Définition des rôles autorisés
 VALID_ROLES = {"admin", "farmer", "other"}
 
+# ✅ Limitation des tentatives de connexion : toutes les tentatives par IP,
+#    les échecs par email (remis à zéro après une connexion réussie)
+_login_attempts_by_ip = SlidingWindowRateLimiter(
+    max_events=int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_IP", "20")),
+    window_seconds=float(os.getenv("LOGIN_IP_WINDOW_SECONDS", "60")),
+)
+_login_failures_by_email = SlidingWindowRateLimiter(
+    max_events=int(os.getenv("LOGIN_MAX_FAILURES_PER_EMAIL", "5")),
+    window_seconds=float(os.getenv("LOGIN_EMAIL_WINDOW_SECONDS", "900")),
+)
+
+
+def _too_many_attempts(retry_after: float):
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Trop de tentatives de connexion, réessayez plus tard",
+        headers={"Retry-After": str(int(retry_after) + 1)},
+    )
+
+
+def _password_service_busy():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Service d'authentification saturé, réessayez plus tard",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/register")
 async def register(request: Request, user: UserCreate):
     """Créer un nouvel utilisateur."""
     ip_address = request.client.host
-    logger.info(f"📩 [REQ] Inscription - IP: {ip_address} - Email: {user.email}")
+    logger.info("📩 [REQ] Inscription - IP: %s - Email: %s", ip_address, user.email)
 
     # ✅ Vérifier le rôle
     if user.role not in UserRole.__members__.values():
-        logger.warning(f"❌ Tentative d'inscription avec rôle invalide : {user.role}")
+        logger.warning("❌ Tentative d'inscription avec rôle invalide : %s", user.role)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Rôle invalide. Choisissez parmi: admin, farmer, other."
@@ -33,22 +66,21 @@ async def register(request: Request, user: UserCreate):
     validate_email(str(user.email))
 
     # ✅ Vérifier si l'utilisateur existe déjà
-    existing_user = get_user_by_email(str(user.email))
+    existing_user = await run_in_threadpool(get_user_by_email, str(user.email))
     if existing_user:
-        logger.warning(f"⚠️ Échec inscription : Email déjà utilisé - {user.email}")
+        logger.warning("⚠️ Échec inscription : Email déjà utilisé - %s", user.email)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Nom d'utilisateur ou email déjà utilisé"
         )
 
     try:
-        # ✅ Hacher le mot de passe
-        hashed_password = get_password_hash(user.password)
-        logger.debug(f"🔑 Mot de passe haché généré : {hashed_password}")
+        # ✅ Hacher le mot de passe (pool bcrypt dédié, hors boucle d'événements)
+        hashed_password = await get_password_hash_async(user.password)
 
         # ✅ Enregistrer l'utilisateur dans la base de données
-        user_id = register_user(user.username, str(user.email), hashed_password, user.role)
-        logger.info(f"✅ [RES] Inscription réussie : {user.email}")
+        user_id = await run_in_threadpool(register_user, user.username, str(user.email), hashed_password, user.role)
+        logger.info("✅ [RES] Inscription réussie : %s", user.email)
 
         return {
             "id": user_id,
@@ -57,50 +89,60 @@ async def register(request: Request, user: UserCreate):
             "role": user.role
         }
 
+    except PasswordHasherBusy:
+        logger.warning("⚠️ Pool de hachage saturé, inscription refusée : %s", user.email)
+        raise _password_service_busy()
     except Exception as e:
-        logger.error(f"❌ [ERROR] Erreur lors de l'inscription : {e}", exc_info=True)
+        logger.error("❌ [ERROR] Erreur lors de l'inscription : %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Erreur interne du serveur"
         )
 
 @router.post("/login")
-def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     """🔐 Authentifier un utilisateur et retourner un token JWT."""
     ip_address = request.client.host
-    logger.info(f"🔑 Tentative de connexion depuis {ip_address} - Email: {form_data.username}")
+    email = form_data.username.strip().lower()
+    logger.info("🔑 Tentative de connexion depuis %s - Email: %s", ip_address, form_data.username)
+
+    # ✅ Limitation par IP puis par email, avant tout accès base ou calcul bcrypt
+    retry_after = _login_attempts_by_ip.retry_after(ip_address)
+    if retry_after:
+        AUTH_RATE_LIMITED.labels("ip").inc()
+        logger.warning("⚠️ Connexion refusée : trop de tentatives depuis %s", ip_address)
+        raise _too_many_attempts(retry_after)
+    retry_after = _login_failures_by_email.retry_after(email)
+    if retry_after:
+        AUTH_RATE_LIMITED.labels("email").inc()
+        logger.warning("⚠️ Connexion refusée : trop d'échecs pour %s", form_data.username)
+        raise _too_many_attempts(retry_after)
+    _login_attempts_by_ip.hit(ip_address)
 
     try:
         # ✅ Récupérer l'utilisateur par email
-        db_user = get_user_by_email(form_data.username)
+        db_user = await run_in_threadpool(get_user_by_email, form_data.username)
         if not db_user:
-            logger.warning(f"⚠️ Connexion échouée : Utilisateur non trouvé - Email: {form_data.username}")
+            _login_failures_by_email.hit(email)
+            logger.warning("⚠️ Connexion échouée : Utilisateur non trouvé - Email: %s", form_data.username)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email ou mot de passe incorrect"
             )
 
-        logger.debug(f"🔎 Utilisateur trouvé: {db_user}")
-
-        # ✅ Vérifier le mot de passe
-        try:
-            if not verify_password(form_data.password, db_user["password_hash"]):
-                logger.warning(f"⚠️ Connexion échouée : Mot de passe incorrect - Email: {form_data.username}")
-                logger.debug(f"🛠️ Mot de passe en clair: {form_data.password} - Hash attendu: {db_user['password_hash']}")
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Email ou mot de passe incorrect"
-                )
-        except Exception as bcrypt_error:
-            logger.error(f"❌ Erreur bcrypt lors de la vérification du mot de passe : {bcrypt_error}")
+        # ✅ Vérifier le mot de passe (pool bcrypt dédié, hors boucle d'événements)
+        if not await verify_password_async(form_data.password, db_user["password_hash"]):
+            _login_failures_by_email.hit(email)
+            logger.warning("⚠️ Connexion échouée : Mot de passe incorrect - Email: %s", form_data.username)
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Erreur de validation du mot de passe"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email ou mot de passe incorrect"
             )
+        _login_failures_by_email.reset(email)
 
         # ✅ Générer un token JWT
         access_token = create_access_token(data={"sub": db_user["username"], "role": db_user["role"]})
-        logger.info(f"✅ Connexion réussie pour {db_user['email']} depuis {ip_address}")
+        logger.info("✅ Connexion réussie pour %s depuis %s", db_user["email"], ip_address)
 
         # ✅ Retourner la réponse
         return JSONResponse(content={
@@ -112,9 +154,12 @@ def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     except HTTPException:
         # Relancer les exceptions HTTP déjà gérées
         raise
+    except PasswordHasherBusy:
+        logger.warning("⚠️ Pool de hachage saturé, connexion refusée : %s", form_data.username)
+        raise _password_service_busy()
     except Exception as e:
         # Journaliser les erreurs inattendues
-        logger.error(f"❌ [ERROR] Erreur lors de l'authentification : {e}", exc_info=True)
+        logger.error("❌ [ERROR] Erreur lors de l'authentification : %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Erreur interne du serveur"
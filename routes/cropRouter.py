@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException
 from models.cropModel import create_crop, get_crops, get_crop_by_id, update_crop, delete_crop
 from schema.cropSchema import CropCreate, CropUpdate, CropResponse
+from inference.growth_stages import growth_stage_service
+from inference.spatial import moisture_grid_service
 
 router = APIRouter(prefix="", tags=["Crops"])
 
@@ -22,9 +24,14 @@ def retrieve_crop(crop_id: int):
 
 @router.put("/{crop_id}", response_model=CropResponse)
 def modify_crop(crop_id: int, updates: CropUpdate):
-    updated_crop = update_crop(crop_id, updates.dict(exclude_unset=True))
+    changes = updates.dict(exclude_unset=True)
+    updated_crop = update_crop(crop_id, changes)
     if not updated_crop:
         raise HTTPException(status_code=404, detail="Culture non trouvée")
+    if "lifecycle_duration" in changes or "unit" in changes:
+        growth_stage_service.invalidate_all()  # Calendriers de tous les champs de cette culture
+    if "irrigation_humidity_threshold" in changes:
+        moisture_grid_service.invalidate_all()
     return updated_crop
 
 @router.delete("/{crop_id}")
@@ -1,12 +1,21 @@
+import logging
+from datetime import date
+from typing import Literal, Optional
+
 from fastapi import APIRouter, HTTPException
 from models.fieldModel import create_field, get_fields, get_field_by_id, update_field, delete_field
-from schema.fieldSchema import FieldCreate, FieldUpdate, FieldResponse
+from models.usageModel import get_usage_report
+from inference.growth_stages import growth_stage_service
+from inference.spatial import moisture_grid_service
+from schema.fieldSchema import FieldCreate, FieldUpdate, FieldResponse, GrowthStageResponse, MoistureGridResponse
+from schema.pumpSchema import UsageResponse
 
+logger = logging.getLogger(__name__)
 router = APIRouter(prefix="", tags=["Fields"])
 
 @router.post("", response_model=FieldResponse)
 def add_field(field: FieldCreate):
-    print("📥 Requête reçue pour ajouter un champ:", field.dict())  # ✅ Voir les données reçues
+    logger.debug("📥 Requête reçue pour ajouter un champ: %s", field)
 
     if not field.name or not field.location:
         raise HTTPException(status_code=400, detail="❌ Données invalides : certains champs sont vides.")
@@ -16,10 +25,8 @@ def add_field(field: FieldCreate):
         field.crop_type_id, field.planting_date
     )
 
-    response = get_field_by_id(field_id)
-    print("✅ Champ créé avec succès:", response)  # ✅ Voir le champ inséré
-
-    return response
+    logger.info("✅ Champ créé avec succès : ID %s", field_id)
+    return get_field_by_id(field_id)
 
 @router.get("", response_model=list[FieldResponse])
 def list_fields():
@@ -32,14 +39,55 @@ def retrieve_field(field_id: int):
         raise HTTPException(status_code=404, detail="Champ non trouvé")
     return field
 
+@router.get("/{field_id}/growth-stage", response_model=GrowthStageResponse)
+def retrieve_field_growth_stage(field_id: int, day: Optional[date] = None):
+    """🌱 Stade de croissance d'un champ à une date (aujourd'hui par défaut) et calendrier des stades"""
+    day = day or date.today()
+    calendar = growth_stage_service.calendar(field_id)
+    if calendar is None:
+        if not get_field_by_id(field_id):
+            raise HTTPException(status_code=404, detail="Champ non trouvé")
+        return {"field_id": field_id, "day": day, "stage": None, "stage_label": None, "calendar": []}
+    return {
+        "field_id": field_id,
+        "day": day,
+        **(growth_stage_service.stage_for(field_id, day) or {"stage": None, "stage_label": None}),
+        "calendar": calendar.periods(),
+    }
+
+@router.get("/{field_id}/moisture-grid", response_model=MoistureGridResponse)
+def retrieve_field_moisture_grid(field_id: int):
+    """🗺️ Humidité du sol interpolée sur une grille couvrant le champ (irrigation à dose variable)"""
+    grid = moisture_grid_service.grid(field_id)
+    if grid is None:
+        raise HTTPException(status_code=404, detail="Champ non trouvé")
+    return grid
+
+@router.get("/{field_id}/water-usage", response_model=UsageResponse)
+def retrieve_field_water_usage(field_id: int, period: Literal["day", "month"] = "day",
+                               start: Optional[date] = None, end: Optional[date] = None):
+    """💧 Consommation d'eau et d'énergie de toutes les pompes d'un champ"""
+    try:
+        return get_usage_report("field", field_id, period, start, end)
+    except Exception as e:
+        logger.error("❌ Erreur lors du calcul de la consommation du champ ID %s: %s", field_id, e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.put("/{field_id}", response_model=FieldResponse)
 def modify_field(field_id: int, updates: FieldUpdate):
-    updated_field = update_field(field_id, updates.dict(exclude_unset=True))
+    changes = updates.dict(exclude_unset=True)
+    updated_field = update_field(field_id, changes)
     if not updated_field:
         raise HTTPException(status_code=404, detail="Champ non trouvé")
+    if "crop_type_id" in changes or "planting_date" in changes:
+        growth_stage_service.invalidate(field_id)
+    if changes.keys() & {"latitude", "longitude", "size", "crop_type_id", "irrigation_humidity_threshold"}:
+        moisture_grid_service.invalidate(field_id)
     return updated_field
 
 @router.delete("/{field_id}")
 def remove_field(field_id: int):
     delete_field(field_id)
+    growth_stage_service.invalidate(field_id)
+    moisture_grid_service.invalidate(field_id)
     return {"message": "Champ supprimé avec succès"}
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from starlette.responses import Response
+
+from utils.metrics import REGISTRY, CONTENT_TYPE_LATEST
+
+router = APIRouter(prefix="", tags=["Monitoring"])
+
+
+@router.get("", include_in_schema=False)
+def get_metrics():
+    """📊 Exposer les métriques de l'application au format Prometheus"""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
@@ -1,21 +1,156 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+import asyncio
+from fastapi import APIRouter, HTTPException, Header, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 
+from communication.notification_stream import notification_hub, serialize_notification
 from models.notificationModel import (
     get_notifications,
     get_notification_by_id,
     create_notification,
     mark_notification_as_read,
-    deactivate_notification
+    deactivate_notification,
+    get_notifications_after,
+    count_unread_notifications,
+    mark_notifications_as_read,
+    deactivate_notifications
+)
+from schema.notificationsSchema import (
+    NotificationResponse,
+    NotificationCreate,
+    NotificationBulkRequest,
+    NotificationBulkResponse,
+    UnreadCountResponse
 )
-from schema.notificationsSchema import NotificationResponse, NotificationCreate
 
 router = APIRouter(prefix="", tags=["Notifications"])
 
+# 📌 Commentaire SSE envoyé périodiquement pour garder la connexion ouverte
+STREAM_KEEPALIVE_SECONDS = 15.0
+# 📌 Nombre maximal de notifications renvoyées lors d'une reprise (les plus anciennes d'abord ;
+#    au-delà, le flux se ferme et le client reprend depuis le dernier ID reçu)
+STREAM_RESUME_LIMIT = 500
+
+
+async def _resume_events(last_id: Optional[int]):
+    """
+    🔁 Notifications manquées depuis `last_id` (tampon mémoire, sinon base de données) :
+    `(les STREAM_RESUME_LIMIT plus anciennes, True s'il en reste d'autres)`.
+    """
+    if last_id is None:
+        return [], False
+    events = notification_hub.replay_from_memory(last_id)
+    if events is None:
+        rows = await run_in_threadpool(get_notifications_after, last_id, STREAM_RESUME_LIMIT + 1)
+        events = [serialize_notification(row) for row in rows]
+    return events[:STREAM_RESUME_LIMIT], len(events) > STREAM_RESUME_LIMIT
+
+
+async def _notification_events(last_id: Optional[int], is_disconnected):
+    """
+    📡 Flux commun SSE / WebSocket : reprise puis notifications en direct.
+    Produit des listes `(id, json)` ; une liste vide signale l'inactivité (keep-alive).
+    """
+    subscription = notification_hub.subscribe()
+    try:
+        replayed, truncated = await _resume_events(last_id)
+        replayed_ids = {event_id for event_id, _ in replayed}
+        if replayed:
+            yield replayed
+        if truncated:
+            return  # Reprise incomplète : le client se reconnecte avec le dernier ID reçu
+        while not await is_disconnected():
+            events = await subscription.next_batch(STREAM_KEEPALIVE_SECONDS)
+            if subscription.overflowed:
+                return  # Client trop lent : il se reconnecte avec son dernier ID
+            events = [event for event in events if event[0] not in replayed_ids]
+            yield events
+    finally:
+        notification_hub.unsubscribe(subscription)
+
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    last_id: Optional[int] = None,
+    last_event_id: Optional[str] = Header(None),
+):
+    """📡 Notifications en temps réel (Server-Sent Events), reprise via `Last-Event-ID` ou `last_id`"""
+    if last_id is None and last_event_id and last_event_id.isdigit():
+        last_id = int(last_event_id)
+
+    async def event_source():
+        yield "retry: 3000\n\n"
+        async for events in _notification_events(last_id, request.is_disconnected):
+            if not events:
+                yield ": keep-alive\n\n"
+            for event_id, data in events:
+                yield f"id: {event_id}\nevent: notification\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def notifications_websocket(websocket: WebSocket, last_id: Optional[int] = None):
+    """📡 Notifications en temps réel (WebSocket), reprise via `last_id`"""
+    await websocket.accept()
+    closed = asyncio.Event()
+
+    async def watch_disconnect():
+        try:
+            while True:
+                await websocket.receive_text()  # Messages du client ignorés
+        except WebSocketDisconnect:
+            closed.set()
+
+    async def is_disconnected():
+        return closed.is_set()
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        async for events in _notification_events(last_id, is_disconnected):
+            for _, data in events:
+                await websocket.send_text(data)
+        if not closed.is_set():
+            await websocket.close(code=1013)  # Client trop lent ou reprise incomplète : reconnexion avec last_id
+    except WebSocketDisconnect:
+        pass
+    finally:
+        watcher.cancel()
+
 @router.get("", response_model=List[NotificationResponse])
-def fetch_notifications():
-    """🔍 Récupérer toutes les notifications actives"""
-    return get_notifications()
+def fetch_notifications(
+    before_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    unread_only: bool = False,
+):
+    """🔍 Récupérer les notifications actives, paginées par clé (`before_id` = dernier ID reçu)"""
+    return get_notifications(before_id=before_id, limit=limit, unread_only=unread_only)
+
+@router.get("/unread-count", response_model=UnreadCountResponse)
+def fetch_unread_count():
+    """🔔 Nombre de notifications actives non lues"""
+    return {"unread": count_unread_notifications()}
+
+def _bulk_selection(request: NotificationBulkRequest):
+    if request.ids is None and request.up_to is None:
+        raise HTTPException(status_code=400, detail="Préciser ids et/ou up_to")
+    return {"ids": request.ids, "up_to": request.up_to}
+
+@router.put("/read", response_model=NotificationBulkResponse)
+def mark_many_as_read(request: NotificationBulkRequest):
+    """✅ Marquer comme lues plusieurs notifications (IDs et/ou jusqu'à une date)"""
+    return {"updated": mark_notifications_as_read(**_bulk_selection(request))}
+
+@router.put("/deactivate", response_model=NotificationBulkResponse)
+def disable_many_notifications(request: NotificationBulkRequest):
+    """🛑 Désactiver plusieurs notifications (IDs et/ou jusqu'à une date)"""
+    return {"updated": deactivate_notifications(**_bulk_selection(request))}
 
 @router.get("/{notification_id}", response_model=NotificationResponse)
 def fetch_notification_by_id(notification_id: int):
@@ -1,7 +1,12 @@
 import logging
+from datetime import date
+from typing import Literal, Optional
+
 from fastapi import APIRouter, HTTPException
-from models.pumpModel import create_pump, get_pump_by_id, get_pumps, update_pump, delete_pump, toggle_pump
-from schema.pumpSchema import PumpResponse, PumpCreate, PumpUpdate
+from models.pumpModel import create_pump, get_pump_by_id, get_pumps, update_pump, delete_pump, toggle_pump, get_pump_command, bulk_set_pump_state
+from models.usageModel import get_usage_report, get_pump_runs
+from schema.pumpSchema import PumpResponse, PumpCreate, PumpUpdate, PumpCommandResponse, PumpTelemetry, UsageResponse, PumpBulkRequest, PumpBulkResponse
+from actuators.pump_telemetry import telemetry_buffer
 
 # ✅ Configuration du logger
 logger = logging.getLogger(__name__)
@@ -12,24 +17,41 @@ router = APIRouter(prefix="", tags=["Pumps"])
 @router.post("", response_model=PumpResponse)
 def add_pump(pump: PumpCreate):
     """🆕 Ajouter une nouvelle pompe"""
-    logger.info(f"🚀 Ajout d'une pompe : {pump.name} (Field ID: {pump.field_id})")
+    logger.info("🚀 Ajout d'une pompe : %s (Field ID: %s)", pump.name, pump.field_id)
 
     pump_id = create_pump(pump.name, pump.field_id)
     if not pump_id:
-        logger.error(f"❌ Échec de la création de la pompe : {pump.name}")
+        logger.error("❌ Échec de la création de la pompe : %s", pump.name)
         raise HTTPException(status_code=500, detail="Erreur lors de la création de la pompe")
 
-    logger.info(f"✅ Pompe créée avec succès - ID: {pump_id}")
+    logger.info("✅ Pompe créée avec succès - ID: %s", pump_id)
     return get_pump_by_id(pump_id)
 
 
+@router.post("/bulk", response_model=PumpBulkResponse, status_code=202)
+def bulk_switch_pumps(request: PumpBulkRequest):
+    """🎛️ Allumer ou éteindre plusieurs pompes en une requête (IDs et/ou champ)"""
+    if request.pump_ids is None and request.field_id is None:
+        raise HTTPException(status_code=400, detail="Préciser pump_ids et/ou field_id")
+
+    try:
+        result = bulk_set_pump_state(request.state, request.pump_ids, request.field_id)
+    except Exception as e:
+        logger.error("❌ Erreur lors de la commande groupée: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    logger.info("📨 Commande groupée '%s' : %d pompes ciblées, %d commandes en file",
+                request.state, result["matched"], len(result["commands"]))
+    return {"matched": result["matched"], "queued": len(result["commands"]), "commands": result["commands"]}
+
+
 @router.get("", response_model=list[PumpResponse])
 def list_pumps():
     """📋 Lister toutes les pompes"""
-    logger.info("📡 Récupération de la liste des pompes...")
+    logger.debug("📡 Récupération de la liste des pompes...")
 
     pumps = get_pumps()
-    logger.info(f"✅ {len(pumps)} pompes trouvées.")
+    logger.debug("✅ %s pompes trouvées.", len(pumps))
 
     return pumps
 
@@ -37,55 +59,99 @@ def list_pumps():
 @router.get("/{pump_id}", response_model=PumpResponse)
 def retrieve_pump(pump_id: int):
     """🔍 Récupérer une pompe spécifique"""
-    logger.info(f"🔎 Recherche de la pompe ID: {pump_id}")
+    logger.debug("🔎 Recherche de la pompe ID: %s", pump_id)
 
     pump = get_pump_by_id(pump_id)
     if not pump:
-        logger.warning(f"⚠️ Pompe non trouvée - ID: {pump_id}")
+        logger.warning("⚠️ Pompe non trouvée - ID: %s", pump_id)
         raise HTTPException(status_code=404, detail="Pompe non trouvée")
 
-    logger.info(f"✅ Pompe trouvée - ID: {pump_id}")
+    logger.debug("✅ Pompe trouvée - ID: %s", pump_id)
     return pump
 
 
 @router.put("/{pump_id}", response_model=PumpResponse)
 def modify_pump(pump_id: int, updates: PumpUpdate):
     """🛠 Modifier une pompe"""
-    logger.info(f"✏️ Modification de la pompe ID: {pump_id} avec les données : {updates.dict(exclude_unset=True)}")
+    logger.debug("✏️ Modification de la pompe ID: %s avec les données : %s", pump_id, updates)
 
     updated_pump = update_pump(pump_id, updates.dict(exclude_unset=True))
     if not updated_pump:
-        logger.warning(f"⚠️ Pompe non trouvée pour modification - ID: {pump_id}")
+        logger.warning("⚠️ Pompe non trouvée pour modification - ID: %s", pump_id)
         raise HTTPException(status_code=404, detail="Pompe non trouvée")
 
-    logger.info(f"✅ Pompe mise à jour avec succès - ID: {pump_id}")
+    logger.info("✅ Pompe mise à jour avec succès - ID: %s", pump_id)
     return updated_pump
 
 
 @router.delete("/{pump_id}")
 def remove_pump(pump_id: int):
     """🗑 Supprimer une pompe"""
-    logger.info(f"🗑 Suppression de la pompe ID: {pump_id}")
+    logger.info("🗑 Suppression de la pompe ID: %s", pump_id)
 
     success = delete_pump(pump_id)
     if not success:
-        logger.warning(f"⚠️ Pompe non trouvée pour suppression - ID: {pump_id}")
+        logger.warning("⚠️ Pompe non trouvée pour suppression - ID: %s", pump_id)
         raise HTTPException(status_code=404, detail="Pompe non trouvée")
 
-    logger.info(f"✅ Pompe supprimée avec succès - ID: {pump_id}")
+    logger.info("✅ Pompe supprimée avec succès - ID: %s", pump_id)
     return {"message": "Pompe supprimée avec succès"}
 
 
-@router.post("/{pump_id}/toggle", response_model=PumpResponse)
+@router.post("/{pump_id}/toggle", response_model=PumpCommandResponse, status_code=202)
 def switch_pump(pump_id: int):
-    """🔁 Allumer ou éteindre une pompe"""
-    logger.info(f"🔄 Changement d'état de la pompe ID: {pump_id}")
+    """🔁 Allumer ou éteindre une pompe (commande mise en file, suivie via /commands/{id})"""
+    logger.info("🔄 Changement d'état de la pompe ID: %s", pump_id)
 
-    pump = toggle_pump(pump_id)
-    if not pump:
-        logger.warning(f"⚠️ Pompe non trouvée - ID: {pump_id}")
+    command = toggle_pump(pump_id)
+    if not command:
+        logger.warning("⚠️ Pompe non trouvée - ID: %s", pump_id)
         raise HTTPException(status_code=404, detail="Pompe non trouvée")
 
-    # ✅ Correction : Utilisation de pump['is_on'] au lieu de pump.is_on
-    logger.info(f"✅ Pompe ID {pump_id} mise à jour - État actuel: {'ON' if pump['is_on'] else 'OFF'}")
-    return pump
+    logger.info("📨 Commande %s '%s' mise en file pour la pompe ID %s", command["id"], command["command"], pump_id)
+    return command
+
+
+@router.post("/{pump_id}/telemetry", status_code=202)
+def ingest_pump_telemetry(pump_id: int, sample: PumpTelemetry):
+    """📟 Réception de la télémétrie d'une pompe (écrite en base par lots)"""
+    try:
+        telemetry_buffer.record(pump_id, sample.dict(exclude={"recorded_at"}), sample.recorded_at)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"message": "Télémétrie reçue"}
+
+
+@router.get("/{pump_id}/telemetry/latest")
+def retrieve_latest_pump_telemetry(pump_id: int):
+    """📋 Dernier état de télémétrie reçu par cette instance de l'API"""
+    latest = telemetry_buffer.latest(pump_id)
+    if latest is None:
+        raise HTTPException(status_code=404, detail="Aucune télémétrie reçue pour cette pompe")
+    return {"pump_id": pump_id, **latest}
+
+
+@router.get("/{pump_id}/usage", response_model=UsageResponse)
+def retrieve_pump_usage(pump_id: int, period: Literal["day", "month"] = "day",
+                        start: Optional[date] = None, end: Optional[date] = None):
+    """📊 Consommation d'eau et d'énergie d'une pompe (agrégats journaliers ou mensuels)"""
+    try:
+        return get_usage_report("pump", pump_id, period, start, end)
+    except Exception as e:
+        logger.error("❌ Erreur lors du calcul de la consommation de la pompe ID %s: %s", pump_id, e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{pump_id}/runs")
+def list_pump_runs(pump_id: int, limit: int = 50):
+    """📜 Historique des cycles de la pompe"""
+    return get_pump_runs(pump_id, min(max(limit, 1), 500))
+
+
+@router.get("/commands/{command_id}", response_model=PumpCommandResponse)
+def retrieve_pump_command(command_id: int):
+    """🔍 Suivre l'acquittement d'une commande de pompe"""
+    command = get_pump_command(command_id)
+    if not command:
+        raise HTTPException(status_code=404, detail="Commande non trouvée")
+    return command
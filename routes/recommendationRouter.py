@@ -0,0 +1,39 @@
+import logging
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from inference.recommendation_engine import recommendation_engine
+from schema.recommendationSchema import IrrigationRecommendation
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="", tags=["Recommendations"])
+
+
+@router.get("", response_model=List[IrrigationRecommendation])
+def list_recommendations(
+    field_ids: Optional[List[int]] = Query(None),
+    irrigate_only: bool = False,
+):
+    """💡 Recommandations d'irrigation de tous les champs (ou des champs `field_ids`)"""
+    try:
+        recommendations = recommendation_engine.recommend(field_ids)
+    except Exception as e:
+        logger.error("❌ Erreur lors du calcul des recommandations: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    if irrigate_only:
+        recommendations = [r for r in recommendations if r["irrigate"]]
+    return recommendations
+
+
+@router.get("/{field_id}", response_model=IrrigationRecommendation)
+def retrieve_recommendation(field_id: int):
+    """💡 Recommandation d'irrigation d'un champ"""
+    try:
+        recommendations = recommendation_engine.recommend([field_id])
+    except Exception as e:
+        logger.error("❌ Erreur lors du calcul de la recommandation du champ ID %s: %s", field_id, e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    if not recommendations:
+        raise HTTPException(status_code=404, detail="Champ non trouvé")
+    return recommendations[0]
@@ -1,24 +1,31 @@
-from fastapi import APIRouter, HTTPException
-from models.scheduleModel import create_schedule, get_schedules, get_schedule_by_id, update_schedule, delete_schedule, start_irrigation
-from schema.scheduleSchema import ScheduleCreate, ScheduleUpdate, ScheduleResponse
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from models.scheduleModel import (
+    ScheduleConflictError, create_schedule, get_schedules, get_schedule_by_id, update_schedule,
+    delete_schedule, start_irrigation, validate_schedule_plan, get_schedule_occurrences,
+)
+from schema.scheduleSchema import ScheduleCreate, ScheduleUpdate, ScheduleResponse, ScheduleOccurrenceResponse
 import logging
 
-# Configuration du logger en mode DEBUG
-logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+# Logger du module (configuration centralisée dans utils.logging_config)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="", tags=["Schedules"])
 
 
+def _conflict_exception(error: ScheduleConflictError):
+    """⛔ Réponse 409 listant les plannings en conflit."""
+    return HTTPException(status_code=409, detail={
+        "message": "Le planning chevauche d'autres plannings actifs sur une ou plusieurs pompes",
+        "conflicting_schedule_ids": error.conflicting_schedule_ids,
+    })
+
+
 @router.post("", response_model=ScheduleResponse)
 def add_schedule(schedule: ScheduleCreate):
-    logger.debug("📩 Requête reçue pour ajouter un planning: %s", schedule.dict())
-
-    # 🔥 Log détaillé pour les paramètres
-    logger.debug(
-        "🛠️ Paramètres envoyés: field_id=%s, start_date=%s, start_time=%s, duration=%s, status=%s, flow_rate=%s, pump_ids=%s",
-        schedule.field_id, schedule.start_date, schedule.start_time, schedule.duration, schedule.status,
-        schedule.flow_rate, schedule.pump_ids)
+    logger.debug("📩 Requête reçue pour ajouter un planning: %s", schedule)
 
     try:
         schedule_id = create_schedule(
@@ -28,7 +35,12 @@ def add_schedule(schedule: ScheduleCreate):
             schedule.duration,
             schedule.status,
             schedule.flow_rate,
-            schedule.pump_ids  # Assure-toi que c'est bien un tableau ici
+            schedule.pump_ids,  # Assure-toi que c'est bien un tableau ici
+            recurrence_type=schedule.recurrence_type,
+            recurrence_interval=schedule.recurrence_interval,
+            recurrence_weekdays=schedule.recurrence_weekdays,
+            recurrence_until=schedule.recurrence_until,
+            recurrence_exceptions=schedule.recurrence_exceptions,
         )
         logger.debug("✅ ID du planning créé: %s", schedule_id)
 
@@ -39,18 +51,53 @@ def add_schedule(schedule: ScheduleCreate):
 
         logger.debug("✅ Planning ajouté avec succès: %s", new_schedule)
         return ScheduleResponse.from_db(new_schedule)
+    except ScheduleConflictError as e:
+        logger.info("⛔ Planning refusé, conflit avec: %s", e.conflicting_schedule_ids)
+        raise _conflict_exception(e)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("❌ Erreur lors de l'ajout du planning: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/validate")
+def validate_schedules(schedules: list[ScheduleCreate]):
+    """🧮 Vérifie un lot de plannings sans les enregistrer (conflits par pompe)."""
+    logger.debug("🧮 Validation de %d plannings candidats", len(schedules))
+    try:
+        conflicts = validate_schedule_plan([s.dict() for s in schedules])
+    except Exception as e:
+        logger.error("❌ Erreur lors de la validation des plannings: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"valid": not conflicts, "conflicts": conflicts}
+
+
 @router.get("", response_model=list[ScheduleResponse])
-def list_schedules():
-    logger.debug("📥 Requête reçue pour récupérer tous les plannings")
-    schedules = get_schedules()
+def list_schedules(
+    start: Optional[datetime] = Query(None, description="Uniquement les plannings ayant une occurrence après cette date"),
+    end: Optional[datetime] = Query(None, description="Uniquement les plannings ayant une occurrence avant cette date"),
+):
+    logger.debug("📥 Requête reçue pour récupérer les plannings (plage: %s → %s)", start, end)
+    schedules = get_schedules(start, end)
     logger.debug("📄 %d plannings récupérés", len(schedules))
     return [ScheduleResponse.from_db(s) for s in schedules]
 
+@router.get("/occurrences", response_model=list[ScheduleOccurrenceResponse])
+def list_occurrences(
+    start: datetime = Query(..., description="Début de la plage (inclus)"),
+    end: datetime = Query(..., description="Fin de la plage (exclue)"),
+    field_id: Optional[int] = None,
+):
+    """🗓️ Occurrences des plannings dans une plage horaire (lecture de la table indexée)."""
+    if end <= start:
+        raise HTTPException(status_code=400, detail="La fin de la plage doit être postérieure à son début")
+    try:
+        return get_schedule_occurrences(start, end, field_id)
+    except Exception as e:
+        logger.error("❌ Erreur lors de la récupération des occurrences: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/{schedule_id}", response_model=ScheduleResponse)
 def retrieve_schedule(schedule_id: int):
     logger.debug("🔍 Requête reçue pour récupérer le planning ID: %s", schedule_id)
@@ -64,8 +111,12 @@ def retrieve_schedule(schedule_id: int):
 
 @router.put("/{schedule_id}", response_model=ScheduleResponse)
 def modify_schedule(schedule_id: int, updates: ScheduleUpdate):
-    logger.debug("🛠️ Requête reçue pour modifier le planning ID: %s avec: %s", schedule_id, updates.dict())
-    updated_schedule = update_schedule(schedule_id, updates.dict(exclude_unset=True))
+    logger.debug("🛠️ Requête reçue pour modifier le planning ID: %s avec: %s", schedule_id, updates)
+    try:
+        updated_schedule = update_schedule(schedule_id, updates.dict(exclude_unset=True))
+    except ScheduleConflictError as e:
+        logger.info("⛔ Modification du planning ID %s refusée, conflit avec: %s", schedule_id, e.conflicting_schedule_ids)
+        raise _conflict_exception(e)
 
     if not updated_schedule:
         logger.warning("⚠️ Aucun planning mis à jour: ID %s", schedule_id)
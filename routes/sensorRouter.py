@@ -1,18 +1,55 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from models.sensorModel import create_sensor, get_sensors, get_sensor_by_id, update_sensor, delete_sensor
-from schema.sensorSchema import SensorCreate, SensorUpdate, SensorResponse
+from communication.sensor_liveness import sensor_liveness
+from inference.anomaly_detector import anomaly_detector
+from inference.spatial import sensor_index
+from schema.sensorSchema import (
+    SensorCreate, SensorUpdate, SensorResponse, NearbySensorResponse, SensorLastSeenResponse, SensorLivenessStats
+)
 
 router = APIRouter(prefix="", tags=["Sensors"])
 
 @router.post("", response_model=SensorResponse)
 def add_sensor(sensor: SensorCreate):
     sensor_id = create_sensor(sensor.name, sensor.type, sensor.location, sensor.latitude, sensor.longitude, sensor.installation_date, sensor.status, sensor.field_id)
+    sensor_index.invalidate()
     return get_sensor_by_id(sensor_id)
 
 @router.get("", response_model=list[SensorResponse])
 def list_sensors():
     return get_sensors()
 
+@router.get("/nearest", response_model=list[NearbySensorResponse])
+def nearest_sensors(latitude: float = Query(..., ge=-90, le=90), longitude: float = Query(..., ge=-180, le=180),
+                    k: int = Query(1, ge=1, le=100)):
+    """📍 Les `k` capteurs les plus proches d'un point"""
+    return sensor_index.nearest(latitude, longitude, k)
+
+@router.get("/within", response_model=list[NearbySensorResponse])
+def sensors_within(latitude: float = Query(..., ge=-90, le=90), longitude: float = Query(..., ge=-180, le=180),
+                   radius_m: float = Query(..., gt=0, le=50_000)):
+    """📍 Capteurs situés à moins de `radius_m` mètres d'un point"""
+    return sensor_index.within(latitude, longitude, radius_m)
+
+@router.get("/liveness", response_model=SensorLivenessStats)
+def sensors_liveness():
+    """💓 Capteurs suivis et actifs selon ce worker"""
+    return sensor_liveness.stats()
+
+@router.get("/{sensor_id}/last-seen", response_model=SensorLastSeenResponse)
+def retrieve_sensor_last_seen(sensor_id: int):
+    """💓 Statut et dernier contact d'un capteur (la valeur en mémoire prime sur celle écrite par lots)"""
+    sensor = get_sensor_by_id(sensor_id)
+    if not sensor:
+        raise HTTPException(status_code=404, detail="Capteur non trouvé")
+    last_seen = max(filter(None, (sensor.get("last_seen_at"), sensor_liveness.last_seen(sensor_id))), default=None)
+    return {
+        "sensor_id": sensor_id,
+        "status": sensor["status"],
+        "last_seen_at": last_seen,
+        "offline_since": sensor.get("offline_since"),
+    }
+
 @router.get("/{sensor_id}", response_model=SensorResponse)
 def retrieve_sensor(sensor_id: int):
     sensor = get_sensor_by_id(sensor_id)
@@ -22,12 +59,22 @@ def retrieve_sensor(sensor_id: int):
 
 @router.put("/{sensor_id}", response_model=SensorResponse)
 def modify_sensor(sensor_id: int, updates: SensorUpdate):
-    updated_sensor = update_sensor(sensor_id, updates.dict(exclude_unset=True))
+    changes = updates.dict(exclude_unset=True)
+    if "status" in changes:
+        changes["offline_since"] = None  # Statut fixé manuellement
+    updated_sensor = update_sensor(sensor_id, changes)
     if not updated_sensor:
         raise HTTPException(status_code=404, detail="Capteur non trouvé")
+    sensor_index.invalidate()
+    anomaly_detector.forget(sensor_id)  # Capteur remplacé ou recalibré : nouvelles statistiques
+    if changes.get("status") in ("inactive", "maintenance"):
+        sensor_liveness.forget(sensor_id)
     return updated_sensor
 
 @router.delete("/{sensor_id}")
 def remove_sensor(sensor_id: int):
     delete_sensor(sensor_id)
+    sensor_index.invalidate()
+    anomaly_detector.forget(sensor_id)
+    sensor_liveness.forget(sensor_id)
     return {"message": "Capteur supprimé avec succès"}
@@ -1,16 +1,21 @@
-from fastapi import APIRouter, HTTPException
+import logging
+from typing import Optional
+
+import psycopg2
+from fastapi import APIRouter, HTTPException, Query
+from communication.sensor_ingest import sensor_ingest
 from models.sensorsReadingsModel import SensorReadingsModel
-from schema.sensorReadingsSchema import SensorReading
+from schema.sensorReadingsSchema import SensorReading, SensorReadingBatch
+from utils.metrics import MQTT_MESSAGES
+
 import paho.mqtt.client as mqtt
 import json
-import random
-import time
 
 MQTT_BROKER = "localhost"  # Vérifiez que c'est correct
 MQTT_PORT = 1883  # Port MQTT
-REQUEST_TOPIC = "irrigation_system/+/request"
-RESPONSE_TOPIC_TEMPLATE = "irrigation_system/{}/response"
+RESPONSE_TOPIC = "irrigation_system/+/response"
 
+logger = logging.getLogger(__name__)
 router = APIRouter(prefix="", tags=["sensors Readings"])
 
 @router.get("/all")
@@ -35,8 +40,26 @@ def create_sensor_reading(sensor_data: SensorReading):
     """ Ajoute une mesure à un capteur """
     if not SensorReadingsModel.is_sensor_active(sensor_data.sensor_id):
         raise HTTPException(status_code=400, detail=f"Le capteur {sensor_data.sensor_id} est inactif ou inexistant.")
-    SensorReadingsModel.save_sensor_data(sensor_data)
-    return {"message": f"Données du capteur {sensor_data.sensor_id} enregistrées avec succès."}
+    result = SensorReadingsModel.save_sensor_data(sensor_data)
+    if result is None:
+        raise HTTPException(status_code=500, detail="❌ Erreur lors de l'enregistrement des mesures.")
+    return {"message": f"Données du capteur {sensor_data.sensor_id} enregistrées avec succès.", **result}
+
+@router.post("/bulk")
+def create_sensor_readings_bulk(batch: SensorReadingBatch):
+    """ Ajoute en une transaction les mesures de plusieurs capteurs (capteurs inactifs ou inconnus ignorés) """
+    try:
+        result = SensorReadingsModel.save_sensor_data_bulk(batch.readings)
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        raise HTTPException(status_code=503, detail="❌ Base de données indisponible, lot à renvoyer.")
+    if result is None:
+        raise HTTPException(status_code=500, detail="❌ Erreur lors de l'enregistrement des mesures.")
+    return result
+
+@router.get("/quarantine")
+def get_quarantined_measurements(sensor_id: Optional[int] = None, limit: int = Query(100, ge=1, le=1000)):
+    """ Mesures écartées par la détection d'anomalies, des plus récentes aux plus anciennes """
+    return SensorReadingsModel.get_quarantined_measurements(sensor_id, limit)
 
 @router.get("/{sensor_id}")
 def get_sensor_reading(sensor_id: int):
@@ -68,81 +91,31 @@ def request_measures_from_active_sensors():
         topic = f"irrigation_system/{sensor_id}/request"
         message = json.dumps({"command": "take_measurement"})
         client.publish(topic, message)
-        print(f"📤 Demande envoyée à {topic} : {message}")
+        logger.debug("📤 Demande envoyée à %s : %s", topic, message)
 
     client.disconnect()
     return {"message": "Requêtes envoyées aux capteurs actifs."}
 
-def generate_fake_measurements(sensor_id, sensor_type):
-    """ Génère des mesures cohérentes en fonction du type de capteur. """
-    sensor_data_map = {
-        "humidity": {"type": "Humidité", "min": 10, "max": 50, "unit": "%"},
-        "temperature": {"type": "Température", "min": 15, "max": 40, "unit": "°C"},
-        "pluviometry": {"type": "Pluviométrie", "min": 0, "max": 20, "unit": "mm"},
-        "potential_hydrogen": {"type": "pH", "min": 5, "max": 8, "unit": ""}
-    }
-
-    # ✅ Récupérer le vrai `field_id` du capteur
-    field_id = SensorReadingsModel.get_field_id_by_sensor(sensor_id)
-    if field_id is None:
-        print(f"⚠️ Impossible de récupérer le champ pour le capteur {sensor_id}, valeur par défaut: 1")
-        field_id = 1  # Valeur de secours
-
-    raw_data = []
-
-    # ✅ Gestion spéciale du NPK (3 valeurs en 1)
-    if sensor_type == "npk":
-        raw_data.append({
-            "type": "NPK",
-            "valeur": {
-                "N": round(random.uniform(1, 10), 2),
-                "P": round(random.uniform(1, 10), 2),
-                "K": round(random.uniform(1, 10), 2)
-            },
-            "unit": "mg/kg",
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-        })
-
-    # ✅ Génération de données pour les autres capteurs
-    elif sensor_type in sensor_data_map:
-        measure = sensor_data_map[sensor_type]
-        raw_data.append({
-            "type": measure["type"],
-            "valeur": round(random.uniform(measure["min"], measure["max"]), 2),
-            "unit": measure["unit"],
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-        })
-
-    return {
-        "sensor_id": sensor_id,
-        "field_id": field_id,  # ✅ Maintenant, on prend le vrai `field_id`
-        "raw_data": raw_data
-    }
-
+# =========================================
+# 📥 INGESTION MQTT DES RÉPONSES DES CAPTEURS
+# =========================================
+# Les capteurs (ou le simulateur `sensors/fleet_simulator.py`) publient leurs mesures
+# sur `irrigation_system/<sensor_id>/response` ; les messages sont regroupés puis
+# enregistrés par lots par `sensor_ingest` (démarré au lancement de l'application).
 def on_message(client, userdata, msg):
     """ Fonction déclenchée lorsqu'un message MQTT est reçu """
+    MQTT_MESSAGES.labels("measurement", "received").inc()
     try:
-        payload = json.loads(msg.payload.decode())
-        topic_parts = msg.topic.split("/")
-        if len(topic_parts) < 3:
-            print(f"⚠️ Format de topic invalide: {msg.topic}")
-            return
-
-        sensor_id = int(topic_parts[1])
-        sensor_type = SensorReadingsModel.get_sensor_type(sensor_id)
-
-        if payload.get("command") == "take_measurement":
-            print(f"📡 Capteur {sensor_id} ({sensor_type}) a reçu une demande de mesure.")
-            sensor_data = generate_fake_measurements(sensor_id, sensor_type)
-            response_topic = RESPONSE_TOPIC_TEMPLATE.format(sensor_id)
-            client.publish(response_topic, json.dumps(sensor_data))
-            print(f"📤 Réponse envoyée à {response_topic} : {sensor_data}")
-            SensorReadingsModel.save_sensor_data(SensorReading(**sensor_data))
+        reading = SensorReading(**json.loads(msg.payload.decode()))
     except Exception as e:
-        print(f"❌ Erreur dans le listener MQTT : {e}")
+        MQTT_MESSAGES.labels("measurement", "dropped").inc()
+        logger.warning("⚠️ Mesure MQTT invalide sur %s : %s", msg.topic, e)
+        return
+    sensor_ingest.record(reading)
+
 
 mqtt_client = mqtt.Client()
 mqtt_client.on_message = on_message
 mqtt_client.connect(MQTT_BROKER, MQTT_PORT, 60)
-mqtt_client.subscribe(REQUEST_TOPIC)
+mqtt_client.subscribe(RESPONSE_TOPIC)
 mqtt_client.loop_start()
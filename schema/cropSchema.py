@@ -16,7 +16,11 @@ class CropUpdate(BaseModel):
     name: Optional[str] = None
     lifecycle_duration: Optional[int] = None
     unit: Optional[str] = None
+    irrigation_humidity_threshold: Optional[float] = Field(None, ge=0, le=100, description="Irriguer sous cette humidité (%)")
+    irrigation_rainfall_threshold: Optional[float] = Field(None, ge=0, description="Pluie récente maximale (mm)")
 
 class CropResponse(CropBase):
     """📊 Réponse complète d'une culture"""
     id: int
+    irrigation_humidity_threshold: Optional[float] = None
+    irrigation_rainfall_threshold: Optional[float] = None
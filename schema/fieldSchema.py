@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 
-from datetime import date
+from datetime import date, datetime
 
 class FieldBase(BaseModel):
     """📋 Modèle de base pour les champs"""
@@ -28,7 +28,50 @@ class FieldUpdate(BaseModel):
     sensor_density: Optional[float] = None
     crop_type_id: Optional[int] = None
     planting_date: Optional[str] = None
+    irrigation_humidity_threshold: Optional[float] = Field(None, ge=0, le=100, description="Irriguer sous cette humidité (%)")
+    irrigation_rainfall_threshold: Optional[float] = Field(None, ge=0, description="Pluie récente maximale (mm)")
 
 class FieldResponse(FieldBase):
     """📊 Réponse complète d'un champ"""
     id: int
+    irrigation_humidity_threshold: Optional[float] = None
+    irrigation_rainfall_threshold: Optional[float] = None
+
+class StagePeriod(BaseModel):
+    """🗓️ Période d'un stade de croissance"""
+    stage: str
+    stage_label: str
+    start_date: date
+    end_date: date
+
+class GrowthStageResponse(BaseModel):
+    """🌱 Stade de croissance d'un champ et calendrier de ses stades"""
+    field_id: int
+    day: date
+    stage: Optional[str] = None
+    stage_label: Optional[str] = None
+    calendar: List[StagePeriod]
+
+class MoistureGridSensor(BaseModel):
+    """📡 Capteur utilisé pour l'interpolation de l'humidité"""
+    sensor_id: int
+    latitude: float
+    longitude: float
+    value: Optional[float] = None
+    measured_at: Optional[datetime] = None
+
+class MoistureGridResponse(BaseModel):
+    """🗺️ Grille d'humidité du sol interpolée (IDW) d'un champ ; `values[0]` est la ligne nord"""
+    field_id: int
+    rows: int
+    cols: int
+    cell_size_m: float
+    south_west_latitude: float
+    south_west_longitude: float
+    humidity_threshold: float
+    min: Optional[float] = None
+    mean: Optional[float] = None
+    max: Optional[float] = None
+    dry_cells_ratio: Optional[float] = Field(None, description="Part des mailles sous le seuil d'humidité")
+    sensors: List[MoistureGridSensor]
+    values: Optional[List[List[float]]] = None
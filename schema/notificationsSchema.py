@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import List, Optional
 
 class NotificationBase(BaseModel):
     message: str
@@ -19,6 +20,24 @@ class NotificationCreate(NotificationBase):
 class NotificationResponse(NotificationBase):
     """📤 Schéma pour la réponse d'une notification."""
     id: int = Field(..., example=1)
+    occurrences: int = 1
+    last_occurred_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
+
+
+class NotificationBulkRequest(BaseModel):
+    """📦 Sélection groupée : liste d'IDs et/ou toutes les notifications jusqu'à une date"""
+    ids: Optional[List[int]] = Field(None, max_length=10000)
+    up_to: Optional[datetime] = None
+
+
+class NotificationBulkResponse(BaseModel):
+    """📦 Nombre de notifications modifiées"""
+    updated: int
+
+
+class UnreadCountResponse(BaseModel):
+    """🔔 Nombre de notifications actives non lues"""
+    unread: int
@@ -1,6 +1,6 @@
-from datetime import datetime
+from datetime import date, datetime
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Literal, Optional
 
 class PumpBase(BaseModel):
     """📋 Modèle de base pour la pompe"""
@@ -27,6 +27,55 @@ class PumpUpdate(BaseModel):
     maintenance_status: Optional[str] = None
     last_maintenance: Optional[datetime] = None
 
+class PumpTelemetry(BaseModel):
+    """📟 Échantillon de télémétrie envoyé par une pompe"""
+    water_flow: Optional[float] = None
+    elapsed_time: Optional[float] = None
+    power_consumption: Optional[float] = None
+    recorded_at: Optional[datetime] = None
+
+class PumpBulkRequest(BaseModel):
+    """🎛️ Commande groupée : état visé pour une liste de pompes et/ou toutes les pompes d'un champ"""
+    state: Literal["on", "off"]
+    pump_ids: Optional[list[int]] = Field(None, max_length=10000)
+    field_id: Optional[int] = None
+
+class PumpCommandResponse(BaseModel):
+    """📨 Commande envoyée à une pompe (état mis à jour après accusé de réception)"""
+    id: int
+    pump_id: int
+    command: str
+    status: str
+    created_at: datetime
+    attempts: Optional[int] = None
+    completed_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+
+class PumpBulkResponse(BaseModel):
+    """📨 Résultat d'une commande groupée"""
+    matched: int
+    queued: int
+    commands: list[PumpCommandResponse]
+
+class UsagePeriod(BaseModel):
+    """📊 Consommation agrégée sur un jour ou un mois"""
+    period_start: date
+    run_count: int
+    duration_seconds: float
+    volume_liters: float
+    energy_kwh: float
+
+class UsageResponse(BaseModel):
+    """📊 Consommation d'une pompe ou d'un champ sur une plage de périodes"""
+    scope: Literal["pump", "field"]
+    id: int
+    period: Literal["day", "month"]
+    periods: list[UsagePeriod]
+    total_duration_seconds: float
+    total_volume_liters: float
+    total_energy_kwh: float
+    current_run: Optional[dict] = None
+
 class PumpResponse(PumpBase):
     """📊 Réponse complète de la pompe"""
     id: int
@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from typing import Optional
+
+
+class IrrigationRecommendation(BaseModel):
+    """💡 Recommandation d'irrigation d'un champ"""
+    field_id: int
+    field_name: str
+    crop_name: Optional[str] = None
+    days_since_planting: Optional[int] = None
+    stage: Optional[str] = None
+    stage_label: Optional[str] = None
+    water_need_mm: Optional[float] = None
+    soil_moisture: Optional[float] = None
+    crop_coefficient: Optional[float] = None
+    et0_mm: Optional[float] = None
+    etc_mm: Optional[float] = None
+    rainfall_mm: float = 0.0
+    depth_source: str = "ontology"
+    irrigate: bool
+    recommended_depth_mm: float
+    recommended_volume_liters: float
@@ -1,8 +1,8 @@
-from datetime import date, time, timedelta
+from datetime import date, datetime, time, timedelta
 from enum import Enum
 from typing import Optional
 
-from pydantic import BaseModel, Field, conlist
+from pydantic import BaseModel, Field, conint, conlist
 
 
 class StatusEnum(str, Enum):
@@ -11,6 +11,12 @@ class StatusEnum(str, Enum):
     completed = 'completed'
     cancelled = 'cancelled'
 
+class RecurrenceEnum(str, Enum):
+    none = 'none'
+    daily = 'daily'
+    weekly = 'weekly'
+    every_n_days = 'every_n_days'
+
 class ScheduleBase(BaseModel):
     """📋 Modèle de base pour les plannings"""
     field_id: int
@@ -26,6 +32,13 @@ class ScheduleBase(BaseModel):
     status: StatusEnum = Field(..., description="État du planning ('planned', 'in_progress', 'completed', 'cancelled')")
     flow_rate: float = Field(..., description="Débit d'irrigation en L/min")
     pump_ids: conlist(int) | None  # ✅ Assurer que la liste contient uniquement des entiers
+    recurrence_type: RecurrenceEnum = Field(RecurrenceEnum.none, description="Récurrence ('none', 'daily', 'weekly', 'every_n_days')")
+    recurrence_interval: conint(ge=1) = Field(1, description="Pas de la récurrence (N jours, ou toutes les N semaines)")
+    recurrence_weekdays: Optional[conlist(conint(ge=1, le=7))] = Field(
+        None, description="Jours ISO pour 'weekly' (1 = lundi … 7 = dimanche), jour de début par défaut"
+    )
+    recurrence_until: Optional[date] = Field(None, description="Dernier jour de la récurrence (inclus)")
+    recurrence_exceptions: list[date] = Field(default_factory=list, description="Jours exclus de la récurrence")
 
 class ScheduleCreate(ScheduleBase):
     """🆕 Création d'un planning"""
@@ -45,6 +58,11 @@ class ScheduleUpdate(BaseModel):
     last_irrigation_time: Optional[str] = None
     flow_rate: Optional[float] = None
     pump_ids: Optional[conlist(int)] = None  # ✅ Vérification que la liste ne contient que des entiers
+    recurrence_type: Optional[RecurrenceEnum] = None
+    recurrence_interval: Optional[conint(ge=1)] = None
+    recurrence_weekdays: Optional[conlist(conint(ge=1, le=7))] = None
+    recurrence_until: Optional[date] = None
+    recurrence_exceptions: Optional[list[date]] = None
 
 class ScheduleResponse(ScheduleBase):
     """📊 Réponse complète d'un planning"""
@@ -63,5 +81,20 @@ class ScheduleResponse(ScheduleBase):
             status=schedule["status"],
             flow_rate=schedule["flow_rate"],
             last_irrigation_time=schedule["last_irrigation_time"].strftime("%Y-%m-%d %H:%M:%S") if schedule.get("last_irrigation_time") and isinstance(schedule["last_irrigation_time"], (date, time)) else schedule["last_irrigation_time"],
-            pump_ids=schedule.get("pump_ids", [])
+            pump_ids=schedule.get("pump_ids", []),
+            recurrence_type=schedule.get("recurrence_type") or RecurrenceEnum.none,
+            recurrence_interval=schedule.get("recurrence_interval") or 1,
+            recurrence_weekdays=schedule.get("recurrence_weekdays"),
+            recurrence_until=schedule.get("recurrence_until"),
+            recurrence_exceptions=schedule.get("recurrence_exceptions") or []
         )
+
+class ScheduleOccurrenceResponse(BaseModel):
+    """🗓️ Occurrence concrète d'un planning (développée depuis sa règle de récurrence)"""
+    id: int
+    schedule_id: int
+    field_id: int
+    occurrence_date: date
+    starts_at: datetime
+    ends_at: datetime
+    status: str
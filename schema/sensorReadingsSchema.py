@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Union
 
 class Measurement(BaseModel):
@@ -11,3 +11,6 @@ class SensorReading(BaseModel):
     sensor_id: int
     field_id: int
     raw_data: List[Measurement]  # ✅ Remplace `measurements`
+
+class SensorReadingBatch(BaseModel):
+    readings: List[SensorReading] = Field(..., max_length=10000)  # ✅ Ingestion groupée (passerelles, simulateur)
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from datetime import datetime
 from typing import Optional
 
 class SensorBase(BaseModel):
@@ -30,3 +31,30 @@ class SensorUpdate(BaseModel):
 class SensorResponse(SensorBase):
     """📊 Réponse complète d'un capteur"""
     id: int
+    last_seen_at: Optional[datetime] = Field(None, description="Dernier contact enregistré")
+    offline_since: Optional[datetime] = Field(None, description="Passé inactif faute de mesures depuis cette date")
+
+class SensorLastSeenResponse(BaseModel):
+    """💓 Activité d'un capteur"""
+    sensor_id: int
+    status: str
+    last_seen_at: Optional[datetime] = None
+    offline_since: Optional[datetime] = None
+
+class SensorLivenessStats(BaseModel):
+    """💓 État du suivi d'activité de ce worker"""
+    tracked: int
+    alive: int
+    pending_transitions: int
+    timeout_seconds: float
+
+class NearbySensorResponse(BaseModel):
+    """📍 Capteur proche d'un point, avec sa distance"""
+    sensor_id: int
+    name: str
+    type: str
+    status: str
+    field_id: Optional[int] = None
+    latitude: float
+    longitude: float
+    distance_m: float
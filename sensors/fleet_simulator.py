@@ -0,0 +1,329 @@
+"""
+Simulateur d'une flotte de capteurs et de pompes virtuels, pour générer de la charge
+sur la chaîne d'ingestion (MQTT ou endpoint HTTP groupé) et en mesurer le débit.
+
+Chaque capteur suit des courbes journalières réalistes selon son type : température
+sinusoïdale (minimum vers 3 h, maximum vers 15 h), humidité du sol qui s'assèche avec
+la chaleur et remonte avec la pluie, averses par champ (processus de Poisson), pH et
+NPK qui dérivent lentement. Une fraction de capteurs peut être défectueuse (NPK bloqué
+à 255) pour exercer la détection d'anomalies. Les pompes publient leur télémétrie et
+acquittent les commandes du worker `pump_command_worker`.
+
+Débit obtenu, latence d'ingestion (HTTP : aller-retour du lot, enregistré à la
+réponse ; MQTT : sondes relues en base avec `--probe-db`) sont affichés périodiquement.
+
+Prérequis : broker MQTT local (transport mqtt) ou API démarrée (transport http) ; les
+capteurs doivent exister et être actifs en base pour être enregistrés (`--from-db`
+reprend les capteurs existants, sinon les identifiants sont générés).
+Usage : python -m sensors.fleet_simulator --sensors 5000 --pumps 500 --rate 2000 --duration 60
+        python -m sensors.fleet_simulator --from-db --transport http --api-url http://localhost:8000 --rate 5000
+"""
+import argparse
+import json
+import logging
+import math
+import random
+import time
+from datetime import datetime
+
+from sensors.ingest_client import IngestClient, add_transport_arguments
+from utils.logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+REQUEST_TOPIC = "irrigation_system/+/request"
+PUMP_TELEMETRY_TOPIC = "irrigation_system/pumps/{pump_id}/telemetry"
+PUMP_COMMAND_TOPIC = "irrigation_system/pumps/+/command"
+PUMP_ACK_TOPIC = "irrigation_system/pumps/{pump_id}/ack"
+
+# Types de capteurs (mêmes libellés que les capteurs réels) et grandeur normalisée en base
+SENSOR_TYPES = {
+    "humidity": ("Humidité", "%", "humidity"),
+    "temperature": ("Température", "°C", "temperature"),
+    "pluviometry": ("Pluviométrie", "mm", "rainfall"),
+    "potential_hydrogen": ("pH", "", "ph"),
+    "npk": ("NPK", "mg/kg", None),
+}
+TYPE_WEIGHTS = {"humidity": 0.35, "temperature": 0.25, "pluviometry": 0.15, "potential_hydrogen": 0.1, "npk": 0.15}
+
+
+# =========================================
+# 🌦️ MODÈLE PHYSIQUE
+# =========================================
+class FieldWeather:
+    """🌦️ Météo et humidité du sol d'un champ virtuel (état mis à jour à la demande)."""
+
+    def __init__(self, rng, storm_interval_hours):
+        self.rng = rng
+        self.storm_rate = 1.0 / (storm_interval_hours * 3600.0)
+        self.base_temperature = rng.uniform(18, 26)
+        self.amplitude = rng.uniform(5, 9)
+        self.soil_moisture = rng.uniform(25, 45)
+        self.rain_until = 0.0
+        self.rain_intensity = 0.0  # mm/h
+        self.next_storm = None
+        self.updated_at = None
+
+    def temperature(self, t):
+        hour = (t % 86400) / 3600.0
+        return self.base_temperature + self.amplitude * math.sin(2 * math.pi * (hour - 9) / 24)
+
+    def advance(self, t):
+        """⏩ Fait évoluer averses et humidité du sol jusqu'à l'instant simulé `t`."""
+        if self.updated_at is None:
+            self.updated_at = t
+            self.next_storm = t + self.rng.expovariate(self.storm_rate)
+        dt = t - self.updated_at
+        if dt <= 0:
+            return
+        if t >= self.next_storm:
+            self.rain_intensity = self.rng.uniform(2, 25)
+            self.rain_until = self.next_storm + self.rng.uniform(0.25, 2.0) * 3600
+            self.next_storm = self.rain_until + self.rng.expovariate(self.storm_rate)
+        raining = t < self.rain_until
+        evaporation = max(self.temperature(t) - 10, 0) * 0.02 * dt / 3600.0   # points d'humidité
+        infiltration = self.rain_intensity * 0.8 * dt / 3600.0 if raining else 0.0
+        self.soil_moisture = min(60.0, max(5.0, self.soil_moisture - evaporation + infiltration))
+        self.updated_at = t
+
+    def rainfall(self, t, interval):
+        """🌧️ Pluie (mm) tombée pendant l'intervalle de mesure se terminant à `t`."""
+        return self.rain_intensity * interval / 3600.0 if t < self.rain_until else 0.0
+
+
+class VirtualSensor:
+    """📡 Capteur virtuel : type, champ, décalages propres et éventuelle panne."""
+
+    def __init__(self, sensor_id, field_id, sensor_type, weather, rng, faulty=False):
+        self.sensor_id = sensor_id
+        self.field_id = field_id
+        self.type = sensor_type
+        self.weather = weather
+        self.rng = rng
+        self.faulty = faulty
+        self.offset = rng.gauss(0, 0.5)
+        self.ph = rng.uniform(5.5, 7.5)
+        self.npk = {"N": rng.uniform(20, 60), "P": rng.uniform(10, 40), "K": rng.uniform(20, 60)}
+        self.last_t = None
+
+    def measure(self, t, wall_time):
+        """📏 Mesure à l'instant simulé `t`, horodatée avec l'heure réelle `wall_time`."""
+        label, unit, _ = SENSOR_TYPES[self.type]
+        interval = t - self.last_t if self.last_t is not None else 300.0
+        self.last_t = t
+        self.weather.advance(t)
+        if self.type == "humidity":
+            value = round(self.weather.soil_moisture + self.offset + self.rng.gauss(0, 0.4), 2)
+        elif self.type == "temperature":
+            value = round(self.weather.temperature(t) + self.offset + self.rng.gauss(0, 0.2), 2)
+        elif self.type == "pluviometry":
+            value = round(self.weather.rainfall(t, interval), 2)
+        elif self.type == "potential_hydrogen":
+            value = round(self.ph + 0.05 * math.sin(t / 86400.0) + self.rng.gauss(0, 0.02), 2)
+        else:
+            if self.faulty:
+                value = {"N": 255.0, "P": 255.0, "K": 255.0}
+            else:
+                for key in self.npk:  # Lent appauvrissement du sol
+                    self.npk[key] = max(1.0, self.npk[key] - 1e-6 * interval)
+                value = {key: round(level + self.rng.gauss(0, 0.3), 2) for key, level in self.npk.items()}
+        return {
+            "sensor_id": self.sensor_id,
+            "field_id": self.field_id,
+            "raw_data": [{
+                "type": label,
+                "valeur": value,
+                "unit": unit,
+                "timestamp": datetime.fromtimestamp(wall_time).strftime("%Y-%m-%d %H:%M:%S.%f"),
+            }],
+        }
+
+
+class VirtualPump:
+    """🚰 Pompe virtuelle : état marche/arrêt piloté par les commandes reçues."""
+
+    def __init__(self, pump_id, rng):
+        self.pump_id = pump_id
+        self.rng = rng
+        self.flow_rate = rng.uniform(15, 30)   # L/min
+        self.power = rng.uniform(0.5, 1.5)     # kW
+        self.started_at = None
+
+    def telemetry(self, now):
+        running = self.started_at is not None
+        return {
+            "water_flow": round(self.flow_rate + self.rng.gauss(0, 0.5), 2) if running else 0.0,
+            "elapsed_time": round(now - self.started_at, 1) if running else 0.0,
+            "power_consumption": round(self.power + self.rng.gauss(0, 0.02), 3) if running else 0.0,
+        }
+
+
+# =========================================
+# 🚀 SIMULATEUR
+# =========================================
+class FleetSimulator:
+    """🚀 Génère les messages de la flotte au débit demandé et mesure l'ingestion."""
+
+    def __init__(self, args, sensors, pumps):
+        self.args = args
+        self.sensors = sensors
+        self.by_id = {sensor.sensor_id: sensor for sensor in sensors}
+        self.pumps = {pump.pump_id: pump for pump in pumps}
+        self.sent = 0
+        self.pump_messages = 0
+        self.acks = 0
+        self.start_wall = time.time()
+        self.ingest = None
+
+    def sim_time(self, now):
+        return self.start_wall + (now - self.start_wall) * self.args.time_scale
+
+    # 📡 MQTT
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None):
+        if reason_code == 0:
+            client.subscribe(PUMP_COMMAND_TOPIC)
+            client.subscribe(REQUEST_TOPIC)
+        else:
+            logger.error("❌ Échec de connexion au broker MQTT, code de retour : %s", reason_code)
+
+    def _on_message(self, client, userdata, msg):
+        try:
+            parts = msg.topic.split("/")
+            payload = json.loads(msg.payload.decode())
+            if parts[1] == "pumps":
+                self._on_pump_command(int(parts[2]), payload)
+            elif payload.get("command") == "take_measurement":
+                sensor = self.by_id.get(int(parts[1]))
+                if sensor is not None:  # Réponse à `POST /api/sensorsReadings/request_measures`
+                    now = time.time()
+                    self.ingest.publish(sensor.measure(self.sim_time(now), now))
+        except (ValueError, KeyError, IndexError):
+            logger.warning("⚠️ Message invalide sur %s", msg.topic)
+
+    def _on_pump_command(self, pump_id, payload):
+        pump = self.pumps.get(pump_id)
+        if pump is None:
+            return
+        failed = self.args.pump_failure_rate > 0 and pump.rng.random() < self.args.pump_failure_rate
+        if not failed:
+            pump.started_at = (pump.started_at or time.time()) if payload.get("command") == "on" else None
+        ack = {"command_id": payload.get("command_id"), "status": "error" if failed else "ok"}
+        if failed:
+            ack["error"] = "défaut simulé"
+        self.ingest.client.publish(PUMP_ACK_TOPIC.format(pump_id=pump_id), json.dumps(ack), qos=1)
+        self.acks += 1
+
+    def run(self):
+        args = self.args
+        # En HTTP, MQTT n'est ouvert que pour les pompes (les demandes de mesure y sont alors aussi servies)
+        self.ingest = IngestClient(args, mqtt_needed=bool(self.pumps), on_connect=self._on_connect,
+                                   on_message=self._on_message)
+        probe_sensors = [sensor for sensor in self.sensors if SENSOR_TYPES[sensor.type][2] and not sensor.faulty]
+
+        start = time.time()
+        deadline = start + args.duration if args.duration else None
+        next_report = start + args.report_interval
+        next_probe = start + args.probe_interval
+        cursor = 0
+        pump_cursor = 0
+        pump_ids = list(self.pumps)
+        pump_rate = len(pump_ids) / args.pump_interval if pump_ids else 0.0
+        last_sent, last_report = 0, start
+        try:
+            while deadline is None or time.time() < deadline:
+                now = time.time()
+                due = int((now - start) * args.rate) - self.sent
+                for _ in range(min(due, args.rate)):  # Au plus une seconde de retard rattrapée par tour
+                    sensor = self.sensors[cursor % len(self.sensors)]
+                    cursor += 1
+                    self.ingest.send(sensor.measure(self.sim_time(now), now))
+                    self.sent += 1
+                if due <= 0:
+                    self.ingest.flush()
+                pump_due = int((now - start) * pump_rate) - self.pump_messages
+                for _ in range(max(pump_due, 0)):
+                    pump = self.pumps[pump_ids[pump_cursor % len(pump_ids)]]
+                    pump_cursor += 1
+                    self.ingest.client.publish(PUMP_TELEMETRY_TOPIC.format(pump_id=pump.pump_id),
+                                               json.dumps(pump.telemetry(now)))
+                    self.pump_messages += 1
+                if probe_sensors and args.probe_db and now >= next_probe:
+                    sensor = random.choice(probe_sensors)
+                    self.ingest.probe(sensor.measure(self.sim_time(now), now), SENSOR_TYPES[sensor.type][2])
+                    next_probe = now + args.probe_interval
+                if now >= next_report:
+                    self.report(now - last_report, self.sent - last_sent, final=False)
+                    last_sent, last_report = self.sent, now
+                    next_report = now + args.report_interval
+                time.sleep(0.001)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.ingest.close()
+            self.report(time.time() - start, self.sent, final=True)
+
+    def report(self, elapsed, sent, final):
+        line = (f"{'TOTAL' if final else 'intervalle'} : {sent:,} messages en {elapsed:.1f} s -> "
+                f"{sent / elapsed if elapsed else 0:,.0f} msg/s (cible {self.args.rate:,}/s)")
+        line += self.ingest.summary(final)
+        if self.pumps:
+            line += f" | télémétrie pompes {self.pump_messages:,}, acquittements {self.acks:,}"
+        print(line, flush=True)
+
+
+def build_fleet(args):
+    """🏗️ Capteurs et pompes virtuels (identifiants générés ou repris de la base)."""
+    rng = random.Random(args.seed)
+    if args.from_db:
+        from models.spatialModel import get_sensor_locations
+
+        rows = [row for row in get_sensor_locations() if row["status"] == "active"]
+        definitions = [(row["sensor_id"], row["field_id"] or 1,
+                        row["type"] if row["type"] in SENSOR_TYPES else "humidity") for row in rows]
+    else:
+        types, weights = list(TYPE_WEIGHTS), list(TYPE_WEIGHTS.values())
+        definitions = [
+            (args.first_sensor_id + i, 1 + i % args.fields, rng.choices(types, weights)[0])
+            for i in range(args.sensors)
+        ]
+    weather = {}
+    sensors = []
+    for sensor_id, field_id, sensor_type in definitions:
+        field = weather.setdefault(field_id, FieldWeather(random.Random(rng.random()), args.storm_interval_hours))
+        faulty = sensor_type == "npk" and rng.random() < args.faulty_ratio
+        sensors.append(VirtualSensor(sensor_id, field_id, sensor_type, field, random.Random(rng.random()), faulty))
+    pumps = [VirtualPump(args.first_pump_id + i, random.Random(rng.random())) for i in range(args.pumps)]
+    return sensors, pumps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sensors", type=int, default=1000, help="Nombre de capteurs virtuels")
+    parser.add_argument("--fields", type=int, default=50, help="Nombre de champs virtuels")
+    parser.add_argument("--pumps", type=int, default=0, help="Nombre de pompes virtuelles (MQTT)")
+    parser.add_argument("--from-db", action="store_true", help="Reprendre les capteurs actifs de la base")
+    parser.add_argument("--first-sensor-id", type=int, default=1)
+    parser.add_argument("--first-pump-id", type=int, default=1)
+    parser.add_argument("--rate", type=int, default=1000, help="Débit total visé (messages capteurs/s)")
+    parser.add_argument("--duration", type=float, default=60, help="Durée (s) ; 0 = jusqu'à Ctrl+C")
+    add_transport_arguments(parser)
+    parser.add_argument("--pump-interval", type=float, default=10, help="Période de télémétrie par pompe (s)")
+    parser.add_argument("--pump-failure-rate", type=float, default=0.0, help="Part des commandes refusées")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Accélération des courbes journalières")
+    parser.add_argument("--storm-interval-hours", type=float, default=48, help="Intervalle moyen entre averses")
+    parser.add_argument("--faulty-ratio", type=float, default=0.0, help="Part des capteurs NPK bloqués à 255")
+    parser.add_argument("--probe-interval", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    setup_logging()
+    sensors, pumps = build_fleet(args)
+    if not sensors:
+        parser.error("aucun capteur à simuler")
+    print(f"Flotte : {len(sensors):,} capteurs sur {len({s.field_id for s in sensors})} champs, "
+          f"{len(pumps):,} pompes, transport {args.transport}, {args.rate:,} msg/s visés")
+    FleetSimulator(args, sensors, pumps).run()
+
+
+if __name__ == "__main__":
+    main()
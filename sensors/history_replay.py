@@ -0,0 +1,252 @@
+"""
+Rejeu d'un historique de mesures dans la chaîne d'ingestion en conservant les écarts
+entre mesures, accélérés d'un facteur N (`--speed`), ou au plus vite (`--speed 0`).
+Sert à reproduire un incident de production et à vérifier les performances de
+l'ingestion d'une version à l'autre.
+
+Formats reconnus (d'après l'extension et l'en-tête) :
+  - CSV « large », une ligne par instant (data/IoTProcessed_Data.csv) : colonne de date
+    et une colonne par grandeur (`--columns`), rejouées pour chaque capteur de
+    `--sensor-ids` (plusieurs capteurs multiplient la charge) ;
+  - CSV « long », une ligne par mesure : `sensor_id, [field_id,] type, valeur, unit, timestamp`
+    (les lignes consécutives d'un même capteur au même instant forment une lecture) ;
+  - JSON Lines, une lecture `{sensor_id, field_id, raw_data}` par ligne (messages MQTT capturés).
+L'historique doit être trié par date ; une mesure en retard sur la précédente est envoyée aussitôt.
+
+Horodatages : `original` conserve ceux de l'historique (décalés d'une boucle à l'autre
+avec `--loops`), `now` les remplace par l'heure d'envoi. Sont affichés : débit obtenu,
+retard sur le calendrier de rejeu (l'émetteur ou l'ingestion ne suit pas), latence des
+lots HTTP et, en MQTT avec `--probe-db`, délai d'ingestion mesuré en base (avec
+`original`, le capteur ne doit pas déjà avoir de mesures plus récentes en base).
+
+Prérequis : broker MQTT local (transport mqtt) ou API démarrée (transport http) ; les
+capteurs rejoués doivent exister et être actifs en base.
+Usage : python -m sensors.history_replay --sensor-ids 1,2,3 --speed 600
+        python -m sensors.history_replay --transport http --speed 0 --sensor-ids 1 --loops 10
+        python -m sensors.history_replay capture.jsonl --speed 1 --timestamps now --probe-db
+"""
+import argparse
+import csv
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from itertools import groupby
+from pathlib import Path
+
+from inference.anomaly_detector import normalize_metric
+from sensors.ingest_client import IngestClient, add_transport_arguments, parse_timestamp, percentile
+from utils.logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+CSV_PATH = Path(__file__).resolve().parent.parent / "data" / "IoTProcessed_Data.csv"
+# 📌 Colonnes du jeu de données IoT : colonne=libellé:unité (les colonnes d'actionneurs sont ignorées)
+DEFAULT_COLUMNS = "tempreature=Température:°C,humidity=Humidité:%,water_level=Niveau d'eau:%,N=N:mg/kg,P=P:mg/kg,K=K:mg/kg"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+LONG_FORMAT_COLUMNS = {"sensor_id", "type", "valeur", "timestamp"}
+
+
+def parse_columns(spec):
+    """🏷️ `colonne=libellé:unité,...` -> [(colonne, libellé, unité)]."""
+    columns = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        column, _, label_unit = item.partition("=")
+        label, _, unit = (label_unit or column).partition(":")
+        columns.append((column, label, unit))
+    return columns
+
+
+def parse_value(raw):
+    """🔢 Valeur d'une mesure : nombre, dictionnaire JSON (NPK) ou texte laissé tel quel."""
+    text = raw.strip()
+    if text.startswith("{"):
+        return json.loads(text)
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+# =========================================
+# 📂 LECTURE DE L'HISTORIQUE
+# =========================================
+def read_wide_csv(path, args):
+    """📂 CSV « large » : chaque ligne donne une lecture par capteur de `--sensor-ids`."""
+    columns = parse_columns(args.columns)
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        missing = [column for column, _, _ in columns if column not in reader.fieldnames]
+        if missing or args.time_column not in reader.fieldnames:
+            raise SystemExit(f"❌ Colonnes absentes de {path} : {', '.join(missing or [args.time_column])}")
+        t = None
+        for row in reader:
+            try:
+                timestamp = row[args.time_column]
+                t = parse_timestamp(timestamp)
+            except ValueError:
+                if t is None:
+                    continue
+                timestamp = t.strftime(TIMESTAMP_FORMAT)  # Ligne sans date : rattachée à la précédente
+            measurements = []
+            for column, label, unit in columns:
+                if row[column] in ("", None):
+                    continue
+                measurements.append({"type": label, "valeur": parse_value(row[column]), "unit": unit,
+                                     "timestamp": timestamp})
+            if not measurements:
+                continue
+            for sensor_id in args.sensor_ids:
+                yield t, {"sensor_id": sensor_id, "field_id": args.field_id,
+                          "raw_data": [dict(measurement) for measurement in measurements]}
+
+
+def read_long_csv(path, args):
+    """📂 CSV « long » : une mesure par ligne, regroupées par capteur et instant."""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for (sensor_id, timestamp), rows in groupby(reader, key=lambda row: (row["sensor_id"], row["timestamp"])):
+            rows = list(rows)
+            field_id = rows[0].get("field_id") or args.field_id
+            yield parse_timestamp(timestamp), {
+                "sensor_id": int(sensor_id),
+                "field_id": int(field_id),
+                "raw_data": [{"type": row["type"], "valeur": parse_value(row["valeur"]),
+                              "unit": row.get("unit") or "", "timestamp": timestamp} for row in rows],
+            }
+
+
+def read_jsonl(path, args):
+    """📂 JSON Lines : une lecture complète par ligne, datée par sa première mesure."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                reading = json.loads(line)
+                reading.setdefault("field_id", args.field_id)
+                yield parse_timestamp(reading["raw_data"][0]["timestamp"]), reading
+
+
+def read_history(path, args):
+    """📂 Choisit le lecteur d'après l'extension et l'en-tête du fichier."""
+    if path.suffix in (".jsonl", ".ndjson"):
+        return read_jsonl(path, args)
+    with open(path, newline="", encoding="utf-8") as f:
+        header = set(next(csv.reader(f), []))
+    if LONG_FORMAT_COLUMNS <= header:
+        return read_long_csv(path, args)
+    if not args.sensor_ids:
+        raise SystemExit("❌ --sensor-ids est requis pour un CSV sans colonne sensor_id.")
+    return read_wide_csv(path, args)
+
+
+def probe_metric(reading):
+    """🔎 Grandeur numérique de la lecture suivie en base par les sondes (None s'il n'y en a pas)."""
+    for measurement in reading["raw_data"]:
+        if isinstance(measurement["valeur"], (int, float)) and not isinstance(measurement["valeur"], bool):
+            metric = normalize_metric(measurement["type"])
+            if metric is not None:
+                return metric
+    return None
+
+
+# =========================================
+# ⏯️ REJEU
+# =========================================
+def replay(args):
+    ingest = IngestClient(args)
+    sent = measurements = 0
+    lateness = []
+    last_sent, last_measurements, last_lateness = 0, 0, 0
+    start = last_report = time.time()
+    next_report = start + args.report_interval
+    next_probe = start
+    first = last = None
+    loop_offset = timedelta(0)
+    try:
+        for _ in range(args.loops):
+            previous = None
+            for t, reading in read_history(args.path, args):
+                if args.limit and sent >= args.limit:
+                    break
+                if first is None:
+                    first = t
+                if previous is not None and t < previous:
+                    t = previous  # Historique non trié : envoyé aussitôt
+                previous = t
+                t = last = t + loop_offset
+                now = time.time()
+                if args.speed > 0:
+                    target = start + (t - first).total_seconds() / args.speed
+                    if target > now:
+                        ingest.flush()  # Un lot incomplet part avant l'attente
+                        time.sleep(target - now)
+                        now = time.time()
+                    lateness.append(now - target)
+                if args.timestamps == "now" or loop_offset:
+                    stamp = (datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S.%f") if args.timestamps == "now"
+                             else t.strftime(TIMESTAMP_FORMAT))
+                    for measurement in reading["raw_data"]:
+                        measurement["timestamp"] = stamp
+                metric = probe_metric(reading) if args.probe_db and now >= next_probe else None
+                if metric is not None:
+                    ingest.probe(reading, metric)
+                    next_probe = now + args.probe_interval
+                else:
+                    ingest.send(reading)
+                sent += 1
+                measurements += len(reading["raw_data"])
+                if now >= next_report:
+                    print(report("intervalle", now - last_report, sent - last_sent,
+                                 measurements - last_measurements, lateness[last_lateness:], ingest), flush=True)
+                    last_sent, last_measurements, last_lateness = sent, measurements, len(lateness)
+                    last_report = now
+                    next_report = now + args.report_interval
+            if previous is not None:
+                # Passage suivant : à la suite du précédent, après `--loop-gap` secondes
+                loop_offset += (previous - first) + timedelta(seconds=args.loop_gap)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ingest.close()
+        elapsed = time.time() - start
+        print(report("TOTAL", elapsed, sent, measurements, lateness, ingest, final=True), flush=True)
+        if last is not None and args.speed > 0:
+            span = (last - first).total_seconds()
+            print(f"Historique : {span / 3600:.1f} h rejouées en {elapsed:.1f} s "
+                  f"(x{span / elapsed if elapsed else 0:,.0f}, visé x{args.speed:,.0f})")
+
+
+def report(label, elapsed, sent, measurements, lateness, ingest, final=False):
+    line = (f"{label} : {sent:,} lectures ({measurements:,} mesures) en {elapsed:.1f} s -> "
+            f"{sent / elapsed if elapsed else 0:,.0f} lectures/s, {measurements / elapsed if elapsed else 0:,.0f} mesures/s")
+    if lateness:
+        line += (f" | retard calendrier p50 {percentile(lateness, 50) * 1000:.0f} ms, "
+                 f"p99 {percentile(lateness, 99) * 1000:.0f} ms")
+    return line + ingest.summary(final)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", type=Path, default=CSV_PATH, help="Historique à rejouer")
+    parser.add_argument("--speed", type=float, default=60, help="Accélération (0 = au plus vite)")
+    parser.add_argument("--sensor-ids", type=lambda value: [int(v) for v in value.split(",") if v], default=[],
+                        help="Capteurs recevant chaque ligne d'un CSV large (ex. 1,2,3)")
+    parser.add_argument("--field-id", type=int, default=1, help="Champ si l'historique ne le précise pas")
+    parser.add_argument("--columns", default=DEFAULT_COLUMNS, help="Grandeurs d'un CSV large")
+    parser.add_argument("--time-column", default="date")
+    parser.add_argument("--timestamps", choices=("original", "now"), default="original")
+    parser.add_argument("--loops", type=int, default=1, help="Nombre de passages sur l'historique")
+    parser.add_argument("--loop-gap", type=float, default=300, help="Écart (s) entre deux passages")
+    parser.add_argument("--limit", type=int, default=0, help="Nombre maximal de lectures (0 = toutes)")
+    parser.add_argument("--probe-interval", type=float, default=1.0)
+    add_transport_arguments(parser)
+    args = parser.parse_args()
+
+    setup_logging()
+    print(f"Rejeu de {args.path} en {args.transport}, "
+          f"{'au plus vite' if args.speed <= 0 else f'x{args.speed:,.0f}'}")
+    replay(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Transport commun aux outils de génération de charge (`fleet_simulator`, `history_replay`) :
+envoi des lectures vers la chaîne d'ingestion, par MQTT ou par `POST /api/sensorsReadings/bulk`,
+et mesure du débit et de la latence d'ingestion.
+"""
+import http.client
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlparse
+
+import paho.mqtt.client as mqtt
+
+logger = logging.getLogger(__name__)
+
+SENSOR_TOPIC = "irrigation_system/{sensor_id}/response"
+BULK_PATH = "/api/sensorsReadings/bulk"
+# Une sonde non retrouvée en base au-delà de ce délai est abandonnée (mesure rejetée ou perdue)
+PROBE_TIMEOUT_SECONDS = 60.0
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100.0 * len(ordered)))]
+
+
+def parse_timestamp(value):
+    """🕒 Horodatage d'une mesure, avec ou sans microsecondes (comme `measurement_timestamp` en base)."""
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S.%f" if "." in value else "%Y-%m-%d %H:%M:%S")
+
+
+def add_transport_arguments(parser):
+    """⚙️ Options de transport partagées par les outils de charge."""
+    parser.add_argument("--transport", choices=("mqtt", "http"), default="mqtt")
+    parser.add_argument("--broker", default=os.getenv("MQTT_BROKER", "localhost"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("MQTT_PORT", "1883")))
+    parser.add_argument("--qos", type=int, choices=(0, 1), default=0)
+    parser.add_argument("--api-url", default="http://localhost:8000")
+    parser.add_argument("--token", default=None, help="Jeton Bearer si l'API l'exige")
+    parser.add_argument("--batch-size", type=int, default=500, help="Mesures par requête HTTP")
+    parser.add_argument("--http-workers", type=int, default=4)
+    parser.add_argument("--probe-db", action="store_true", help="Mesurer le délai d'ingestion MQTT en base")
+    parser.add_argument("--report-interval", type=float, default=5.0)
+
+
+class IngestClient:
+    """
+    📤 Envoie des lectures (`{sensor_id, field_id, raw_data}`) à la chaîne d'ingestion.
+
+    MQTT : une publication par lecture sur le topic de réponse du capteur ; le délai
+    d'ingestion est mesuré par des sondes dont l'horodatage est recherché dans
+    `sensor_latest_measurements`. HTTP : lectures regroupées par lots envoyés par un
+    pool de connexions persistantes ; le lot est enregistré au retour de la requête,
+    dont la durée donne la latence. Au plus deux lots par worker sont en attente :
+    au-delà, `send()` bloque et le débit obtenu baisse (contre-pression).
+    """
+
+    def __init__(self, args, mqtt_needed=False, on_connect=None, on_message=None):
+        """
+        :param args: Options de `add_transport_arguments`.
+        :param mqtt_needed: Ouvrir la connexion MQTT même en transport HTTP (pompes virtuelles).
+        """
+        self.args = args
+        self.lock = threading.Lock()
+        self.stored = 0
+        self.quarantined = 0
+        self.rejected = set()
+        self.errors = 0
+        self.latencies = []
+        self.probe_lags = []
+        self._reported = (0, 0)
+        self._batch = []
+        self._probes = queue.Queue()
+        self._http = threading.local()
+        self.client = None
+        self.pool = None
+        if args.transport == "mqtt" or mqtt_needed:
+            self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+            if on_connect is not None:
+                self.client.on_connect = on_connect
+            if on_message is not None:
+                self.client.on_message = on_message
+            self.client.connect(args.broker, args.port)
+            self.client.loop_start()
+        if args.transport == "http":
+            self.pool = ThreadPoolExecutor(max_workers=args.http_workers)
+            self._in_flight = threading.Semaphore(args.http_workers * 2)
+        elif args.probe_db:
+            threading.Thread(target=self._probe_loop, name="ingest-probe", daemon=True).start()
+
+    # =========================================
+    # 📤 ENVOI
+    # =========================================
+    def publish(self, reading):
+        """📡 Publie immédiatement une lecture sur MQTT (quel que soit le transport)."""
+        self.client.publish(SENSOR_TOPIC.format(sensor_id=reading["sensor_id"]), json.dumps(reading),
+                            qos=self.args.qos)
+
+    def send(self, reading):
+        """📤 Envoie une lecture (publiée en MQTT, ajoutée au lot courant en HTTP)."""
+        if self.pool is None:
+            self.publish(reading)
+            return
+        self._batch.append(reading)
+        if len(self._batch) >= self.args.batch_size:
+            self.flush()
+
+    def flush(self):
+        """📦 Soumet le lot HTTP en cours, même incomplet."""
+        if self.pool is not None and self._batch:
+            batch, self._batch = self._batch, []
+            self._in_flight.acquire()
+            self.pool.submit(self._post_batch, batch)
+
+    def probe(self, reading, metric):
+        """🔎 Envoie une lecture dont l'arrivée en base sera guettée (MQTT avec `--probe-db`)."""
+        if self.pool is None and self.args.probe_db:
+            stamp = parse_timestamp(reading["raw_data"][0]["timestamp"])
+            self._probes.put((reading["sensor_id"], metric, stamp, time.time()))
+        self.send(reading)
+
+    def close(self):
+        """⏹️ Envoie le dernier lot, attend les requêtes en cours et ferme MQTT."""
+        if self.pool is not None:
+            self.flush()
+            self.pool.shutdown(wait=True)
+        if self.client is not None:
+            self.client.loop_stop()
+            self.client.disconnect()
+
+    # =========================================
+    # 🌐 HTTP
+    # =========================================
+    def _connection(self):
+        conn = getattr(self._http, "conn", None)
+        if conn is None:
+            url = urlparse(self.args.api_url)
+            factory = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+            conn = self._http.conn = factory(url.hostname, url.port, timeout=30)
+        return conn
+
+    def _post_batch(self, batch):
+        body = json.dumps({"readings": batch})
+        headers = {"Content-Type": "application/json"}
+        if self.args.token:
+            headers["Authorization"] = f"Bearer {self.args.token}"
+        start = time.perf_counter()
+        try:
+            conn = self._connection()
+            conn.request("POST", BULK_PATH, body, headers)
+            response = conn.getresponse()
+            result = json.loads(response.read() or b"{}")
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                if response.status != 200:
+                    self.errors += 1
+                    return
+                self.latencies.append(elapsed)
+                self.stored += result.get("stored", 0)
+                self.quarantined += result.get("quarantined", 0)
+                self.rejected.update(result.get("rejected", []))
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            self._http.conn = None
+            with self.lock:
+                self.errors += 1
+            logger.warning("⚠️ Lot HTTP en échec : %s", e)
+        finally:
+            self._in_flight.release()
+
+    # =========================================
+    # 🔎 SONDES MQTT
+    # =========================================
+    def _probe_loop(self):
+        """🔎 Relit en base les sondes MQTT : délai entre publication et enregistrement."""
+        from database.database import get_db_cursor
+
+        pending = deque()
+        while True:
+            try:
+                while True:
+                    pending.append(self._probes.get_nowait())
+            except queue.Empty:
+                pass
+            if pending:
+                cursor, conn = get_db_cursor()
+                if cursor and conn:
+                    try:
+                        still = deque()
+                        for sensor_id, metric, stamp, sent_at in pending:
+                            cursor.execute("""
+                                SELECT measured_at FROM sensor_latest_measurements
+                                 WHERE sensor_id = %s AND metric = %s;
+                            """, (sensor_id, metric))
+                            row = cursor.fetchone()
+                            if row and row["measured_at"] >= stamp:
+                                with self.lock:
+                                    self.probe_lags.append(time.time() - sent_at)
+                            elif time.time() - sent_at < PROBE_TIMEOUT_SECONDS:
+                                still.append((sensor_id, metric, stamp, sent_at))
+                        pending = still
+                    finally:
+                        cursor.close()
+                        conn.close()
+            time.sleep(0.05)
+
+    # =========================================
+    # 📊 RAPPORT
+    # =========================================
+    def summary(self, final=False):
+        """📋 Résultats d'ingestion (depuis le dernier rapport, ou depuis le début si `final`)."""
+        with self.lock:
+            start_latency, start_lag = (0, 0) if final else self._reported
+            latencies = self.latencies[start_latency:]
+            lags = self.probe_lags[start_lag:]
+            self._reported = (len(self.latencies), len(self.probe_lags))
+            line = ""
+            if self.pool is not None:
+                line += (f" | enregistrées {self.stored:,}, quarantaine {self.quarantined:,}, "
+                         f"capteurs refusés {len(self.rejected)}, erreurs {self.errors}")
+                if latencies:
+                    p50, p95, p99 = (percentile(latencies, q) * 1000 for q in (50, 95, 99))
+                    line += f" | latence lot p50 {p50:.0f} ms, p95 {p95:.0f} ms, p99 {p99:.0f} ms"
+            if lags:
+                line += (f" | délai d'ingestion p50 {percentile(lags, 50) * 1000:.0f} ms, "
+                         f"p95 {percentile(lags, 95) * 1000:.0f} ms")
+        return line
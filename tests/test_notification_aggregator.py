@@ -0,0 +1,37 @@
+"""Tests de l'agrégateur de notifications (sans base : connexion simulée)."""
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+from models import notificationModel
+from models.notificationModel import NotificationAggregator, coalesce_notifications
+
+
+@pytest.fixture
+def no_database(monkeypatch):
+    """🔌 `get_db_cursor` échoue comme lorsque la base est injoignable."""
+    monkeypatch.setattr(notificationModel, "get_db_cursor", lambda: (None, None))
+
+
+def test_coalesce_raises_without_connection(no_database):
+    with pytest.raises(psycopg2.OperationalError):
+        coalesce_notifications([("🚰 Pompe démarrée", "info", "pump:1:started", 1)])
+
+
+def test_flush_requeues_without_connection(no_database, monkeypatch):
+    aggregator = NotificationAggregator()
+    aggregator.notify("🚰 Pompe démarrée", "info", key="pump:1:started")
+    aggregator.notify("🚰 Pompe démarrée", "info", key="pump:1:started")
+    aggregator.notify("ℹ️ Message isolé", "info")
+
+    assert aggregator.flush() == 0
+
+    # La base revient : le lot conservé est écrit, compteurs compris
+    written = []
+    monkeypatch.setattr(notificationModel, "coalesce_notifications",
+                        lambda entries, window_seconds=None: written.extend(entries) or len(entries))
+    assert aggregator.flush() == 2
+    assert sorted(written) == [
+        ("ℹ️ Message isolé", "info", None, 1),
+        ("🚰 Pompe démarrée", "info", "pump:1:started", 2),
+    ]
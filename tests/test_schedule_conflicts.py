@@ -0,0 +1,62 @@
+"""
+Tests d'intégration des conflits de plannings par pompe (base PostgreSQL configurée
+dans .env, initialisée avec database/schema.sql). Ignorés si la base est injoignable.
+"""
+from datetime import date, time, timedelta
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from database.database import get_db_connection
+from models.scheduleModel import create_schedule, delete_schedule, update_schedule
+
+DAY = date(2099, 1, 1)  # Loin de tout planning réel
+
+
+@pytest.fixture
+def pumps():
+    """🚿 Deux pompes de test, supprimées avec leurs plannings en fin de test."""
+    conn = get_db_connection()
+    if conn is None:
+        pytest.skip("Base PostgreSQL injoignable")
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO pumps (name, field_id)
+            VALUES ('test-conflit-a', 1), ('test-conflit-b', 1) RETURNING id;
+        """)
+        pump_ids = [row["id"] for row in cursor.fetchall()]
+    conn.commit()
+    created = []
+    yield pump_ids, created
+    for schedule_id in created:
+        delete_schedule(schedule_id)
+    with conn.cursor() as cursor:
+        cursor.execute("DELETE FROM pumps WHERE id = ANY(%s);", (pump_ids,))
+    conn.commit()
+    conn.close()
+
+
+def test_update_moving_window_and_dropping_pump(pumps):
+    """La pompe retirée ne doit pas entrer en conflit dans la nouvelle fenêtre."""
+    (pump_a, pump_b), created = pumps
+    other = create_schedule(1, DAY, time(10), timedelta(hours=1), "planned", 1.0, [pump_b])
+    created.append(other)
+    schedule_id = create_schedule(1, DAY, time(8), timedelta(hours=1), "planned", 1.0, [pump_a, pump_b])
+    created.append(schedule_id)
+
+    # Nouvelle fenêtre sur celle de `other`, mais sans la pompe B
+    updated = update_schedule(schedule_id, {"start_time": time(10), "pump_ids": [pump_a]})
+
+    assert updated["start_time"] == time(10)
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT pump_id, lower(period) AS period_start
+                  FROM schedule_pumps WHERE schedule_id = %s;
+            """, (schedule_id,))
+            rows = cursor.fetchall()
+    finally:
+        conn.close()
+    assert [(row["pump_id"], row["period_start"].time()) for row in rows] == [(pump_a, time(10))]
@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import OrderedDict
+
+from utils.metrics import CACHE_REQUESTS
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    🗃️ Cache mémoire thread-safe avec expiration par entrée et éviction LRU.
+    Les accès sont comptabilisés dans `cache_requests_total{cache=<name>}`.
+    """
+
+    def __init__(self, name, ttl, max_size=10000):
+        """
+        :param name: Nom du cache (label des métriques).
+        :param ttl: Durée de vie par défaut d'une entrée, en secondes.
+        :param max_size: Nombre maximal d'entrées avant éviction des moins récentes.
+        """
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = CACHE_REQUESTS.labels(name, "hit")
+        self._misses = CACHE_REQUESTS.labels(name, "miss")
+
+    def get(self, key, default=None):
+        """🔍 Retourne la valeur associée à `key` si elle n'a pas expiré."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self._hits.inc()
+                    return value
+                del self._data[key]
+        self._misses.inc()
+        return default
+
+    def set(self, key, value, ttl=None):
+        """💾 Enregistre `value` pour `ttl` secondes (durée par défaut du cache sinon)."""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        """🗑️ Supprime une entrée (sans erreur si elle est absente)."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """🧹 Vide entièrement le cache."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
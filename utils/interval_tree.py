@@ -0,0 +1,50 @@
+class IntervalTree:
+    """
+    🌳 Arbre d'intervalles statique (intervalles semi-ouverts `[start, end)`).
+
+    Les intervalles sont triés par début et organisés en arbre binaire implicite sur
+    ce tableau ; chaque nœud conserve la plus grande fin de son sous-arbre, ce qui
+    permet d'élaguer les branches sans chevauchement : construction en O(n log n),
+    requête en O(log n + k). Les bornes peuvent être des nombres ou des datetimes.
+    """
+
+    def __init__(self, intervals):
+        """
+        :param intervals: Itérable de tuples `(start, end, payload)`.
+        """
+        self._items = sorted(intervals, key=lambda item: item[0])
+        self._max_end = [None] * len(self._items)
+        self._build(0, len(self._items))
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        best = self._items[mid][1]
+        for child in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child is not None and child > best:
+                best = child
+        self._max_end[mid] = best
+        return best
+
+    def __len__(self):
+        return len(self._items)
+
+    def overlaps(self, start, end):
+        """🔍 Retourne les payloads des intervalles qui chevauchent `[start, end)`."""
+        result = []
+        stack = [(0, len(self._items))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self._max_end[mid] <= start:
+                continue  # Aucun intervalle de ce sous-arbre ne se termine après `start`
+            stack.append((lo, mid))
+            item_start, item_end, payload = self._items[mid]
+            if item_start < end:
+                if item_end > start:
+                    result.append(payload)
+                stack.append((mid + 1, hi))
+        return result
@@ -0,0 +1,96 @@
+import heapq
+import math
+
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_000.0
+
+
+def project(latitude, longitude, origin_latitude):
+    """
+    🗺️ Projection équirectangulaire locale (mètres) autour de `origin_latitude` ;
+    précise à l'échelle d'une exploitation (quelques dizaines de kilomètres).
+    """
+    scale = math.cos(math.radians(origin_latitude))
+    x = np.radians(np.asarray(longitude, dtype=np.float64)) * EARTH_RADIUS_M * scale
+    y = np.radians(np.asarray(latitude, dtype=np.float64)) * EARTH_RADIUS_M
+    return x, y
+
+
+class KDTree:
+    """
+    🌳 Arbre k-d statique en deux dimensions.
+
+    Comme `IntervalTree`, l'arbre est implicite : les points sont réordonnés dans un
+    tableau où le nœud d'un sous-intervalle `[lo, hi)` est son milieu, médiane sur
+    l'axe alterné (x aux profondeurs paires, y aux impaires). Construction en
+    O(n log n), plus proche voisin en O(log n) en moyenne, requête de rayon en
+    O(√n + k).
+    """
+
+    def __init__(self, points):
+        """
+        :param points: Itérable de tuples `(x, y, payload)` (coordonnées en mètres).
+        """
+        items = list(points)
+        self._xy = np.array([(x, y) for x, y, _ in items], dtype=np.float64).reshape(-1, 2)
+        self._payloads = [payload for _, _, payload in items]
+        order = np.arange(len(items))
+        self._build(order, 0, len(items), 0)
+        self._xy = self._xy[order]
+        self._payloads = [self._payloads[i] for i in order]
+
+    def _build(self, order, lo, hi, depth):
+        if hi - lo <= 1:
+            return
+        mid = (lo + hi) // 2
+        segment = order[lo:hi]
+        order[lo:hi] = segment[np.argpartition(self._xy[segment, depth % 2], mid - lo)]
+        self._build(order, lo, mid, depth + 1)
+        self._build(order, mid + 1, hi, depth + 1)
+
+    def __len__(self):
+        return len(self._payloads)
+
+    def nearest(self, x, y, k=1):
+        """🔍 Les `k` points les plus proches de `(x, y)` : liste de `(distance, payload)` triée."""
+        best = []  # Tas max (distances négatives) des k meilleurs candidats
+        stack = [(0, len(self._payloads), 0, 0.0)]
+        while stack:
+            lo, hi, depth, bound = stack.pop()
+            # Sous-arbre ignoré si son plan de coupe est plus loin que le k-ième voisin
+            if lo >= hi or (len(best) == k and bound >= -best[0][0]):
+                continue
+            mid = (lo + hi) // 2
+            px, py = self._xy[mid]
+            distance = math.hypot(px - x, py - y)
+            if len(best) < k:
+                heapq.heappush(best, (-distance, mid))
+            elif distance < -best[0][0]:
+                heapq.heapreplace(best, (-distance, mid))
+            delta = (x - px) if depth % 2 == 0 else (y - py)
+            near, far = ((lo, mid), (mid + 1, hi)) if delta < 0 else ((mid + 1, hi), (lo, mid))
+            stack.append((*far, depth + 1, abs(delta)))
+            stack.append((*near, depth + 1, bound))
+        return [(-negative, self._payloads[index]) for negative, index in sorted(best, reverse=True)]
+
+    def within(self, x, y, radius):
+        """🔍 Points situés à moins de `radius` de `(x, y)` : liste de `(distance, payload)` triée."""
+        result = []
+        stack = [(0, len(self._payloads), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            px, py = self._xy[mid]
+            distance = math.hypot(px - x, py - y)
+            if distance <= radius:
+                result.append((distance, self._payloads[mid]))
+            delta = (x - px) if depth % 2 == 0 else (y - py)
+            if delta - radius <= 0:
+                stack.append((lo, mid, depth + 1))
+            if delta + radius >= 0:
+                stack.append((mid + 1, hi, depth + 1))
+        result.sort(key=lambda item: item[0])
+        return result
@@ -0,0 +1,141 @@
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+
+# =========================================
+# 📝 JOURNALISATION STRUCTURÉE ET NON BLOQUANTE
+# =========================================
+# Les threads applicatifs se contentent de déposer l'enregistrement dans une file
+# (QueueHandler) ; le formatage et l'écriture se font dans un thread dédié
+# (QueueListener). Variables d'environnement :
+#   LOG_LEVEL      niveau racine (défaut : INFO)
+#   LOG_LEVELS     niveaux par module, ex: "models=WARNING,uvicorn.access=WARNING"
+#   LOG_FORMAT     "json" (défaut) ou "text"
+#   LOG_SAMPLING   échantillonnage par clé d'événement, ex: "ingest=100" (1 sur 100)
+#   LOG_QUEUE_SIZE taille maximale de la file (défaut : 10000, au-delà on jette)
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_listener = None
+_lock = threading.Lock()
+
+
+def _parse_mapping(raw):
+    """🔧 Convertit "a=1,b=2" en dictionnaire {"a": "1", "b": "2"}."""
+    mapping = {}
+    for item in (raw or "").split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            mapping[key.strip()] = value.strip()
+    return mapping
+
+
+class JsonFormatter(logging.Formatter):
+    """🧾 Formate chaque enregistrement en une ligne JSON (champs `extra` inclus)."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    🎲 Ne conserve qu'un enregistrement sur N pour les événements à fort volume.
+    Un enregistrement est concerné s'il porte `extra={"sample": "<clé>"}` et que
+    la clé est configurée dans LOG_SAMPLING. Les niveaux WARNING et plus passent toujours.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = {key: max(int(rate), 1) for key, rate in rates.items()}
+        self._counters = {key: itertools.count() for key in self.rates}
+
+    def filter(self, record):
+        key = getattr(record, "sample", None)
+        if key is None or record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(key)
+        if rate is None:
+            return True
+        return next(self._counters[key]) % rate == 0
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    📤 QueueHandler qui ne formate pas le message dans le thread appelant :
+    seule la trace d'exception (non sérialisable plus tard) est rendue ici,
+    `msg % args` est évalué par le thread d'écriture.
+    """
+
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass  # Jamais bloquer le chemin critique : on abandonne l'enregistrement
+
+
+def setup_logging():
+    """⚙️ Configure la journalisation de l'application (idempotent)."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        if os.getenv("LOG_FORMAT", "json").lower() == "text":
+            formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        else:
+            formatter = JsonFormatter()
+
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(formatter)
+
+        log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+        queue_handler = LazyQueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter(_parse_mapping(os.getenv("LOG_SAMPLING", "ingest=100"))))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+        for name, level in _parse_mapping(os.getenv("LOG_LEVELS", "")).items():
+            logging.getLogger(name).setLevel(level.upper())
+
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """🛑 Vide la file et arrête le thread d'écriture."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
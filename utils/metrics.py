@@ -0,0 +1,372 @@
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+
+# =========================================
+# 📊 MÉTRIQUES AU FORMAT PROMETHEUS
+# =========================================
+# Registre minimaliste (sans dépendance externe) exposé sur `/metrics` au
+# format texte Prometheus. Toutes les opérations sont thread-safe : les routes
+# synchrones de FastAPI s'exécutent dans un pool de threads.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """📐 Base commune : nom, aide, labels et enfants par combinaison de labels."""
+    metric_type = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, *labelvalues, **labelkwargs):
+        """🏷️ Retourne la série correspondant aux valeurs de labels données."""
+        if labelkwargs:
+            labelvalues = tuple(labelkwargs[name] for name in self.labelnames)
+        key = tuple(str(value) for value in labelvalues)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"❌ Labels attendus pour {self.name}: {self.labelnames}")
+
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._new_child()
+                    self._children[key] = child
+        return child
+
+    def _default(self):
+        return self.labels() if not self.labelnames else None
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """➕ Compteur monotone."""
+    metric_type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+
+class _GaugeChild(_CounterChild):
+    def dec(self, amount=1.0):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self.value = float(value)
+
+
+class Gauge(_Metric):
+    """🎚️ Valeur instantanée (peut monter ou descendre)."""
+    metric_type = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount=1.0):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[index] += 1
+                    break
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    """⏱️ Distribution de durées (ou de tailles) par buckets cumulés."""
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class MetricsRegistry:
+    """🗂️ Registre des métriques exposées sur `/metrics`."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"❌ Métrique déjà enregistrée : {metric.name}")
+            self._metrics[metric.name] = metric
+        if not metric.labelnames:
+            metric.labels()  # Série exposée à 0 dès le démarrage
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """📝 Sérialise toutes les métriques au format texte Prometheus."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# =========================================
+# 📌 MÉTRIQUES DE L'APPLICATION
+# =========================================
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Latence des requêtes HTTP par route.", ("method", "route", "status")
+)
+HTTP_REQUESTS_IN_PROGRESS = REGISTRY.gauge(
+    "http_requests_in_progress", "Requêtes HTTP en cours de traitement.", ("method",)
+)
+DB_QUERIES = REGISTRY.counter(
+    "db_queries_total", "Appels aux fonctions de modèle par résultat.", ("function", "outcome")
+)
+DB_QUERY_DURATION = REGISTRY.histogram(
+    "db_query_duration_seconds", "Durée des fonctions de modèle (connexion comprise).", ("function",)
+)
+DB_CONNECTIONS_OPENED = REGISTRY.counter(
+    "db_connections_opened_total", "Connexions PostgreSQL ouvertes."
+)
+DB_CONNECTION_ERRORS = REGISTRY.counter(
+    "db_connection_errors_total", "Échecs d'ouverture de connexion PostgreSQL."
+)
+DB_CONNECTIONS_IN_USE = REGISTRY.gauge(
+    "db_connections_in_use", "Connexions PostgreSQL actuellement ouvertes."
+)
+DB_CONNECT_DURATION = REGISTRY.histogram(
+    "db_connect_duration_seconds", "Temps d'établissement d'une connexion PostgreSQL."
+)
+MQTT_MESSAGES = REGISTRY.counter(
+    "mqtt_messages_total", "Messages MQTT par consommateur et résultat (received/processed/dropped).",
+    ("consumer", "outcome")
+)
+INFERENCE_DURATION = REGISTRY.histogram(
+    "inference_duration_seconds", "Latence des prédictions du moteur d'inférence.", ("engine",)
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "cache_requests_total", "Accès aux caches applicatifs (hit/miss).", ("cache", "result")
+)
+PASSWORD_TASKS_REJECTED = REGISTRY.counter(
+    "password_tasks_rejected_total", "Hachages/vérifications refusés car le pool bcrypt est saturé."
+)
+AUTH_RATE_LIMITED = REGISTRY.counter(
+    "auth_rate_limited_total", "Tentatives de connexion refusées par le limiteur.", ("scope",)
+)
+NOTIFICATION_SUBSCRIBERS = REGISTRY.gauge(
+    "notification_subscribers", "Clients SSE / WebSocket abonnés aux notifications."
+)
+SENSOR_ANOMALIES = REGISTRY.counter(
+    "sensor_anomalies_total", "Mesures aberrantes détectées à l'ingestion.", ("metric", "reason")
+)
+
+
+# =========================================
+# 🧩 INSTRUMENTATION DES FONCTIONS DE MODÈLE
+# =========================================
+def instrument(name=None):
+    """
+    ⏱️ Décorateur : compte les appels et mesure la durée d'une fonction de modèle.
+    :param name: Nom exposé dans le label `function` (par défaut `module.fonction`).
+    """
+    def decorator(func):
+        if getattr(func, "__instrumented__", False):
+            return func
+
+        label = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+        duration = DB_QUERY_DURATION.labels(label)
+        ok = DB_QUERIES.labels(label, "ok")
+        error = DB_QUERIES.labels(label, "error")
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                error.inc()
+                raise
+            finally:
+                duration.observe(time.perf_counter() - start)
+            ok.inc()
+            return result
+
+        wrapper.__instrumented__ = True
+        return wrapper
+
+    return decorator
+
+
+def instrument_module(module):
+    """
+    🧩 Instrumente toutes les fonctions publiques définies dans un module de modèle,
+    ainsi que les méthodes statiques de ses classes, sans modifier leur corps.
+    À appeler en fin de module, avant que les routes n'importent les fonctions.
+    :param module: Module à instrumenter (ex: `sys.modules[__name__]`).
+    """
+    for attr, obj in list(vars(module).items()):
+        if attr.startswith("_") or getattr(obj, "__module__", None) != module.__name__:
+            continue
+        if inspect.isfunction(obj):
+            setattr(module, attr, instrument()(obj))
+        elif inspect.isclass(obj):
+            for method_name, method in list(vars(obj).items()):
+                if isinstance(method, staticmethod) and not method_name.startswith("_"):
+                    setattr(obj, method_name, staticmethod(instrument()(method.__func__)))
+    return module
+
+
+# =========================================
+# 🌐 MIDDLEWARE ASGI : LATENCE PAR ROUTE
+# =========================================
+class MetricsMiddleware:
+    """
+    Middleware ASGI pur (plus léger que `BaseHTTPMiddleware`) qui mesure la latence
+    de chaque requête HTTP, étiquetée par gabarit de route (`/api/pumps/{pump_id}`)
+    pour éviter l'explosion de cardinalité.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            route = scope.get("route")
+            endpoint = scope.get("endpoint")
+            route_label = getattr(route, "path", None) or getattr(endpoint, "__name__", None) or "unmatched"
+            HTTP_REQUEST_DURATION.labels(method, route_label, status_holder["status"]).observe(
+                time.perf_counter() - start
+            )
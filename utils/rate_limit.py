@@ -0,0 +1,59 @@
+import threading
+import time
+from collections import deque
+
+
+class SlidingWindowRateLimiter:
+    """
+    🚦 Limiteur en mémoire à fenêtre glissante : au plus `max_events` événements
+    par clé (IP, email…) sur `window_seconds` secondes.
+    """
+
+    def __init__(self, max_events, window_seconds, max_keys=100000):
+        """
+        :param max_events: Nombre d'événements autorisés dans la fenêtre.
+        :param window_seconds: Taille de la fenêtre glissante, en secondes.
+        :param max_keys: Nombre de clés suivies avant purge des clés inactives.
+        """
+        self.max_events = max_events
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def _purge(self, events, now):
+        while events and events[0] <= now - self.window_seconds:
+            events.popleft()
+
+    def retry_after(self, key):
+        """⏳ Secondes à attendre avant un nouvel essai (0 si la clé n'est pas bloquée)."""
+        now = time.monotonic()
+        with self._lock:
+            events = self._events.get(key)
+            if not events:
+                return 0
+            self._purge(events, now)
+            if len(events) < self.max_events:
+                return 0
+            return max(events[0] + self.window_seconds - now, 0)
+
+    def hit(self, key):
+        """➕ Enregistre un événement pour `key`."""
+        now = time.monotonic()
+        with self._lock:
+            events = self._events.get(key)
+            if events is None:
+                if len(self._events) >= self.max_keys:
+                    self._evict_idle(now)
+                events = self._events[key] = deque()
+            self._purge(events, now)
+            events.append(now)
+
+    def reset(self, key):
+        """🧹 Oublie l'historique de `key` (ex: après une connexion réussie)."""
+        with self._lock:
+            self._events.pop(key, None)
+
+    def _evict_idle(self, now):
+        for key in [key for key, events in self._events.items() if not events or events[-1] <= now - self.window_seconds]:
+            del self._events[key]
@@ -1,5 +1,10 @@
+import asyncio
+import hashlib
 import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
@@ -11,6 +16,8 @@ from psycopg2.extras import RealDictCursor
 
 
 from database.database import get_db_connection
+from utils.cache import TTLCache
+from utils.metrics import PASSWORD_TASKS_REJECTED
 
 pwd_context = CryptContext(
     schemes=["bcrypt"],
@@ -21,7 +28,6 @@ pwd_context = CryptContext(
 
 
 # ✅ Logger
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 # ✅ Clé secrète pour signer le token JWT (⚠️ Changez-la en production et utilisez une variable d'env)
@@ -29,6 +35,11 @@ SECRET_KEY = os.getenv("SECRET_KEY", "votre_secret_key_super_securisee")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# ✅ Caches d'authentification : claims vérifiés (jusqu'à `exp`) et utilisateurs (TTL court)
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+_token_cache = TTLCache("jwt_claims", ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60, max_size=50000)
+_user_cache = TTLCache("auth_users", ttl=USER_CACHE_TTL_SECONDS, max_size=10000)
+
 # ✅ OAuth2PasswordBearer définit le chemin de connexion pour récupérer le token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
@@ -46,9 +57,42 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     try:
         return pwd_context.verify(plain_password, hashed_password)
     except Exception as e:
-        logger.error(f"❌ Erreur bcrypt lors de la vérification du mot de passe: {e}")
+        logger.error("❌ Erreur bcrypt lors de la vérification du mot de passe: %s", e)
         return False
 
+
+# ✅ Pool dédié au hachage bcrypt (~250 ms CPU par opération) : borne la concurrence et
+#    la file d'attente pour qu'une rafale d'inscriptions ou de connexions ne bloque
+#    ni la boucle d'événements ni le pool de threads des autres routes.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_password_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_PENDING)
+
+
+class PasswordHasherBusy(Exception):
+    """⏳ Levée quand le pool de hachage et sa file d'attente sont pleins."""
+
+
+async def _run_password_task(func, *args):
+    if not _password_slots.acquire(blocking=False):
+        PASSWORD_TASKS_REJECTED.inc()
+        raise PasswordHasherBusy("❌ Trop d'opérations de mot de passe en cours, réessayez plus tard.")
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_password_executor, func, *args)
+    finally:
+        _password_slots.release()
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hache un mot de passe dans le pool dédié, sans bloquer la boucle d'événements."""
+    return await _run_password_task(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Vérifie un mot de passe dans le pool dédié, sans bloquer la boucle d'événements."""
+    return await _run_password_task(verify_password, plain_password, hashed_password)
+
 # =========================================
 # 🔐 CRÉATION ET VÉRIFICATION DU TOKEN JWT
 # =========================================
@@ -71,6 +115,29 @@ def decode_access_token(token: str) -> Optional[dict]:
         return None
 
 
+def decode_access_token_cached(token: str) -> Optional[dict]:
+    """⚡ Décode un token JWT en réutilisant les claims déjà vérifiés jusqu'à leur expiration."""
+    key = hashlib.sha256(token.encode()).digest()
+    payload = _token_cache.get(key)
+    if payload is not None:
+        if payload.get("exp", 0) > time.time():
+            return payload
+        _token_cache.invalidate(key)
+
+    payload = decode_access_token(token)
+    if payload is not None:
+        _token_cache.set(key, payload, ttl=payload.get("exp", 0) - time.time())
+    return payload
+
+
+def invalidate_user_cache(username: Optional[str] = None):
+    """🧹 Invalide l'utilisateur en cache (ou tout le cache) après une modification."""
+    if username is None:
+        _user_cache.clear()
+    else:
+        _user_cache.invalidate(username)
+
+
 # =========================================
 # 🔑 RÉCUPÉRATION DE L'UTILISATEUR CONNECTÉ
 # =========================================
@@ -82,8 +149,8 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    # ✅ Décodage du token
-    payload = decode_access_token(token)
+    # ✅ Décodage du token (claims en cache jusqu'à `exp`)
+    payload = decode_access_token_cached(token)
     if payload is None:
         raise credentials_exception
 
@@ -91,6 +158,11 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
     if username is None:
         raise credentials_exception
 
+    # ✅ Utilisateur en cache : aucun accès à la base
+    cached_user = _user_cache.get(username)
+    if cached_user is not None:
+        return dict(cached_user)
+
     # ✅ Connexion à la base de données pour récupérer l'utilisateur
     conn = get_db_connection()
     if not conn:
@@ -104,10 +176,13 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         if user is None:
             raise credentials_exception
 
+        _user_cache.set(username, dict(user))
         return user
 
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"❌ Erreur lors de la récupération de l'utilisateur: {e}")
+        logger.error("❌ Erreur lors de la récupération de l'utilisateur: %s", e)
         raise HTTPException(status_code=500, detail="Erreur interne du serveur")
 
     finally:
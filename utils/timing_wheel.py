@@ -0,0 +1,61 @@
+import math
+
+
+class TimingWheel:
+    """
+    ⏱️ Roue temporelle (hashed timing wheel) pour un grand nombre d'échéances.
+
+    Le temps est découpé en tranches de `tick` secondes réparties circulairement
+    sur `slots` cases ; une clé est rangée dans la case de son échéance. Planifier
+    est en O(1) et `advance()` ne parcourt que les cases écoulées depuis le
+    dernier appel : le coût ne dépend pas du nombre total de clés planifiées.
+    Une échéance au-delà d'un tour de roue est renvoyée au passage de sa case ;
+    l'appelant vérifie alors l'échéance réelle et replanifie si besoin.
+    """
+
+    def __init__(self, tick, horizon, now):
+        """
+        :param tick: Résolution (s) ; une échéance est signalée au plus `tick` secondes en retard.
+        :param horizon: Délai maximal usuel (s) ; la roue couvre au moins cet intervalle en un tour.
+        :param now: Instant de départ (s).
+        """
+        self.tick = tick
+        self.slots = [set() for _ in range(math.ceil(horizon / tick) + 1)]
+        self._current = int(now // tick)
+        self._slot_of = {}
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def __contains__(self, key):
+        return key in self._slot_of
+
+    def schedule(self, key, deadline):
+        """➕ (Re)planifie `key` à l'échéance `deadline` (une seule échéance par clé)."""
+        index = max(int(deadline // self.tick), self._current + 1) % len(self.slots)
+        previous = self._slot_of.get(key)
+        if previous is not None:
+            self.slots[previous].discard(key)
+        self.slots[index].add(key)
+        self._slot_of[key] = index
+
+    def cancel(self, key):
+        """🗑️ Retire `key` de la roue."""
+        index = self._slot_of.pop(key, None)
+        if index is not None:
+            self.slots[index].discard(key)
+
+    def advance(self, now):
+        """⏩ Avance jusqu'à `now` ; renvoie (et retire) les clés des cases écoulées."""
+        target = int(now // self.tick)
+        steps = min(target - self._current, len(self.slots))
+        expired = []
+        for tick in range(self._current + 1, self._current + 1 + max(steps, 0)):
+            slot = self.slots[tick % len(self.slots)]
+            if slot:
+                expired.extend(slot)
+                for key in slot:
+                    del self._slot_of[key]
+                slot.clear()
+        self._current = max(self._current, target)
+        return expired